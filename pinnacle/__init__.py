@@ -38,6 +38,7 @@ from .components.model import (
 from .components.plugin import Plugin
 from .components.streamlit import Streamlit
 from .components.table import Table
+from .components.text_index import TextIndex
 from .components.vector_index import VectorIndex
 
 REQUIRES = [
@@ -62,6 +63,7 @@ __all__ = (
     'Trainer',
     'Listener',
     'VectorIndex',
+    'TextIndex',
     'Dataset',
     'Metric',
     'Plugin',
@@ -0,0 +1,434 @@
+"""Benchmark of vector searchers.
+
+Drives any ``BaseVectorSearcher`` through its common interface on synthetic
+datasets, and reports add throughput, query latency percentiles, queries per
+second (sequential, batched and concurrent), memory footprint and recall@k
+against exact search. Run it with::
+
+    python -m pinnacle.backends.base.benchmark --searchers inmemory hnsw
+
+Sharded exact search only splits indexes of at least 32768 vectors, e.g.::
+
+    python -m pinnacle.backends.base.benchmark --searchers inmemory sharded \
+        --n 200000 --d 64
+
+"""
+
+import argparse
+import contextlib
+import dataclasses as dc
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import typing as t
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+from pinnacle import CFG, logging
+from pinnacle.backends.base.vector_search import (
+    BaseVectorSearcher,
+    VectorItem,
+    measures,
+    top_n,
+)
+from pinnacle.misc.importing import import_object
+
+DATASETS = ('uniform', 'clustered')
+
+# name -> (import path, keyword arguments, ``CFG.vector_search_engine``)
+SEARCHERS: t.Dict[str, t.Tuple[str, t.Dict, t.Optional[str]]] = {
+    'inmemory': (
+        'pinnacle.backends.local.vector_search.InMemoryVectorSearcher',
+        {},
+        None,
+    ),
+    'sharded': (
+        'pinnacle.backends.local.vector_search.InMemoryVectorSearcher',
+        {'n_shards': os.cpu_count() or 1},
+        None,
+    ),
+    'ivf': ('pinnacle.backends.local.ivf.IVFVectorSearcher', {}, None),
+    'hnsw': ('pinnacle.backends.local.hnsw.HNSWVectorSearcher', {}, None),
+    'quantized': (
+        'pinnacle.backends.local.quantization.QuantizedVectorSearcher',
+        {},
+        None,
+    ),
+    'binary': (
+        'pinnacle.backends.local.quantization.BinaryVectorSearcher',
+        {},
+        None,
+    ),
+    'lance': ('pinnacle_lance.lance.LanceVectorSearcher', {}, None),
+    'qdrant': ('pinnacle_qdrant.qdrant.QdrantVectorSearcher', {}, 'qdrant'),
+    'chromadb': ('pinnacle_chromadb.chromadb.ChromaDBVectorSearcher', {}, 'chromadb'),
+}
+
+
+@dc.dataclass
+class Dataset:
+    """Vectors to index and queries to search with.
+
+    :param name: Name of the dataset
+    :param vectors: Matrix of vectors of shape ``(n, d)``
+    :param queries: Matrix of query vectors of shape ``(n_queries, d)``
+    """
+
+    name: str
+    vectors: numpy.ndarray
+    queries: numpy.ndarray
+
+    @property
+    def ids(self) -> t.List[str]:
+        """Ids of the vectors."""
+        return [str(i) for i in range(len(self.vectors))]
+
+
+def make_dataset(
+    kind: str = 'uniform',
+    n: int = 10000,
+    d: int = 128,
+    n_queries: int = 100,
+    n_clusters: t.Optional[int] = None,
+    seed: int = 0,
+) -> Dataset:
+    """Generate a synthetic dataset.
+
+    ``'uniform'`` draws isotropic Gaussian vectors; ``'clustered'`` draws
+    vectors around ``n_clusters`` centres (default: square root of ``n``),
+    which is closer to real embeddings and harder for approximate indexes.
+    Queries are drawn from the same distribution, not from the vectors.
+
+    :param kind: ``'uniform'`` or ``'clustered'``
+    :param n: Number of vectors
+    :param d: Dimensions of the vectors
+    :param n_queries: Number of queries
+    :param n_clusters: Number of clusters of ``'clustered'``
+    :param seed: Seed of the random number generator
+    """
+    if kind not in DATASETS:
+        raise ValueError(f'Unknown dataset {kind!r}; expected one of {DATASETS}')
+    rng = numpy.random.default_rng(seed)
+    if kind == 'uniform':
+        x = rng.standard_normal((n + n_queries, d))
+    else:
+        n_clusters = n_clusters or max(1, int(numpy.sqrt(n)))
+        centres = rng.standard_normal((n_clusters, d))
+        assign = rng.integers(0, n_clusters, n + n_queries)
+        x = centres[assign] + 0.25 * rng.standard_normal((n + n_queries, d))
+    x = x.astype(numpy.float32)
+    return Dataset(name=f'{kind}-{n}x{d}', vectors=x[:n], queries=x[n:])
+
+
+def exact_neighbours(
+    dataset: Dataset, k: int, measure: str = 'cosine', chunk_size: int = 1024
+) -> numpy.ndarray:
+    """Find the exact ``k`` nearest vectors of each query.
+
+    :param dataset: Dataset to search
+    :param k: Number of neighbours
+    :param measure: Measure of similarity
+    :param chunk_size: Number of queries scored at a time
+    """
+    vectors = dataset.vectors
+    if measure == 'cosine':
+        vectors = vectors / numpy.linalg.norm(vectors, axis=1)[:, None]
+    out = []
+    for i in range(0, len(dataset.queries), chunk_size):
+        ix, _ = top_n(
+            measures[measure](dataset.queries[i : i + chunk_size], vectors), k
+        )
+        out.append(ix)
+    return numpy.concatenate(out)
+
+
+def recall_at_k(found: t.Sequence[t.Sequence[str]], exact: numpy.ndarray) -> float:
+    """Mean fraction of the exact neighbours found by each query.
+
+    :param found: Ids found by each query
+    :param exact: Slots of the exact neighbours of each query
+    """
+    k = exact.shape[1]
+    hits = [
+        len({int(x) for x in ids} & set(row.tolist())) for ids, row in zip(found, exact)
+    ]
+    return float(numpy.mean(hits) / k) if k else 1.0
+
+
+def _rss() -> t.Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextlib.contextmanager
+def _engine(engine: t.Optional[str]):
+    # Searchers of plugins read their engine from ``CFG``; run them in
+    # their in-process mode, with any data on disk in a temporary directory
+    directory = tempfile.mkdtemp(prefix='pinnacle-benchmark-')
+    previous = (
+        CFG.vector_search_engine,
+        CFG.vector_search_kwargs,
+        os.environ.get('pinnacle_LANCE_HOME'),
+    )
+    if engine is not None:
+        CFG.vector_search_engine = engine
+        CFG.vector_search_kwargs = {}
+    os.environ['pinnacle_LANCE_HOME'] = directory
+    try:
+        yield
+    finally:
+        CFG.vector_search_engine, CFG.vector_search_kwargs, lance_home = previous
+        if lance_home is None:
+            os.environ.pop('pinnacle_LANCE_HOME', None)
+        else:
+            os.environ['pinnacle_LANCE_HOME'] = lance_home
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _percentiles(seconds: t.Sequence[float]) -> t.Dict[str, float]:
+    ms = numpy.asarray(seconds) * 1000
+    out = {f'p{q}_ms': float(numpy.percentile(ms, q)) for q in (50, 90, 95, 99)}
+    out['mean_ms'] = float(ms.mean())
+    return out
+
+
+def benchmark_searcher(
+    searcher: BaseVectorSearcher,
+    dataset: Dataset,
+    k: int = 10,
+    batch_size: int = 1000,
+    concurrency: int = 8,
+    exact: t.Optional[numpy.ndarray] = None,
+    trace_memory: bool = False,
+) -> t.Dict:
+    """Benchmark one searcher on one dataset.
+
+    Memory is measured as the growth of the resident set while adding.
+    With ``trace_memory``, the Python and NumPy allocations are also traced
+    with ``tracemalloc``, which slows down searchers written in Python, so
+    that their add throughput is not comparable.
+
+    :param searcher: Empty searcher of the dimensions of ``dataset``
+    :param dataset: Dataset to index and search
+    :param k: Number of neighbours per query
+    :param batch_size: Number of vectors per call to ``add``
+    :param concurrency: Number of threads of the concurrent queries
+    :param exact: Exact neighbours of the queries (computed if ``None``)
+    :param trace_memory: Whether to trace allocations while adding
+    """
+    ids = dataset.ids
+    rss = _rss()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(0, len(ids), batch_size):
+        searcher.add(
+            [
+                VectorItem(id=id, vector=v)
+                for id, v in zip(ids[i : i + batch_size], dataset.vectors[i:])
+            ]
+        )
+    searcher.post_create()
+    add_seconds = time.perf_counter() - start
+    traced = None
+    if trace_memory:
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    rss_after = _rss()
+
+    queries = dataset.queries
+    searcher.find_nearest_from_array(queries[0], n=k)  # warm up
+
+    latencies, found = [], []
+    for q in queries:
+        start = time.perf_counter()
+        row_ids, _ = searcher.find_nearest_from_array(q, n=k)
+        latencies.append(time.perf_counter() - start)
+        found.append(row_ids)
+    sequential = sum(latencies)
+
+    start = time.perf_counter()
+    searcher.find_nearest_from_arrays(queries, n=k)
+    batched = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda q: searcher.find_nearest_from_array(q, n=k), queries))
+        concurrent = time.perf_counter() - start
+
+    if exact is None:
+        exact = exact_neighbours(dataset, k, measure=_measure_name(searcher))
+    return {
+        'add_seconds': add_seconds,
+        'add_per_second': len(ids) / add_seconds if add_seconds else None,
+        'latency': _percentiles(latencies),
+        'qps': len(queries) / sequential if sequential else None,
+        'qps_batched': len(queries) / batched if batched else None,
+        'qps_concurrent': len(queries) / concurrent if concurrent else None,
+        'concurrency': concurrency,
+        'memory_traced_bytes': traced,
+        'memory_rss_bytes': (
+            rss_after - rss if rss is not None and rss_after is not None else None
+        ),
+        f'recall@{k}': recall_at_k(found, exact),
+    }
+
+
+def _measure_name(searcher: BaseVectorSearcher) -> str:
+    measure = getattr(searcher, 'measure_name', None) or searcher.measure
+    return getattr(measure, 'name', measure)
+
+
+def run_benchmark(
+    searchers: t.Sequence[str] = ('inmemory',),
+    datasets: t.Sequence[str] = DATASETS,
+    n: int = 10000,
+    d: int = 128,
+    n_queries: int = 100,
+    k: int = 10,
+    measure: str = 'cosine',
+    batch_size: int = 1000,
+    concurrency: int = 8,
+    seed: int = 0,
+    searcher_kwargs: t.Optional[t.Dict[str, t.Dict]] = None,
+    trace_memory: bool = False,
+) -> t.Dict:
+    """Benchmark searchers on synthetic datasets.
+
+    Searchers whose plugin is not installed, or which fail, are reported
+    with an ``error`` rather than stopping the benchmark.
+
+    :param searchers: Names of searchers in ``SEARCHERS``
+    :param datasets: Kinds of datasets in ``DATASETS``
+    :param n: Number of vectors
+    :param d: Dimensions of the vectors
+    :param n_queries: Number of queries
+    :param k: Number of neighbours per query
+    :param measure: Measure of similarity
+    :param batch_size: Number of vectors per call to ``add``
+    :param concurrency: Number of threads of the concurrent queries
+    :param seed: Seed of the datasets
+    :param searcher_kwargs: Extra keyword arguments of each searcher by name
+    :param trace_memory: Whether to trace allocations while adding
+    """
+    report: t.Dict[str, t.Any] = {
+        'config': {
+            'n': n,
+            'd': d,
+            'n_queries': n_queries,
+            'k': k,
+            'measure': measure,
+            'batch_size': batch_size,
+            'concurrency': concurrency,
+            'seed': seed,
+            'trace_memory': trace_memory,
+        },
+        'machine': {
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'results': [],
+    }
+    for kind in datasets:
+        dataset = make_dataset(kind, n=n, d=d, n_queries=n_queries, seed=seed)
+        exact = exact_neighbours(dataset, k, measure=measure)
+        for name in searchers:
+            path, kwargs, engine = SEARCHERS[name]
+            kwargs = {**kwargs, **(searcher_kwargs or {}).get(name, {})}
+            result: t.Dict[str, t.Any] = {'searcher': name, 'dataset': dataset.name}
+            logging.info(f'Benchmarking {name} on {dataset.name}')
+            with _engine(engine):
+                searcher = None
+                try:
+                    cls = import_object(path)
+                    searcher = cls(
+                        f'benchmark{uuid.uuid4().hex}',
+                        dimensions=d,
+                        measure=measure,
+                        **kwargs,
+                    )
+                    result.update(
+                        benchmark_searcher(
+                            searcher,
+                            dataset,
+                            k=k,
+                            batch_size=batch_size,
+                            concurrency=concurrency,
+                            exact=exact,
+                            trace_memory=trace_memory,
+                        )
+                    )
+                except Exception as e:
+                    logging.warn(f'Benchmark of {name} failed: {e}')
+                    result['error'] = f'{type(e).__name__}: {e}'
+                finally:
+                    if searcher is not None:
+                        with contextlib.suppress(Exception):
+                            searcher.drop()
+            report['results'].append(result)
+    return report
+
+
+def main(argv: t.Optional[t.Sequence[str]] = None):
+    """Run the benchmark from the command line and write a JSON report.
+
+    :param argv: Command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--searchers', nargs='+', default=['inmemory'])
+    parser.add_argument('--datasets', nargs='+', default=list(DATASETS))
+    parser.add_argument('--n', type=int, default=10000)
+    parser.add_argument('--d', type=int, default=128)
+    parser.add_argument('--n-queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--measure', default='cosine')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--searcher-kwargs',
+        type=json.loads,
+        default=None,
+        help='JSON of extra keyword arguments by searcher, '
+        'e.g. \'{"hnsw": {"ef_search": 100}}\'',
+    )
+    parser.add_argument('--trace-memory', action='store_true')
+    parser.add_argument('--output', default=None, help='Path of the JSON report')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        searchers=args.searchers,
+        datasets=args.datasets,
+        n=args.n,
+        d=args.d,
+        n_queries=args.n_queries,
+        k=args.k,
+        measure=args.measure,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        seed=args.seed,
+        searcher_kwargs=args.searcher_kwargs,
+        trace_memory=args.trace_memory,
+    )
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(out)
+    else:
+        print(out)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -105,5 +105,6 @@ class Cluster(ABC):
         self.vector_search.initialize()
         self.crontab.initialize()
         self.cdc.initialize()
+        self.scheduler.replay()
 
         logging.info(f"Cluster initialized in {time.time() - start:.2f} seconds.")
@@ -1,3 +1,4 @@
+import copy
 import functools
 import hashlib
 import json
@@ -18,6 +19,28 @@ if t.TYPE_CHECKING:
     from pinnacle.base.schema import Schema
 
 
+def _rank_by_score(
+    results: t.Sequence[t.Dict],
+    pid: str,
+    ids: t.Sequence[t.Sequence[str]],
+    scores: t.Sequence[t.Sequence[float]],
+) -> t.List[t.List[t.Dict]]:
+    # Split the rows fetched for a batch of vector-search queries into the
+    # results of each query, scored and ranked; rows matching several
+    # queries are copied, so that each carries its own score.
+    out = []
+    for query_ids, query_scores in zip(ids, scores):
+        lookup = dict(zip(query_ids, query_scores))
+        rows = []
+        for r in results:
+            if r[pid] in lookup:
+                r = copy.copy(r) if len(ids) > 1 else r
+                r['score'] = lookup[r[pid]]
+                rows.append(r)
+        out.append(sorted(rows, key=lambda x: x['score'], reverse=True))
+    return out
+
+
 class BaseDataBackend(ABC):
     """Base data backend for the database.
 
@@ -387,16 +410,18 @@ class BaseDataBackend(ABC):
         """
         assert query.decomposition.pre_like is not None
 
-        ids, scores = self.db.select_nearest(
-            like=query.decomposition.pre_like.args[0],
+        like = query.decomposition.pre_like.args[0]
+        many = isinstance(like, (list, tuple))
+        ids, scores = (self.db.select_nearest_many if many else self.db.select_nearest)(
+            like,
             vector_index=query.decomposition.pre_like.args[1],
             n=query.decomposition.pre_like.kwargs.get('n', 10),
         )
-
-        lookup = {id: score for id, score in zip(ids, scores)}
+        if not many:
+            ids, scores = [ids], [scores]
 
         t = self.db[query.decomposition.table]
-        new_filter = t.primary_id.isin(ids)
+        new_filter = t.primary_id.isin(list({id for row in ids for id in row}))
 
         copy = query.decomposition.copy()
         copy.pre_like = None
@@ -406,12 +431,8 @@ class BaseDataBackend(ABC):
 
         results = new.execute(**kwargs)
 
-        pid = self.primary_id(query.table)
-        for r in results:
-            r['score'] = lookup[r[pid]]
-
-        results = sorted(results, key=lambda x: x['score'], reverse=True)
-        return results
+        out = _rank_by_score(results, self.primary_id(query.table), ids, scores)
+        return out if many else out[0]
 
     def post_like(self, query: Query, **kwargs):
         """Perform a post-like query.
@@ -423,26 +444,25 @@ class BaseDataBackend(ABC):
         prepare_query = query[:-1]
         relevant_ids = prepare_query.ids()
 
-        ids, scores = self.db.select_nearest(
-            like=like_part.args[0],
+        like = like_part.args[0]
+        many = isinstance(like, (list, tuple))
+        ids, scores = (self.db.select_nearest_many if many else self.db.select_nearest)(
+            like,
             vector_index=like_part.args[1],
             n=like_part.kwargs['n'],
             ids=relevant_ids,
         )
-
-        lookup = {id: score for id, score in zip(ids, scores)}
+        if not many:
+            ids, scores = [ids], [scores]
 
         t = self.db[query.table]
 
-        results = prepare_query.filter(t.primary_id.isin(ids)).execute(**kwargs)
-
-        pid = self.primary_id(query.table)
-
-        for r in results:
-            r['score'] = lookup[r[pid]]
+        results = prepare_query.filter(
+            t.primary_id.isin(list({id for row in ids for id in row}))
+        ).execute(**kwargs)
 
-        results = sorted(results, key=lambda x: x['score'], reverse=True)
-        return results
+        out = _rank_by_score(results, self.primary_id(query.table), ids, scores)
+        return out if many else out[0]
 
     @abstractmethod
     def execute_native(self, query: str):
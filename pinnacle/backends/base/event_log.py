@@ -0,0 +1,298 @@
+import json
+import os
+import shutil
+import struct
+import threading
+import typing as t
+import zlib
+from collections import defaultdict
+from urllib.parse import quote, unquote
+
+from pinnacle import logging
+from pinnacle.base.event import Change
+
+
+class EventLog:
+    """Durable log of the ``Change`` events of a queue.
+
+    The events are appended to segment files named by the sequence
+    number of their first record. Each record is a ``'<QII'`` header of
+    the sequence number, the length and the CRC-32 of the payload,
+    followed by the event as JSON. The sequence number of the last
+    consumed event is kept in an ``offset`` file; segments holding only
+    consumed events are deleted. A record torn by a crash fails its
+    checksum, and is truncated away with anything after it on opening.
+
+    Writes are buffered and made durable by ``sync``, which syncs the
+    records of all concurrent writers with one ``fsync`` (group commit).
+
+    :param path: Directory of the log
+    :param fsync: Whether ``sync`` syncs the log to disk
+    """
+
+    SEGMENT_SIZE: t.ClassVar[int] = 64 * 1024 * 1024
+    _HEADER: t.ClassVar[struct.Struct] = struct.Struct('<QII')
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._file: t.Optional[t.BinaryIO] = None
+        os.makedirs(path, exist_ok=True)
+
+        self.offset = self._read_offset()
+        last = self._recover()
+        # Sequence number of the next record written, and of the next
+        # record taken by a consumer
+        self._next = max(last, self.offset) + 1
+        self._unread = self.offset + 1
+        self._written = self._synced = self._next - 1
+        # Consumed ranges of sequence numbers beyond ``offset``
+        self._acked: t.Dict[int, int] = {}
+
+    def _segments(self) -> t.List[int]:
+        return sorted(
+            int(name[:-4]) for name in os.listdir(self.path) if name.endswith('.log')
+        )
+
+    def _segment_path(self, first: int) -> str:
+        return os.path.join(self.path, f'{first:020d}.log')
+
+    def _read_offset(self) -> int:
+        try:
+            with open(os.path.join(self.path, 'offset')) as f:
+                return int(f.read())
+        except FileNotFoundError:
+            return 0
+
+    def _read(self, first: int) -> t.Iterator[t.Tuple[int, int, bytes]]:
+        # The end positions, sequence numbers and payloads of the valid
+        # records of a segment
+        with open(self._segment_path(first), 'rb') as f:
+            while True:
+                header = f.read(self._HEADER.size)
+                if len(header) < self._HEADER.size:
+                    return
+                seq, length, crc = self._HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                yield f.tell(), seq, payload
+
+    def _recover(self) -> int:
+        # Truncate a torn tail from the last segment, returning the
+        # sequence number of its last record
+        segments = self._segments()
+        if not segments:
+            return 0
+        path = self._segment_path(segments[-1])
+        valid, last = 0, segments[-1] - 1
+        for valid, last, _ in self._read(segments[-1]):
+            pass
+        size = os.path.getsize(path)
+        if valid < size:
+            logging.warn(f'Discarding {size - valid} torn bytes of {path}')
+            with open(path, 'r+b') as f:
+                f.truncate(valid)
+        return last
+
+    def replay(self) -> t.List[Change]:
+        """Read the events which are not consumed yet."""
+        queue = unquote(os.path.basename(self.path))
+        events = []
+        for first in self._segments():
+            for _, seq, payload in self._read(first):
+                if seq > self.offset:
+                    events.append(Change(queue=queue, **json.loads(payload)))
+        return events
+
+    def write(self, events: t.Sequence[Change]) -> int:
+        """Append events to the log, returning the sequence number of the last.
+
+        The events are durable once ``sync`` returns.
+
+        :param events: Events to append
+        """
+        with self._lock:
+            if not events:
+                return self._written
+            records = []
+            for event in events:
+                payload = json.dumps({'type': event.type, 'ids': event.ids}).encode()
+                records.append(
+                    self._HEADER.pack(self._next, len(payload), zlib.crc32(payload))
+                )
+                records.append(payload)
+                self._next += 1
+            if self._file is None:
+                self._file = open(self._segment_path(self._next - len(events)), 'ab')
+            self._file.write(b''.join(records))
+            self._file.flush()
+            self._written = self._next - 1
+            return self._written
+
+    def sync(self, seq: int):
+        """Make the events up to a sequence number durable.
+
+        :param seq: Sequence number returned by ``write``
+        """
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            with self._lock:
+                file, written = self._file, self._written
+            if file is not None and self.fsync:
+                os.fsync(file.fileno())
+            self._synced = written
+            # Segments are only rolled here, once all their records are synced
+            with self._lock:
+                if (
+                    self._file is not None
+                    and self._written == written
+                    and self._file.tell() >= self.SEGMENT_SIZE
+                ):
+                    self._file.close()
+                    self._file = None
+
+    def take(self, n: int) -> t.Tuple[int, int]:
+        """Take the next events to be consumed, in order of writing.
+
+        :param n: Number of events
+        """
+        with self._lock:
+            first = self._unread
+            self._unread += n
+            return first, first + n - 1
+
+    def ack(self, first: int, last: int):
+        """Mark taken events as consumed.
+
+        The offset only moves past events consumed with all the events
+        before them.
+
+        :param first: Sequence number of the first event
+        :param last: Sequence number of the last event
+        """
+        if last < first:
+            return
+        with self._lock:
+            self._acked[first] = last
+            offset = self.offset
+            while offset + 1 in self._acked:
+                offset = self._acked.pop(offset + 1)
+            if offset == self.offset:
+                return
+            self.offset = offset
+            path = os.path.join(self.path, 'offset')
+            with open(path + '.tmp', 'w') as f:
+                f.write(str(offset))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            # Drop the segments whose records all precede the offset
+            segments = self._segments()
+            current = self._file.name if self._file is not None else None
+            for start, end in zip(segments, segments[1:]):
+                path = self._segment_path(start)
+                if end - 1 <= offset and path != current:
+                    os.remove(path)
+
+    def close(self):
+        """Close the log file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class EventLogs:
+    """Durable logs of the ``Change`` events of the queues of a scheduler.
+
+    Events are written to the log of their queue in the order in which
+    they are queued, so that the events taken from the front of a queue
+    are those taken from the front of its log.
+
+    :param path: Directory of the logs, one subdirectory per queue
+    :param fsync: Whether the logs are synced to disk
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.logs: t.Dict[str, EventLog] = {}
+        self._lock = threading.Lock()
+
+    def log(self, queue: str) -> EventLog:
+        """Get the log of a queue.
+
+        :param queue: Queue of the log
+        """
+        with self._lock:
+            log = self.logs.get(queue)
+            if log is None:
+                path = os.path.join(self.path, quote(queue, safe=''))
+                log = self.logs[queue] = EventLog(path, fsync=self.fsync)
+            return log
+
+    def write(self, events: t.Sequence[t.Any]) -> t.Dict[str, int]:
+        """Append the ``Change`` events to the logs of their queues.
+
+        Returns the last sequence number written to each log, to be
+        passed to ``sync``.
+
+        :param events: Events to append
+        """
+        by_queue = defaultdict(list)
+        for event in events:
+            if isinstance(event, Change):
+                by_queue[event.queue].append(event)
+        return {
+            queue: self.log(queue).write(queue_events)
+            for queue, queue_events in by_queue.items()
+        }
+
+    def sync(self, written: t.Dict[str, int]):
+        """Make written events durable.
+
+        :param written: Output of ``write``
+        """
+        for queue, seq in written.items():
+            self.log(queue).sync(seq)
+
+    def take(self, queue: str, n: int) -> t.Tuple[str, int, int]:
+        """Take the next events of a queue to be consumed.
+
+        :param queue: Queue of the events
+        :param n: Number of events
+        """
+        return (queue, *self.log(queue).take(n))
+
+    def ack(self, taken: t.Tuple[str, int, int]):
+        """Mark taken events as consumed.
+
+        :param taken: Output of ``take``
+        """
+        queue, first, last = taken
+        self.log(queue).ack(first, last)
+
+    def replay(self) -> t.Dict[str, t.List[Change]]:
+        """Read the events of each queue which are not consumed yet."""
+        if not os.path.isdir(self.path):
+            return {}
+        out = {}
+        for name in sorted(os.listdir(self.path)):
+            queue = unquote(name)
+            events = self.log(queue).replay()
+            if events:
+                out[queue] = events
+        return out
+
+    def drop(self):
+        """Remove the logs."""
+        with self._lock:
+            for log in self.logs.values():
+                log.close()
+            self.logs = {}
+            shutil.rmtree(self.path, ignore_errors=True)
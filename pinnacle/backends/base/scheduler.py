@@ -4,11 +4,11 @@ import typing as t
 import uuid
 from abc import abstractmethod
 from collections import defaultdict
-
-import networkx as nx
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from pinnacle import CFG, logging
 from pinnacle.backends.base.backends import BaseBackend
+from pinnacle.base import exceptions
 from pinnacle.base.base import Base
 from pinnacle.base.event import (
     Create,
@@ -44,6 +44,15 @@ class BaseScheduler(BaseBackend):
         :param events: list of events
         """
 
+    def flush(self, timeout: t.Optional[float] = None):
+        """Wait until the published events are consumed.
+
+        :param timeout: Maximum time to wait in seconds
+        """
+
+    def replay(self):
+        """Consume the events which were not consumed before a restart."""
+
     @property
     def db(self) -> 'Datalayer':
         """Get the ``db``."""
@@ -69,21 +78,27 @@ def consume_streaming_events(events, table, db, batch_execute=False):
     """
     Consumer work from streaming events.
 
-    Streaming event-types are {'insert', 'update', 'delete'}.
+    Streaming event-types are {'insert', 'update', 'delete'}. The ids of
+    the events of each type are merged, dropping repeated ids, so that
+    each id is consumed once per type.
 
     :param events: list of events.
     :param table: table on which events were found.
     :param db: Datalayer instance.
     :param batch_execute: Whether to execute events in batch.
     """
-    out = defaultdict(lambda: [])
+    # Dicts keep the first occurrence of each id, in order
+    out: t.DefaultDict[str, t.Dict[str, None]] = defaultdict(dict)
     for event in events:
-        out[event.type].append(event)
+        out[event.type].update(dict.fromkeys(event.ids))
 
-    for event_type, events in out.items():
-        ids: t.List[str] = sum([event.ids for event in events], [])
+    for event_type, ids in out.items():
         _consume_event_type(
-            event_type, ids=ids, table=table, db=db, batch_execute=batch_execute
+            event_type,
+            ids=list(ids),
+            table=table,
+            db=db,
+            batch_execute=batch_execute,
         )
 
 
@@ -111,12 +126,9 @@ def _consume_event_type(
     output_lookup: t.Dict = {}
     logging.info(f'Consuming {event_type} events on {table}')
 
-    from pinnacle.components.cdc import build_streaming_graph
+    from pinnacle.components.cdc import get_streaming_components
 
-    G = build_streaming_graph(table, db)
-
-    for huuid in nx.topological_sort(G):
-        component = G.nodes[huuid]["component"]
+    for component in get_streaming_components(table, db):
         # this is a dictionary/ mapping method_name -> future
         # try this until the dependencies are there
         input_table = component.cdc_table
@@ -146,9 +158,94 @@ def _consume_event_type(
     if batch_execute:
         db.cluster.compute.submit_jobs(jobs)
     else:
+        try:
+            execute_jobs(jobs, db, max_workers=db.cfg.streaming_max_workers)
+        finally:
+            db.cluster.compute.release_futures(context)
+
+
+def _upstream_job_ids(job: 'Job', job_ids: t.Set[str]) -> t.Set[str]:
+    # The jobs whose completion or outputs ``job`` waits for
+    upstream = {job_id for job_id in job.dependencies if job_id in job_ids}
+    for value in [*job.args, *job.kwargs.values()]:
+        if isinstance(value, Future) and value.job_id in job_ids:
+            upstream.add(value.job_id)
+    return upstream
+
+
+def execute_jobs(jobs: t.Sequence['Job'], db: 'Datalayer', max_workers: int = 1):
+    """
+    Execute jobs, each once the jobs it depends on are done.
+
+    With ``max_workers > 1`` the jobs run on a pool of threads, so that
+    jobs which don't depend on each other run concurrently and each job
+    starts as soon as its upstream jobs complete. Jobs depending on a
+    failed job are not run, and the first error is raised once the
+    running jobs are done.
+
+    Concurrent jobs share ``db``, so its data backend and metadata store
+    must be usable from several threads: this holds for the in-memory
+    metadata store and for databases reached over a connection pool, but
+    not for in-memory SQLite databases, which need ``max_workers=1``.
+    The component cache of ``db``, the streaming graphs of its metadata
+    store, the futures of ``LocalComputeBackend`` and the local vector
+    searchers are safe to share.
+
+    :param jobs: Jobs in topological order.
+    :param db: Datalayer instance.
+    :param max_workers: Maximum number of jobs run at once.
+    """
+    if max_workers <= 1 or len(jobs) <= 1:
         for job in jobs:
             job.execute(db)
-        db.cluster.compute.release_futures(context)
+        return
+
+    job_ids = {job.job_id for job in jobs}
+    waiting = {}
+    downstream = defaultdict(list)
+    for job in jobs:
+        upstream = _upstream_job_ids(job, job_ids)
+        waiting[job.job_id] = len(upstream)
+        for job_id in upstream:
+            downstream[job_id].append(job)
+
+    error = None
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(jobs)), thread_name_prefix='pinnacle-job'
+    ) as pool:
+        running = {
+            pool.submit(job.execute, db): job for job in jobs if not waiting[job.job_id]
+        }
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                for next_job in downstream[job.job_id]:
+                    waiting[next_job.job_id] -= 1
+                    if not waiting[next_job.job_id]:
+                        running[pool.submit(next_job.execute, db)] = next_job
+    if error is not None:
+        raise error
+
+
+def raise_consumer_errors(errors: t.Sequence[Exception]):
+    """
+    Raise the errors of consumers, if any.
+
+    A single error is raised as is, several as a ``ConsumerError`` holding
+    all of them.
+
+    :param errors: Errors raised by the consumers.
+    """
+    if len(errors) == 1:
+        raise errors[0]
+    if errors:
+        raise exceptions.ConsumerError(errors)
 
 
 def cluster_events(
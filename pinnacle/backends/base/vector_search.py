@@ -1,17 +1,57 @@
+import asyncio
 import enum
+import functools
+import json
+import os
+import struct
+import threading
 import typing as t
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 import numpy
 import numpy.typing
 
+from pinnacle import CFG
 from pinnacle.backends.base.backends import BaseBackend, Bookkeeping
 
 if t.TYPE_CHECKING:
     from pinnacle.base.datalayer import Datalayer
     from pinnacle.components.vector_index import VectorIndex, VectorItem
 
+_SEARCH_EXECUTOR: t.Optional[ThreadPoolExecutor] = None
+_SEARCH_EXECUTOR_LOCK = threading.Lock()
+
+
+def search_executor() -> ThreadPoolExecutor:
+    """Thread pool which runs blocking searches for the async API.
+
+    Sized by ``CFG.vector_search_max_workers``, so that any number of
+    concurrent async searches share a bounded number of threads.
+    """
+    global _SEARCH_EXECUTOR
+    with _SEARCH_EXECUTOR_LOCK:
+        if _SEARCH_EXECUTOR is None:
+            _SEARCH_EXECUTOR = ThreadPoolExecutor(
+                max_workers=CFG.vector_search_max_workers or os.cpu_count() or 1,
+                thread_name_prefix='vector-search-async',
+            )
+    return _SEARCH_EXECUTOR
+
+
+async def run_in_search_executor(f: t.Callable, *args, **kwargs):
+    """Run a blocking function on ``search_executor()`` and await its result.
+
+    :param f: Function to run
+    :param args: Positional arguments of ``f``
+    :param kwargs: Keyword arguments of ``f``
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        search_executor(), functools.partial(f, *args, **kwargs)
+    )
+
 
 class VectorSearchBackend(Bookkeeping, BaseBackend):
     """Base vector-search backend."""
@@ -68,6 +108,126 @@ class VectorSearchBackend(Bookkeeping, BaseBackend):
         :param within_ids: list of ids to search within.
         """
 
+    def find_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Find the nearest vectors to each row of a matrix of query vectors.
+
+        Backends without a native batch API fall back to one
+        ``find_nearest_from_array`` call per query.
+
+        :param h: matrix of query vectors of shape ``(n_queries, dimensions)``.
+        :param component: component class name.
+        :param vector_index: vector index identifier.
+        :param n: number of nearest vectors to return per query.
+        :param within_ids: list of ids to search within.
+        """
+        ids, scores = [], []
+        for row in numpy.asarray(h):
+            row_ids, row_scores = self.find_nearest_from_array(
+                row,
+                component=component,
+                vector_index=vector_index,
+                n=n,
+                within_ids=within_ids,
+            )
+            ids.append(row_ids)
+            scores.append(row_scores)
+        return ids, scores
+
+    async def afind_nearest_from_array(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the given vector without blocking.
+
+        Backends without a native async API run ``find_nearest_from_array``
+        on ``search_executor()``.
+
+        :param h: vector.
+        :param component: component class name.
+        :param vector_index: vector index identifier.
+        :param n: number of nearest vectors to return.
+        :param within_ids: list of ids to search within.
+        """
+        return await run_in_search_executor(
+            self.find_nearest_from_array,
+            h,
+            component=component,
+            vector_index=vector_index,
+            n=n,
+            within_ids=within_ids,
+        )
+
+    async def afind_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Find the nearest vectors to each row of a matrix without blocking.
+
+        Backends without a native async API run ``find_nearest_from_arrays``
+        on ``search_executor()``.
+
+        :param h: matrix of query vectors of shape ``(n_queries, dimensions)``.
+        :param component: component class name.
+        :param vector_index: vector index identifier.
+        :param n: number of nearest vectors to return per query.
+        :param within_ids: list of ids to search within.
+        """
+        return await run_in_search_executor(
+            self.find_nearest_from_arrays,
+            h,
+            component=component,
+            vector_index=vector_index,
+            n=n,
+            within_ids=within_ids,
+        )
+
+    async def afind_nearest_from_id(
+        self,
+        id: str,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the vector of an id without blocking.
+
+        Backends without a native async API run ``find_nearest_from_id``
+        on ``search_executor()``.
+
+        :param id: id of the vector to search with
+        :param component: component class name.
+        :param vector_index: vector index
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        return await run_in_search_executor(
+            self.find_nearest_from_id,
+            id,
+            component=component,
+            vector_index=vector_index,
+            n=n,
+            within_ids=within_ids,
+        )
+
     @abstractmethod
     def find_nearest_from_id(
         self,
@@ -150,6 +310,91 @@ class VectorSearcherInterface(ABC):
         :param within_ids: list of ids to search within
         """
 
+    def find_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Find the nearest vectors to each row of a matrix of query vectors.
+
+        Searchers without a native batch API fall back to one
+        ``find_nearest_from_array`` call per query.
+
+        :param h: matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        ids, scores = [], []
+        for row in numpy.asarray(h):
+            row_ids, row_scores = self.find_nearest_from_array(
+                row, n=n, within_ids=within_ids
+            )
+            ids.append(row_ids)
+            scores.append(row_scores)
+        return ids, scores
+
+    async def afind_nearest_from_array(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the given vector without blocking.
+
+        Searchers without a native async API run ``find_nearest_from_array``
+        on ``search_executor()``.
+
+        :param h: vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        return await run_in_search_executor(
+            self.find_nearest_from_array, h, n=n, within_ids=within_ids
+        )
+
+    async def afind_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Find the nearest vectors to each row of a matrix without blocking.
+
+        Searchers without a native async API run ``find_nearest_from_arrays``
+        on ``search_executor()``.
+
+        :param h: matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        return await run_in_search_executor(
+            self.find_nearest_from_arrays, h, n=n, within_ids=within_ids
+        )
+
+    async def afind_nearest_from_id(
+        self,
+        id: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the vector of an id without blocking.
+
+        Searchers without a native async API run ``find_nearest_from_id``
+        on ``search_executor()``.
+
+        :param id: id of the vector to search with
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        return await run_in_search_executor(
+            self.find_nearest_from_id, id, n=n, within_ids=within_ids
+        )
+
     def post_create(self):
         """Post create method.
 
@@ -288,13 +533,48 @@ class VectorItem:
         return {'id': str(self.id), 'vector': self.vector.tolist()}
 
 
+def encode_vectors(ids: t.Sequence[str], vectors: numpy.ndarray) -> bytes:
+    """Encode vectors and their ids in the binary vector format.
+
+    Used by the HTTP API and by the delta log of local indexes. The payload
+    is the length of a JSON header as little-endian ``uint32``, the header
+    with the ids and the shape, and the vectors as raw little-endian
+    ``float32``.
+
+    :param ids: IDs of the vectors
+    :param vectors: Matrix of vectors, one row per id
+    """
+    vectors = numpy.ascontiguousarray(vectors, dtype='<f4')
+    header = json.dumps({'ids': list(ids), 'shape': list(vectors.shape)}).encode()
+    return struct.pack('<I', len(header)) + header + vectors.tobytes()
+
+
+def decode_vectors(payload: bytes) -> t.Tuple[t.List[str], numpy.ndarray]:
+    """Decode vectors and their ids from the binary vector format.
+
+    :param payload: Payload created by ``encode_vectors``
+    """
+    (length,) = struct.unpack_from('<I', payload)
+    header = json.loads(payload[4 : 4 + length])
+    vectors = numpy.frombuffer(payload, dtype='<f4', offset=4 + length)
+    return header['ids'], vectors.reshape(header['shape'])
+
+
 def l2(x, y):
     """L2 function for vector similarity search.
 
     :param x: numpy.ndarray
     :param y: numpy.ndarray
     """
-    return numpy.array([-numpy.linalg.norm(x - y, axis=1)])
+    # ||x - y||^2 = ||x||^2 - 2 x.y + ||y||^2 scores a whole batch of
+    # queries with a single matrix product.
+    x = numpy.atleast_2d(x)
+    squared = (
+        numpy.sum(x**2, axis=1)[:, None]
+        - 2 * numpy.dot(x, y.T)
+        + numpy.sum(y**2, axis=1)[None, :]
+    )
+    return -numpy.sqrt(numpy.maximum(squared, 0))
 
 
 def dot(x, y):
@@ -319,3 +599,30 @@ def cosine(x, y):
 
 
 measures = {'cosine': cosine, 'dot': dot, 'l2': l2}
+
+
+def top_n(similarities: numpy.ndarray, n: int):
+    """Select the ``n`` highest scores along the last axis.
+
+    Uses ``numpy.argpartition`` so that only the ``n`` winners are sorted,
+    rather than the whole similarity vector.
+
+    :param similarities: array of scores, shape ``(n_items,)`` or
+                         ``(n_queries, n_items)``
+    :param n: number of results to keep
+    """
+    size = similarities.shape[-1]
+    n = min(n, size)
+    if n <= 0:
+        empty = similarities[..., :0]
+        return empty.astype(int), empty
+    if n < size:
+        ix = numpy.argpartition(-similarities, n - 1, axis=-1)[..., :n]
+    else:
+        ix = numpy.broadcast_to(numpy.arange(size), similarities.shape)
+    scores = numpy.take_along_axis(similarities, ix, axis=-1)
+    order = numpy.argsort(-scores, axis=-1, kind='stable')
+    return (
+        numpy.take_along_axis(ix, order, axis=-1),
+        numpy.take_along_axis(scores, order, axis=-1),
+    )
@@ -1,5 +1,16 @@
 from .cluster import LocalCluster as Cluster
 from .compute import LocalComputeBackend as ComputeBackend
+from .hnsw import HNSWVectorSearcher
+from .ivf import IVFVectorSearcher
+from .quantization import BinaryVectorSearcher, QuantizedVectorSearcher
 from .vector_search import InMemoryVectorSearcher as VectorSearcher
 
-__all__ = ["ComputeBackend", "Cluster", "VectorSearcher"]
+SEARCHERS = {
+    'inmemory': VectorSearcher,
+    'ivf': IVFVectorSearcher,
+    'hnsw': HNSWVectorSearcher,
+    'quantized': QuantizedVectorSearcher,
+    'binary': BinaryVectorSearcher,
+}
+
+__all__ = ["ComputeBackend", "Cluster", "VectorSearcher", "SEARCHERS"]
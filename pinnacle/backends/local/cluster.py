@@ -14,8 +14,10 @@ from pinnacle.backends.local.cdc import LocalCDCBackend
 from pinnacle.backends.local.compute import LocalComputeBackend
 from pinnacle.backends.local.crontab import LocalCrontabBackend
 from pinnacle.backends.local.scheduler import LocalScheduler
-from pinnacle.backends.local.vector_search import LocalVectorSearchBackend
-from pinnacle.misc.importing import load_plugin
+from pinnacle.backends.local.vector_search import (
+    LocalVectorSearchBackend,
+    load_searcher,
+)
 
 
 class LocalCluster(Cluster):
@@ -32,9 +34,7 @@ class LocalCluster(Cluster):
     @classmethod
     def build(cls, CFG, **kwargs):
         """Build the local cluster."""
-        searcher_impl = load_plugin(
-            CFG.vector_search_engine.split('://')[0]
-        ).VectorSearcher
+        searcher_impl = load_searcher(CFG.vector_search_engine)
 
         return LocalCluster(
             scheduler=LocalScheduler(),
@@ -44,6 +44,11 @@ class LocalCluster(Cluster):
             crontab=LocalCrontabBackend(),
         )
 
+    def disconnect(self):
+        """Disconnect from the cluster, consuming the published events."""
+        if isinstance(self.scheduler, LocalScheduler):
+            self.scheduler.shutdown()
+
     def drop(self, force: bool = False):
         """Drop the cluster.
 
@@ -1,8 +1,10 @@
+import threading
 import typing as t
 from collections import defaultdict
 
 from pinnacle import logging
 from pinnacle.backends.base.compute import ComputeBackend
+from pinnacle.backends.base.scheduler import execute_jobs
 from pinnacle.base.metadata import STATUS_FAILED, Job
 from pinnacle.base.status import STATUS_RUNNING, STATUS_SUCCESS
 
@@ -28,6 +30,7 @@ class LocalComputeBackend(ComputeBackend):
         self._cache: t.Dict = {}
         self._db = None
         self.futures: t.DefaultDict = defaultdict(lambda: {})
+        self._futures_lock = threading.Lock()
 
     def release_futures(self, context: str):
         """Release futures for a given context.
@@ -45,17 +48,32 @@ class LocalComputeBackend(ComputeBackend):
 
         :param job: The `Job` to be executed.
         """
-        job.args, job.kwargs = job.get_args_kwargs(self.futures[job.context])
+        # Jobs of a context may be submitted from several threads
+        with self._futures_lock:
+            futures = self.futures[job.context]
+        job.args, job.kwargs = job.get_args_kwargs(futures)
         dependencies = job.kwargs.pop('dependencies', [])
         if dependencies:
             logging.info(
                 f'Running job {job.job_id} with {len(dependencies)} dependencies'
             )
         output = job.run(db=self.db)
-        self.futures[job.context][job.job_id] = output
+        futures[job.job_id] = output
         assert job.job_id is not None
         return job.job_id
 
+    def submit_jobs(self, jobs: t.List[Job]):
+        """Run jobs, each once the jobs it depends on are done.
+
+        Jobs which don't depend on each other run concurrently, on up to
+        ``CFG.compute_max_workers`` threads. The jobs share the
+        ``Datalayer``, so more than one thread needs backends usable from
+        several threads (see ``execute_jobs``).
+
+        :param jobs: Jobs in topological order.
+        """
+        execute_jobs(jobs, self.db, max_workers=self.db.cfg.compute_max_workers)
+
     def list_components(self):
         """List all components on the compute."""
         return []
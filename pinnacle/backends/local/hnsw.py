@@ -0,0 +1,345 @@
+import heapq
+import math
+import random
+import typing as t
+
+import numpy
+
+from pinnacle.backends.base.vector_search import VectorItem
+from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+
+class HNSWVectorSearcher(InMemoryVectorSearcher):
+    """
+    Hierarchical navigable small world graph for approximate search.
+
+    Experimental: the graph is built and traversed in Python, so that
+    searches are slower than the exact search of ``InMemoryVectorSearcher``
+    at any size that fits in memory, and building the graph is slower
+    still. Use ``IVFVectorSearcher`` for faster approximate search.
+
+    Vectors are stored as in ``InMemoryVectorSearcher`` and linked into a
+    layered proximity graph as they are added. Deleted vectors stay in the
+    graph as routing nodes, but are never returned; they are unlinked and
+    their neighbours reconnected when the buffer is compacted. Upserts are
+    handled as a delete followed by an insert.
+
+    Filters selecting at most ``ef_search`` vectors, or less than
+    ``_PREFILTER_RATIO`` of the index, are searched exactly over the
+    selected vectors instead of traversing the graph.
+
+    :param identifier: Unique string identifier of index
+    :param dimensions: Dimension of the vector embeddings
+    :param measure: measure to assess similarity
+    :param component: Component class name
+    :param M: Number of links per node (``2 * M`` on the bottom layer)
+    :param ef_construction: Size of the candidate list while inserting
+    :param ef_search: Default size of the candidate list while searching
+    :param seed: Seed for drawing the layer of new nodes
+    :param dtype: Storage type of the vectors
+    :param snapshot_dir: Directory of the snapshots of the index
+    :param n_shards: Number of row shards scored concurrently by exact search
+    """
+
+    def __init__(
+        self,
+        identifier: str,
+        dimensions: int,
+        measure: str = 'cosine',
+        component: str = 'VectorIndex',
+        M: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 100,
+        seed: int = 0,
+        dtype: t.Optional[str] = None,
+        snapshot_dir: t.Optional[str] = None,
+        n_shards: int = 1,
+    ):
+        super().__init__(
+            identifier=identifier,
+            dimensions=dimensions,
+            measure=measure,
+            component=component,
+            dtype=dtype,
+            snapshot_dir=snapshot_dir,
+            n_shards=n_shards,
+        )
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+
+        self._level_mult = 1 / math.log(max(M, 2))
+        self._random = random.Random(seed)
+        # ``_links[slot][level]`` holds the neighbours of ``slot`` on ``level``
+        self._links: t.List[t.List[t.List[int]]] = []
+        self._entry: t.Optional[int] = None
+
+    def describe(self):
+        """Describe the vector index."""
+        return {
+            **super().describe(),
+            'M': self.M,
+            'ef_construction': self.ef_construction,
+            'ef_search': self.ef_search,
+        }
+
+    def _max_links(self, level: int) -> int:
+        return 2 * self.M if level == 0 else self.M
+
+    def _scores(self, q: numpy.ndarray, slots: t.List[int]) -> t.List[float]:
+        return self._similarities(q[None, :], slots)[0].tolist()
+
+    def _search_layer(
+        self,
+        q: numpy.ndarray,
+        entry: t.List[int],
+        ef: int,
+        level: int,
+        allowed: t.Optional[numpy.ndarray] = None,
+    ) -> t.List[t.Tuple[float, int]]:
+        # Nodes which are not ``allowed`` are traversed, but not returned,
+        # so that filters are applied during the search.
+        visited = set(entry)
+        candidates: t.List[t.Tuple[float, int]] = []
+        results: t.List[t.Tuple[float, int]] = []
+        for score, slot in zip(self._scores(q, entry), entry):
+            heapq.heappush(candidates, (-score, slot))
+            if allowed is None or allowed[slot]:
+                heapq.heappush(results, (score, slot))
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            score, slot = heapq.heappop(candidates)
+            if len(results) >= ef and -score < results[0][0]:
+                break
+            neighbours = [x for x in self._links[slot][level] if x not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            for score, x in zip(self._scores(q, neighbours), neighbours):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, x))
+                    if allowed is None or allowed[x]:
+                        heapq.heappush(results, (score, x))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _select(self, found: t.List[t.Tuple[float, int]], m: int) -> t.List[int]:
+        # Neighbour selection heuristic: a candidate is kept only if it is
+        # closer to the new node than to every neighbour kept so far, which
+        # keeps links between clusters. Pruned candidates fill any spare links.
+        if len(found) <= m:
+            return [x for _, x in found]
+        slots = [x for _, x in found]
+        assert self._buffer is not None
+        vectors = self._buffer[slots]
+        pairwise = self.measure(vectors, vectors)
+        selected: t.List[int] = []
+        pruned: t.List[int] = []
+        for i, (score, _) in enumerate(found):
+            if len(selected) >= m:
+                break
+            if all(pairwise[i, j] < score for j in selected):
+                selected.append(i)
+            else:
+                pruned.append(i)
+        selected.extend(pruned[: m - len(selected)])
+        return [slots[i] for i in selected]
+
+    def _prune(self, slot: int, level: int):
+        links = self._links[slot][level]
+        if len(links) <= self._max_links(level):
+            return
+        assert self._buffer is not None
+        scores = self._scores(self._buffer[slot], links)
+        found = sorted(zip(scores, links), reverse=True)
+        self._links[slot][level] = self._select(found, self._max_links(level))
+
+    def _insert(self, slot: int):
+        level = int(-math.log(1 - self._random.random()) * self._level_mult)
+        self._links.append([[] for _ in range(level + 1)])
+        if self._entry is None:
+            self._entry = slot
+            return
+
+        assert self._buffer is not None
+        q = self._buffer[slot]
+        top = len(self._links[self._entry]) - 1
+        entry = [self._entry]
+        for lev in range(top, level, -1):
+            entry = [self._search_layer(q, entry, 1, lev)[0][1]]
+
+        live = ~self._deleted if self._n_deleted else None
+        for lev in range(min(level, top), -1, -1):
+            found = self._search_layer(q, entry, self.ef_construction, lev, live)
+            if not found:
+                found = self._search_layer(q, entry, self.ef_construction, lev)
+            neighbours = self._select(found, self.M)
+            self._links[slot][lev] = neighbours
+            for x in neighbours:
+                self._links[x][lev].append(slot)
+                self._prune(x, lev)
+            entry = [x for _, x in found]
+
+        if level > top:
+            self._entry = slot
+
+    def _add(self, items: t.Sequence[VectorItem]) -> numpy.ndarray:
+        existing = [item.id for item in items if item.id in self.lookup]
+        if existing:
+            self._delete(existing)
+        slots = super()._add(items)
+        for slot in slots.tolist():
+            assert slot == len(self._links)
+            self._insert(slot)
+        return slots
+
+    def _state(self) -> t.Dict[str, numpy.ndarray]:
+        # The links are flattened into the number of levels of each node,
+        # the number of links of each node and level, and the links
+        if self._entry is None:
+            return {}
+        return {
+            'hnsw_levels': numpy.array(
+                [len(node) for node in self._links], dtype=numpy.int64
+            ),
+            'hnsw_counts': numpy.array(
+                [len(links) for node in self._links for links in node],
+                dtype=numpy.int64,
+            ),
+            'hnsw_links': numpy.array(
+                [x for node in self._links for links in node for x in links],
+                dtype=numpy.int64,
+            ),
+            'hnsw_entry': numpy.array([self._entry], dtype=numpy.int64),
+        }
+
+    def _restore(
+        self,
+        vectors: numpy.ndarray,
+        ids: t.List[str],
+        state: t.Dict[str, numpy.ndarray],
+    ):
+        super()._restore(vectors, ids, state)
+        self._links = []
+        self._entry = None
+        if 'hnsw_levels' not in state or len(state['hnsw_levels']) != self._size:
+            # Snapshots without the graph: rebuild it from the vectors
+            for slot in range(self._size):
+                self._insert(slot)
+            return
+
+        flat = state['hnsw_links'].tolist()
+        counts = iter(state['hnsw_counts'].tolist())
+        start = 0
+        for n_levels in state['hnsw_levels'].tolist():
+            node = []
+            for _ in range(n_levels):
+                count = next(counts)
+                node.append(flat[start : start + count])
+                start += count
+            self._links.append(node)
+        self._entry = int(state['hnsw_entry'][0])
+
+    def compact(self):
+        """Unlink deleted vectors from the graph and remove them from the buffer."""
+        with self._lock:
+            if not self._n_deleted:
+                return
+            deleted = self._deleted[: self._size]
+            keep = numpy.flatnonzero(~deleted)
+
+            # Replace links to deleted nodes with the best live nodes within
+            # two hops; live links are kept, as they may bridge clusters
+            repaired = []
+            for slot in keep.tolist():
+                for level, links in enumerate(self._links[slot]):
+                    if not any(deleted[x] for x in links):
+                        continue
+                    live = [x for x in links if not deleted[x]]
+                    candidates = set()
+                    for x in links:
+                        candidates.update(self._links[x][level])
+                    candidates.difference_update(live)
+                    candidates.discard(slot)
+                    candidates = [x for x in candidates if not deleted[x]]
+                    scores = self._scores(self._buffer[slot], candidates)
+                    found = sorted(zip(scores, candidates), reverse=True)
+                    found = found[: self.ef_construction]
+                    spare = self._max_links(level) - len(live)
+                    repaired.append((slot, level, live + self._select(found, spare)))
+            for slot, level, links in repaired:
+                self._links[slot][level] = links
+            for slot, level, links in repaired:
+                for x in links:
+                    if slot not in self._links[x][level]:
+                        self._links[x][level].append(slot)
+                        self._prune(x, level)
+
+            remap = numpy.full(self._size, -1, dtype=numpy.int64)
+            remap[keep] = numpy.arange(len(keep))
+            remap_list = remap.tolist()
+            self._links = [
+                [[remap_list[x] for x in links] for links in self._links[slot]]
+                for slot in keep.tolist()
+            ]
+            self._entry = None
+            if len(keep):
+                self._entry = max(
+                    range(len(keep)), key=lambda slot: len(self._links[slot])
+                )
+            super().compact()
+
+    def find_nearest_from_array(self, h, n=100, within_ids=None, ef_search=None):
+        """Find the nearest vectors to the given vector.
+
+        :param h: vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of IDs to search within
+        :param ef_search: size of the candidate list (default: ``self.ef_search``)
+        """
+        ids, scores = self.find_nearest_from_arrays(
+            self.to_numpy(h)[None, :], n=n, within_ids=within_ids, ef_search=ef_search
+        )
+        if not ids:
+            return [], []
+        return ids[0], scores[0]
+
+    def find_nearest_from_arrays(self, h, n=100, within_ids=None, ef_search=None):
+        """Find the nearest vectors to each row of a matrix of query vectors.
+
+        :param h: matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of IDs to search within
+        :param ef_search: size of the candidate list (default: ``self.ef_search``)
+        """
+        with self._lock:
+            self.post_create()
+            if self.h is None:
+                return super().find_nearest_from_arrays(h, n=n, within_ids=within_ids)
+
+            ef = max(ef_search or self.ef_search, n)
+            allowed = ~self._deleted
+            if within_ids:
+                slots, allowed = self._filter(within_ids)
+                if len(slots) <= ef or len(slots) < self._PREFILTER_RATIO * self._size:
+                    # Traversing the graph would visit most of it to find
+                    # so few allowed nodes
+                    return super().find_nearest_from_arrays(
+                        h, n=n, within_ids=within_ids
+                    )
+
+            h = numpy.atleast_2d(self.to_numpy(h))
+            top = len(self._links[self._entry]) - 1
+
+            ids, scores = [], []
+            for q in h:
+                entry = [self._entry]
+                for level in range(top, 0, -1):
+                    entry = [self._search_layer(q, entry, 1, level)[0][1]]
+                found = self._search_layer(q, entry, ef, 0, allowed)[:n]
+                ids.append([self.index[x] for _, x in found])
+                scores.append([score for score, _ in found])
+            return ids, scores
@@ -0,0 +1,313 @@
+import typing as t
+
+import numpy
+
+from pinnacle import logging
+from pinnacle.backends.base.vector_search import VectorItem, top_n
+from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+_ASSIGN_CHUNK = 65536
+
+
+def assign_nearest(x: numpy.ndarray, centroids: numpy.ndarray) -> numpy.ndarray:
+    """Assign each row of ``x`` to its nearest centroid in L2 distance.
+
+    :param x: matrix of vectors of shape ``(n, dimensions)``
+    :param centroids: matrix of centroids of shape ``(k, dimensions)``
+    """
+    c2 = numpy.sum(centroids**2, axis=1)[None, :]
+    out = numpy.empty(x.shape[0], dtype=numpy.int64)
+    for i in range(0, x.shape[0], _ASSIGN_CHUNK):
+        chunk = x[i : i + _ASSIGN_CHUNK]
+        out[i : i + _ASSIGN_CHUNK] = numpy.argmin(
+            c2 - 2 * numpy.dot(chunk, centroids.T), axis=1
+        )
+    return out
+
+
+def kmeans(x: numpy.ndarray, k: int, n_iter: int = 10, seed: int = 0) -> numpy.ndarray:
+    """Train ``k`` centroids on ``x`` with Lloyd's algorithm.
+
+    Empty clusters are re-seeded with random points of ``x``.
+
+    :param x: matrix of training vectors of shape ``(n, dimensions)``
+    :param k: number of centroids
+    :param n_iter: number of iterations
+    :param seed: seed of the random number generator
+    """
+    rng = numpy.random.default_rng(seed)
+    k = min(k, x.shape[0])
+    x = x.astype(numpy.float64, copy=False)
+    centroids = x[rng.choice(x.shape[0], k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = assign_nearest(x, centroids)
+        counts = numpy.bincount(assign, minlength=k)
+        sums = numpy.zeros_like(centroids)
+        numpy.add.at(sums, assign, x)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        if not nonempty.all():
+            n_empty = int((~nonempty).sum())
+            centroids[~nonempty] = x[rng.choice(x.shape[0], n_empty)]
+    return centroids
+
+
+class IVFVectorSearcher(InMemoryVectorSearcher):
+    """
+    Inverted-file approximate nearest-neighbour search.
+
+    Vectors are partitioned into ``n_lists`` lists by k-means; a query only
+    scores the vectors in the ``nprobe`` lists whose centroids are closest
+    to it. Until ``min_train_size`` vectors have been added, search is
+    exact. The quantizer is retrained when the index has doubled in size,
+    or when the largest list has grown ``imbalance`` times more skewed
+    than after the last training.
+
+    :param identifier: Unique string identifier of index
+    :param dimensions: Dimension of the vector embeddings
+    :param measure: measure to assess similarity
+    :param component: Component class name
+    :param n_lists: Number of inverted lists (default: square root of
+                    the index size at training time)
+    :param nprobe: Number of lists to scan per query
+    :param min_train_size: Minimum number of vectors before training
+    :param imbalance: Growth of list skew which triggers a retrain
+    :param n_iter: Number of k-means iterations
+    :param dtype: Storage type of the vectors
+    :param snapshot_dir: Directory of the snapshots of the index
+    :param n_shards: Number of row shards scored concurrently by exact search
+    """
+
+    def __init__(
+        self,
+        identifier: str,
+        dimensions: int,
+        measure: str = 'cosine',
+        component: str = 'VectorIndex',
+        n_lists: t.Optional[int] = None,
+        nprobe: int = 8,
+        min_train_size: int = 4096,
+        imbalance: float = 2.0,
+        n_iter: int = 10,
+        dtype: t.Optional[str] = None,
+        snapshot_dir: t.Optional[str] = None,
+        n_shards: int = 1,
+    ):
+        super().__init__(
+            identifier=identifier,
+            dimensions=dimensions,
+            measure=measure,
+            component=component,
+            dtype=dtype,
+            snapshot_dir=snapshot_dir,
+            n_shards=n_shards,
+        )
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.imbalance = imbalance
+        self.n_iter = n_iter
+
+        self._centroids: t.Optional[numpy.ndarray] = None
+        self._probe_centroids: t.Optional[numpy.ndarray] = None
+        self._assign = numpy.zeros(0, dtype=numpy.int64)
+        self._lists: t.List[t.List[int]] = []
+        self._list_arrays: t.Dict[int, numpy.ndarray] = {}
+        self._assigned_up_to = 0
+        self._trained_size = 0
+        self._trained_skew = 0.0
+
+    @property
+    def trained(self) -> bool:
+        """Whether the coarse quantizer has been trained."""
+        return self._centroids is not None
+
+    def describe(self):
+        """Describe the vector index."""
+        return {
+            **super().describe(),
+            'n_lists': len(self._lists),
+            'nprobe': self.nprobe,
+        }
+
+    def _reserve(self, size: int, dtype):
+        super()._reserve(size, dtype)
+        assert self._buffer is not None
+        if self._assign.shape[0] < self._buffer.shape[0]:
+            assign = numpy.zeros(self._buffer.shape[0], dtype=numpy.int64)
+            assign[: self._assign.shape[0]] = self._assign
+            self._assign = assign
+
+    def _add(self, items: t.Sequence[VectorItem]) -> numpy.ndarray:
+        slots = super()._add(items)
+        if not len(slots):
+            return slots
+        if self.trained:
+            self._assign_slots(slots)
+        if self._needs_training():
+            self.train()
+        return slots
+
+    def _state(self) -> t.Dict[str, numpy.ndarray]:
+        if not self.trained:
+            return {}
+        assert self._centroids is not None
+        return {
+            'ivf_centroids': self._centroids,
+            'ivf_assign': self._assign[: self._size],
+            'ivf_trained': numpy.array([self._trained_size, self._trained_skew]),
+        }
+
+    def _restore(
+        self,
+        vectors: numpy.ndarray,
+        ids: t.List[str],
+        state: t.Dict[str, numpy.ndarray],
+    ):
+        super()._restore(vectors, ids, state)
+        self._assign = numpy.zeros(len(ids), dtype=numpy.int64)
+        self._centroids = None
+        self._probe_centroids = None
+        self._lists = []
+        self._list_arrays = {}
+        self._assigned_up_to = 0
+        if 'ivf_centroids' in state and len(state['ivf_assign']) == self._size:
+            self._set_centroids(state['ivf_centroids'])
+            self._assign[:] = state['ivf_assign']
+            self._build_lists(self._size)
+            trained_size, self._trained_skew = state['ivf_trained'].tolist()
+            self._trained_size = int(trained_size)
+        if self._needs_training():
+            self.train()
+
+    def _set_centroids(self, centroids: numpy.ndarray):
+        self._centroids = centroids
+        self._probe_centroids = centroids
+        if self.measure_name == 'cosine':
+            norms = numpy.linalg.norm(centroids, axis=1)[:, None]
+            self._probe_centroids = centroids / numpy.maximum(norms, 1e-12)
+
+    def _build_lists(self, size: int):
+        # The lists of the first ``size`` slots, from their assignments
+        assert self._centroids is not None
+        self._lists = [[] for _ in range(len(self._centroids))]
+        for slot, c in enumerate(self._assign[:size].tolist()):
+            self._lists[c].append(slot)
+        self._list_arrays = {}
+        self._assigned_up_to = size
+
+    def _assign_slots(self, slots: numpy.ndarray):
+        moved = slots[slots < self._assigned_up_to]
+        for slot, old in zip(moved.tolist(), self._assign[moved].tolist()):
+            self._lists[old].remove(slot)
+            self._list_arrays.pop(old, None)
+
+        assert self._buffer is not None and self._centroids is not None
+        lists = assign_nearest(self._buffer[slots], self._centroids)
+        self._assign[slots] = lists
+        for slot, c in zip(slots.tolist(), lists.tolist()):
+            self._lists[c].append(slot)
+            self._list_arrays.pop(c, None)
+        self._assigned_up_to = max(self._assigned_up_to, int(slots.max()) + 1)
+
+    def _skew(self) -> float:
+        sizes = numpy.array([len(x) for x in self._lists])
+        return float(sizes.max() / max(sizes.mean(), 1))
+
+    def _needs_training(self) -> bool:
+        if len(self) < self.min_train_size:
+            return False
+        if not self.trained:
+            return True
+        if len(self) > 2 * self._trained_size:
+            return True
+        return self._skew() > self.imbalance * self._trained_skew
+
+    def train(self):
+        """Train the coarse quantizer and assign all vectors to lists."""
+        live = numpy.flatnonzero(~self._deleted[: self._size])
+        n_lists = self.n_lists or max(1, int(numpy.sqrt(len(live))))
+        n_lists = min(n_lists, len(live))
+        rng = numpy.random.default_rng(0)
+        sample = live
+        if len(live) > 256 * n_lists:
+            sample = rng.choice(live, 256 * n_lists, replace=False)
+
+        logging.info(
+            f'Training IVF quantizer of {self.identifier} with {n_lists} lists '
+            f'on {len(sample)} vectors'
+        )
+        self._set_centroids(kmeans(self._buffer[sample], n_lists, n_iter=self.n_iter))
+
+        self._lists = [[] for _ in range(n_lists)]
+        self._list_arrays = {}
+        self._assigned_up_to = 0
+        self._assign_slots(numpy.arange(self._size))
+        self._trained_size = len(self)
+        self._trained_skew = self._skew()
+
+    def compact(self):
+        """Remove rows marked as deleted from the buffer."""
+        with self._lock:
+            if not self._n_deleted:
+                return
+            keep = numpy.flatnonzero(~self._deleted[: self._size])
+            assign = self._assign[keep]
+            super().compact()
+            if not self.trained:
+                return
+            self._assign[: len(keep)] = assign
+            self._build_lists(len(keep))
+
+    def _list_array(self, c: int) -> numpy.ndarray:
+        try:
+            return self._list_arrays[c]
+        except KeyError:
+            out = numpy.array(self._lists[c], dtype=numpy.int64)
+            self._list_arrays[c] = out
+            return out
+
+    def find_nearest_from_array(self, h, n=100, within_ids=None, nprobe=None):
+        """Find the nearest vectors to the given vector.
+
+        :param h: vector
+        :param n: number of nearest vectors to return
+        :param within_ids: list of IDs to search within
+        :param nprobe: number of lists to scan (default: ``self.nprobe``)
+        """
+        ids, scores = self.find_nearest_from_arrays(
+            self.to_numpy(h)[None, :], n=n, within_ids=within_ids, nprobe=nprobe
+        )
+        if not ids:
+            return [], []
+        return ids[0], scores[0]
+
+    def find_nearest_from_arrays(self, h, n=100, within_ids=None, nprobe=None):
+        """Find the nearest vectors to each row of a matrix of query vectors.
+
+        Searches restricted by ``within_ids`` are exact over those ids.
+
+        :param h: matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of IDs to search within
+        :param nprobe: number of lists to scan (default: ``self.nprobe``)
+        """
+        with self._lock:
+            self.post_create()
+            if within_ids or not self.trained or self.h is None:
+                return super().find_nearest_from_arrays(h, n=n, within_ids=within_ids)
+
+            h = numpy.atleast_2d(self.to_numpy(h))
+            nprobe = min(nprobe or self.nprobe, len(self._lists))
+            probes, _ = top_n(self.measure(h, self._probe_centroids), nprobe)
+
+            ids, scores = [], []
+            for query, lists in zip(h, probes.tolist()):
+                candidates = numpy.concatenate([self._list_array(c) for c in lists])
+                if self._n_deleted:
+                    candidates = candidates[~self._deleted[candidates]]
+                similarities = self._similarities(query[None, :], candidates)
+                ix, top_scores = top_n(similarities[0], n)
+                ids.append([self.index[i] for i in candidates[ix].tolist()])
+                scores.append(top_scores.tolist())
+            return ids, scores
@@ -0,0 +1,447 @@
+import os
+import shutil
+import tempfile
+import typing as t
+import weakref
+
+import numpy
+
+from pinnacle import logging
+from pinnacle.backends.base.vector_search import VectorItem, top_n
+from pinnacle.backends.local.ivf import assign_nearest, kmeans
+from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+QUANTIZATIONS = ('int8', 'pq', 'binary')
+
+# Number of set bits of each byte
+_POPCOUNT = numpy.array([bin(i).count('1') for i in range(256)], dtype=numpy.uint8)
+
+
+def hamming(codes: numpy.ndarray, query: numpy.ndarray) -> numpy.ndarray:
+    """Hamming distances between packed bit codes and one packed query.
+
+    :param codes: matrix of packed bits of shape ``(n, n_bytes)``
+    :param query: packed bits of shape ``(n_bytes,)``
+    """
+    x = numpy.bitwise_xor(codes, query)
+    if hasattr(numpy, 'bitwise_count'):
+        bits = numpy.bitwise_count(x)
+    else:
+        bits = _POPCOUNT[x]
+    return bits.sum(axis=1, dtype=numpy.int32)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class QuantizedVectorSearcher(InMemoryVectorSearcher):
+    """
+    In-process vector index holding compressed vectors in memory.
+
+    The full-precision vectors are kept in a memory-mapped file under
+    ``directory``, so that only the compressed codes take up memory. The
+    file is removed once its buffer is garbage-collected, and a temporary
+    ``directory`` once the searcher is:
+
+    - ``'int8'``: scalar quantization of each dimension to one byte, with a
+      per-dimension scale and offset (4x smaller than ``float32``).
+    - ``'pq'``: product quantization of ``n_subvectors`` sub-vectors to one
+      byte each with trained codebooks, scored with asymmetric distance
+      tables.
+    - ``'binary'``: one sign bit per dimension of the centred vectors (32x
+      smaller than ``float32``), scored by Hamming distance; ``cosine``
+      only.
+
+    Until ``min_train_size`` vectors have been added, search is exact.
+    The best ``rerank * n`` candidates by approximate score are re-scored
+    against the full-precision vectors; ``rerank=0`` returns the
+    approximate scores.
+
+    :param identifier: Unique string identifier of index
+    :param dimensions: Dimension of the vector embeddings
+    :param measure: measure to assess similarity
+    :param component: Component class name
+    :param quantization: ``'int8'``, ``'pq'`` or ``'binary'``
+    :param n_subvectors: Number of sub-vectors of product quantization
+                         (default: one per 4 dimensions)
+    :param rerank: Number of candidates per result to re-score exactly
+    :param min_train_size: Minimum number of vectors before training
+    :param directory: Directory of the full-precision vectors
+                      (default: a temporary directory, removed with
+                      the searcher)
+    :param dtype: Storage type of the full-precision vectors
+    :param snapshot_dir: Directory of the snapshots of the index
+    :param n_shards: Number of row shards scored concurrently by exact search
+    """
+
+    _TRAIN_SIZE: t.ClassVar[int] = 16384
+
+    def __init__(
+        self,
+        identifier: str,
+        dimensions: int,
+        measure: str = 'cosine',
+        component: str = 'VectorIndex',
+        quantization: str = 'int8',
+        n_subvectors: t.Optional[int] = None,
+        rerank: int = 4,
+        min_train_size: int = 4096,
+        directory: t.Optional[str] = None,
+        dtype: t.Optional[str] = 'float32',
+        snapshot_dir: t.Optional[str] = None,
+        n_shards: int = 1,
+    ):
+        super().__init__(
+            identifier=identifier,
+            dimensions=dimensions,
+            measure=measure,
+            component=component,
+            dtype=dtype,
+            snapshot_dir=snapshot_dir,
+            n_shards=n_shards,
+        )
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f'Unknown quantization {quantization!r}; '
+                f'expected one of {QUANTIZATIONS}'
+            )
+        if quantization == 'binary' and self.measure_name != 'cosine':
+            raise ValueError(
+                f'Binary quantization requires measure=\'cosine\', '
+                f'got {self.measure_name!r}'
+            )
+        if n_subvectors is None:
+            n_subvectors = next(
+                m for m in range(max(dimensions // 4, 1), 0, -1) if dimensions % m == 0
+            )
+        if dimensions % n_subvectors:
+            raise ValueError(
+                f'n_subvectors={n_subvectors} does not divide dimensions={dimensions}'
+            )
+        self.quantization = quantization
+        self.n_subvectors = n_subvectors
+        self.rerank = rerank
+        self.min_train_size = min_train_size
+
+        self.directory = directory
+        self._path: t.Optional[str] = None
+        self._cleanup: t.Optional[weakref.finalize] = None
+
+        self._codes: t.Optional[numpy.ndarray] = None
+        # int8: per-dimension offset and scale, and squared norms of the
+        # decoded vectors for l2; binary: per-dimension offset
+        self._offset: t.Optional[numpy.ndarray] = None
+        self._scale: t.Optional[numpy.ndarray] = None
+        self._norms = numpy.zeros(0, dtype=numpy.float32)
+        # pq: codebooks of shape (n_subvectors, n_centroids, sub-dimensions)
+        self._codebooks: t.Optional[numpy.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        """Whether the quantizer has been trained."""
+        return self._codes is not None
+
+    def describe(self):
+        """Describe the vector index."""
+        return {
+            **super().describe(),
+            'quantization': self.quantization,
+            'trained': self.trained,
+            'nbytes': self._codes[: self._size].nbytes if self.trained else 0,
+        }
+
+    def drop(self):
+        """Drop the vector index."""
+        super().drop()
+        self._buffer = None
+        if self._path is not None:
+            _remove(self._path)
+        if self._cleanup is not None:
+            self._cleanup()
+
+    def _allocate(self, capacity: int, dtype) -> numpy.ndarray:
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='pinnacle-vectors-')
+            self._cleanup = weakref.finalize(
+                self, shutil.rmtree, self.directory, ignore_errors=True
+            )
+        os.makedirs(self.directory, exist_ok=True)
+        self._path = os.path.join(self.directory, f'{self.identifier}.{capacity}.mmap')
+        buffer = numpy.memmap(
+            self._path, dtype=dtype, mode='w+', shape=(capacity, self.dimensions)
+        )
+        weakref.finalize(buffer, _remove, self._path)
+        return buffer
+
+    def _reserve(self, size: int, dtype):
+        path = self._path
+        super()._reserve(size, dtype)
+        assert self._buffer is not None
+        if path is not None and path != self._path:
+            _remove(path)
+        if self._codes is not None and self._codes.shape[0] < self._buffer.shape[0]:
+            codes = numpy.zeros(
+                (self._buffer.shape[0], self._codes.shape[1]), dtype=numpy.uint8
+            )
+            codes[: self._codes.shape[0]] = self._codes
+            self._codes = codes
+            norms = numpy.zeros(self._buffer.shape[0], dtype=numpy.float32)
+            norms[: self._norms.shape[0]] = self._norms
+            self._norms = norms
+
+    def _add(self, items: t.Sequence[VectorItem]) -> numpy.ndarray:
+        slots = super()._add(items)
+        if not len(slots):
+            return slots
+        if self.trained:
+            self._encode(slots)
+        elif len(self) >= self.min_train_size:
+            self.train()
+        return slots
+
+    def _state(self) -> t.Dict[str, numpy.ndarray]:
+        if not self.trained:
+            return {}
+        assert self._codes is not None
+        state = {
+            'quantized_quantization': numpy.array(self.quantization),
+            'quantized_codes': self._codes[: self._size],
+            'quantized_norms': self._norms[: self._size],
+        }
+        for name in ('offset', 'scale', 'codebooks'):
+            value = getattr(self, f'_{name}')
+            if value is not None:
+                state[f'quantized_{name}'] = value
+        return state
+
+    def _restore(
+        self,
+        vectors: numpy.ndarray,
+        ids: t.List[str],
+        state: t.Dict[str, numpy.ndarray],
+    ):
+        super()._restore(vectors, ids, state)
+        self._codes = None
+        if (
+            'quantized_codes' in state
+            and str(state['quantized_quantization']) == self.quantization
+            and state['quantized_codes'].shape == (self._size, self._code_width())
+        ):
+            self._codes = state['quantized_codes']
+            self._norms = state['quantized_norms']
+            self._offset = state.get('quantized_offset')
+            self._scale = state.get('quantized_scale')
+            self._codebooks = state.get('quantized_codebooks')
+        elif len(self) >= self.min_train_size:
+            self.train()
+
+    def _code_width(self) -> int:
+        if self.quantization == 'binary':
+            return (self.dimensions + 7) // 8
+        if self.quantization == 'int8':
+            return self.dimensions
+        return self.n_subvectors
+
+    def train(self):
+        """Train the quantizer and encode all vectors."""
+        live = numpy.flatnonzero(~self._deleted[: self._size])
+        sample = live
+        if len(live) > self._TRAIN_SIZE:
+            rng = numpy.random.default_rng(0)
+            sample = numpy.sort(rng.choice(live, self._TRAIN_SIZE, replace=False))
+        x = numpy.asarray(self._buffer[sample], dtype=numpy.float32)
+        logging.info(
+            f'Training {self.quantization} quantizer of {self.identifier} '
+            f'on {len(sample)} vectors'
+        )
+
+        if self.quantization == 'binary':
+            self._offset = self._normalize(x).mean(axis=0)
+        elif self.quantization == 'int8':
+            self._offset = x.min(axis=0)
+            scale = (x.max(axis=0) - self._offset) / 255
+            self._scale = numpy.where(scale > 0, scale, 1).astype(numpy.float32)
+        else:
+            sub = x.reshape(len(x), self.n_subvectors, -1)
+            self._codebooks = numpy.stack(
+                [
+                    kmeans(sub[:, j], 256, n_iter=10).astype(numpy.float32)
+                    for j in range(self.n_subvectors)
+                ]
+            )
+
+        capacity = self._buffer.shape[0]
+        self._codes = numpy.zeros((capacity, self._code_width()), dtype=numpy.uint8)
+        self._norms = numpy.zeros(capacity, dtype=numpy.float32)
+        for i in range(0, self._size, self._SCORE_CHUNK):
+            self._encode(numpy.arange(i, min(i + self._SCORE_CHUNK, self._size)))
+
+    def _encode(self, slots: numpy.ndarray):
+        assert self._buffer is not None and self._codes is not None
+        x = numpy.asarray(self._buffer[slots], dtype=numpy.float32)
+        if self.quantization == 'binary':
+            self._codes[slots] = self._binarize(x)
+            return
+        if self.quantization == 'int8':
+            assert self._offset is not None and self._scale is not None
+            codes = numpy.clip(numpy.rint((x - self._offset) / self._scale), 0, 255)
+            self._codes[slots] = codes
+            decoded = self._offset + self._scale * codes
+        else:
+            assert self._codebooks is not None
+            sub = x.reshape(len(x), self.n_subvectors, -1)
+            for j in range(self.n_subvectors):
+                self._codes[slots, j] = assign_nearest(sub[:, j], self._codebooks[j])
+            decoded = self._codebooks[
+                numpy.arange(self.n_subvectors), self._codes[slots]
+            ].reshape(len(x), -1)
+        self._norms[slots] = numpy.sum(decoded**2, axis=1)
+
+    def _normalize(self, x: numpy.ndarray) -> numpy.ndarray:
+        if self.measure_name != 'cosine':
+            return x
+        return x / numpy.maximum(numpy.linalg.norm(x, axis=1), 1e-12)[:, None]
+
+    def _binarize(self, x: numpy.ndarray) -> numpy.ndarray:
+        return numpy.packbits(self._normalize(x) > self._offset, axis=1)
+
+    def _approximate(self, h: numpy.ndarray, codes, norms) -> numpy.ndarray:
+        h = h.astype(numpy.float32)
+        if self.quantization == 'binary':
+            # The angle between two vectors is estimated as pi times the
+            # fraction of differing sign bits
+            distances = numpy.stack([hamming(codes, q) for q in self._binarize(h)])
+            return numpy.cos(numpy.pi * distances / self.dimensions)
+
+        if self.measure_name == 'cosine':
+            h = h / numpy.linalg.norm(h, axis=1)[:, None]
+
+        if self.quantization == 'int8':
+            # x ~ offset + scale * code
+            dot = (h @ self._offset)[:, None] + (h * self._scale) @ codes.T.astype(
+                numpy.float32
+            )
+        else:
+            # Asymmetric distance tables: the score of each query sub-vector
+            # against each centroid, summed over the codes of every vector.
+            assert self._codebooks is not None
+            n_centroids = self._codebooks.shape[1]
+            sub = h.reshape(len(h), self.n_subvectors, -1)
+            tables = numpy.einsum('qjd,jcd->qjc', sub, self._codebooks)
+            flat = codes.astype(numpy.intp) + n_centroids * numpy.arange(
+                self.n_subvectors
+            )
+            dot = numpy.stack([table.ravel()[flat].sum(axis=1) for table in tables])
+
+        if self.measure_name == 'l2':
+            squared = numpy.sum(h**2, axis=1)[:, None] - 2 * dot + norms[None, :]
+            return -numpy.sqrt(numpy.maximum(squared, 0))
+        return dot
+
+    def _similarities(self, h, ix=None):
+        if not self.trained:
+            return super()._similarities(h, ix)
+        codes = self._codes[: self._size] if ix is None else self._codes[ix]
+        norms = self._norms[: self._size] if ix is None else self._norms[ix]
+        return numpy.concatenate(
+            [
+                self._approximate(
+                    h,
+                    codes[i : i + self._SCORE_CHUNK],
+                    norms[i : i + self._SCORE_CHUNK],
+                )
+                for i in range(0, codes.shape[0], self._SCORE_CHUNK)
+            ],
+            axis=1,
+        )
+
+    def _search(self, h, n, within_ids=None):
+        if not self.trained or not self.rerank:
+            return super()._search(h, n, within_ids)
+
+        candidates, _ = super()._search(h, n * self.rerank, within_ids)
+        slots, scores = [], []
+        for query, row in zip(h, candidates):
+            exact = self.measure(
+                query[None, :], numpy.asarray(self._buffer[row], dtype=numpy.float32)
+            )
+            ix, row_scores = top_n(exact[0], n)
+            slots.append(row[ix])
+            scores.append(row_scores)
+        return numpy.stack(slots), numpy.stack(scores)
+
+    def compact(self):
+        """Remove rows marked as deleted from the buffer and the codes."""
+        with self._lock:
+            if not self._n_deleted:
+                return
+            keep = numpy.flatnonzero(~self._deleted[: self._size])
+            super().compact()
+            if self.trained:
+                self._codes[: len(keep)] = self._codes[keep]
+                self._norms[: len(keep)] = self._norms[keep]
+
+
+class BinaryVectorSearcher(QuantizedVectorSearcher):
+    """
+    Sign-bit quantized index for cosine similarity.
+
+    A ``QuantizedVectorSearcher`` with ``quantization='binary'``: vectors
+    are held in memory as packed sign bits, the whole index is pre-scanned
+    by Hamming distance, and the best ``oversample * n`` candidates are
+    re-ranked with exact cosine similarity against the memory-mapped
+    full-precision vectors.
+
+    :param identifier: Unique string identifier of index
+    :param dimensions: Dimension of the vector embeddings
+    :param measure: measure to assess similarity (only ``'cosine'``)
+    :param component: Component class name
+    :param oversample: Number of candidates per result to re-rank exactly
+    :param min_train_size: Minimum number of vectors before training
+    :param directory: Directory of the full-precision vectors
+                      (default: a temporary directory, removed with
+                      the searcher)
+    :param dtype: Storage type of the full-precision vectors
+    :param snapshot_dir: Directory of the snapshots of the index
+    :param n_shards: Number of row shards scored concurrently by exact search
+    """
+
+    def __init__(
+        self,
+        identifier: str,
+        dimensions: int,
+        measure: str = 'cosine',
+        component: str = 'VectorIndex',
+        oversample: int = 10,
+        min_train_size: int = 1024,
+        directory: t.Optional[str] = None,
+        dtype: t.Optional[str] = 'float32',
+        snapshot_dir: t.Optional[str] = None,
+        n_shards: int = 1,
+    ):
+        super().__init__(
+            identifier=identifier,
+            dimensions=dimensions,
+            measure=measure,
+            component=component,
+            quantization='binary',
+            rerank=oversample,
+            min_train_size=min_train_size,
+            directory=directory,
+            dtype=dtype,
+            snapshot_dir=snapshot_dir,
+            n_shards=n_shards,
+        )
+
+    @property
+    def oversample(self) -> int:
+        """Number of candidates per result re-ranked exactly."""
+        return self.rerank
+
+    @oversample.setter
+    def oversample(self, value: int):
+        self.rerank = value
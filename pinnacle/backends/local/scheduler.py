@@ -1,12 +1,16 @@
 import threading
+import time
 import typing as t
 
+from pinnacle import CFG, logging
 from pinnacle.backends.base.backends import Bookkeeping
+from pinnacle.backends.base.event_log import EventLogs
 from pinnacle.backends.base.scheduler import (
     BaseScheduler,
     consume_events,
+    raise_consumer_errors,
 )
-from pinnacle.base import Base
+from pinnacle.base import Base, exceptions
 from pinnacle.base.event import Event
 from pinnacle.components.cdc import CDC
 from pinnacle.misc.importing import isreallyinstance
@@ -37,7 +41,21 @@ class LocalScheduler(Bookkeeping, BaseScheduler):
     Contains a local queue which holds listeners, vector indices in a queue which
     consists of events to be consumed by the corresponding components.
 
-    :param uri: uri to connect.
+    By default events are consumed on the publishing thread. With
+    ``CFG.scheduler_consumers`` set, table events are buffered per queue
+    and consumed in batches by that many background threads, while
+    ``_apply`` events are still consumed on the publishing thread, once
+    the buffered events are consumed. Publishing blocks while the buffer
+    of a queue holds ``CFG.scheduler_queue_size`` events. Background
+    consumers need a data backend shared between threads, which
+    in-memory SQLite databases are not.
+
+    The jobs of ``_apply`` events are run by the compute backend, with
+    ``LocalComputeBackend.submit_jobs``.
+
+    With ``CFG.scheduler_log_dir`` set, table events are also written to
+    durable logs (see ``EventLogs``) before they are consumed, and the
+    events not consumed before a restart are consumed on ``initialize``.
     """
 
     def __init__(self):
@@ -47,6 +65,18 @@ class LocalScheduler(Bookkeeping, BaseScheduler):
         self.lock = threading.Lock()
         self.Q: t.Dict = {'_apply': []}
 
+        self._ready = threading.Condition(self.lock)
+        self._consumers: t.List[threading.Thread] = []
+        self._local = threading.local()
+        # Queues being consumed, each by one thread to keep events in order
+        self._busy: t.Set = set()
+        # Time at which the oldest buffered event of each queue was published
+        self._since: t.Dict = {}
+        self._errors: t.List[Exception] = []
+        self._flushing = 0
+        self._stopping = False
+        self.event_logs: t.Optional[EventLogs] = None
+
     @property
     def db(self):
         return self._db
@@ -55,9 +85,18 @@ class LocalScheduler(Bookkeeping, BaseScheduler):
     def db(self, value):
         self._db = value
 
+    @property
+    def _cfg(self):
+        return self.db.cfg if self.db is not None else CFG
+
     def drop(self):
         """Drop the queue."""
-        self.Q = {}
+        with self.lock:
+            self.Q = {}
+            self._since = {}
+            self._ready.notify_all()
+        if self.event_logs is not None:
+            self.event_logs.drop()
 
     def build_tool(self, component):
         return QueueWrapper(component.cdc_table, self)
@@ -73,6 +112,49 @@ class LocalScheduler(Bookkeeping, BaseScheduler):
                 self.put_component(component, c.uuid)
                 with self.lock:
                     self.Q[component, identifier] = []
+        if self._cfg.scheduler_log_dir:
+            self.event_logs = EventLogs(
+                self._cfg.scheduler_log_dir, fsync=self._cfg.scheduler_log_fsync
+            )
+
+    def replay(self):
+        """Consume the events which were not consumed before a restart."""
+        if self.event_logs is None:
+            return
+        # The logs are read without blocking the publishers
+        replayed = self.event_logs.replay()
+        dropped = []
+        with self.lock:
+            for queue, events in replayed.items():
+                if queue not in self.Q:
+                    dropped.append((queue, len(events)))
+                    continue
+                logging.info(f'Replaying {len(events)} events on {queue}')
+                self.Q[queue] = events + self.Q[queue]
+                self._since.setdefault(queue, time.monotonic())
+            if self._cfg.scheduler_consumers > 0:
+                self._start_consumers()
+                self._ready.notify_all()
+        for queue, n in dropped:
+            # No component consumes the table anymore
+            self.event_logs.ack(self.event_logs.take(queue, n))
+        if self._cfg.scheduler_consumers <= 0:
+            self._publish_sync([])
+
+    def _write(self, events: t.List[Event]) -> t.Dict:
+        if self.event_logs is None:
+            return {}
+        return self.event_logs.write(events)
+
+    def _take(self, queue, n: int):
+        if self.event_logs is None or queue == '_apply':
+            return None
+        return self.event_logs.take(queue, n)
+
+    def _ack(self, taken):
+        if taken is not None:
+            assert self.event_logs is not None
+            self.event_logs.ack(taken)
 
     def publish(self, events: t.List[Event]):
         """
@@ -80,9 +162,23 @@ class LocalScheduler(Bookkeeping, BaseScheduler):
 
         :param events: list of events
         """
+        if self._cfg.scheduler_consumers <= 0:
+            return self._publish_sync(events)
+
+        apply_events = [e for e in events if e.queue == '_apply']
+        self._enqueue([e for e in events if e.queue != '_apply'])
+        if apply_events:
+            # Errors of the table events are left to be raised by ``flush``
+            self._wait()
+            consume_events(
+                events=apply_events, table='_apply', db=self.db, batch_execute=True
+            )
+
+    def _publish_sync(self, events: t.List[Event]):
         with self.lock:
             for event in events:
                 self.Q[event.queue].append(event)
+            written = self._write(events)
 
             queues = list(self.Q.keys())
             data = []
@@ -90,11 +186,177 @@ class LocalScheduler(Bookkeeping, BaseScheduler):
                 events = self.Q[queue].copy()
                 self.Q[queue] = []
                 if len(events) > 0:
-                    data.append((queue, events))
+                    data.append((queue, events, self._take(queue, len(events))))
 
-        for queue, events in data:
-            consume_events(
-                events=events,
-                table=queue,
-                db=self.db,
+        if written:
+            assert self.event_logs is not None
+            self.event_logs.sync(written)
+        # Each queue is consumed even if another fails; failed batches
+        # are not acked, so that they are consumed again by ``replay``
+        errors = []
+        for queue, events, taken in data:
+            try:
+                consume_events(
+                    events=events,
+                    table=queue,
+                    db=self.db,
+                    batch_execute=queue == '_apply',
+                )
+            except Exception as e:
+                logging.error(f'Error consuming {len(events)} events on {queue}: {e}')
+                errors.append(e)
+            else:
+                self._ack(taken)
+        raise_consumer_errors(errors)
+
+    def _in_consumer(self):
+        return getattr(self._local, 'consumer', False)
+
+    def _enqueue(self, events: t.List[Event]):
+        if not events:
+            return
+        size = max(1, self._cfg.scheduler_queue_size)
+        written: t.Dict = {}
+        pending: t.List[Event] = []
+        with self._ready:
+            self._start_consumers()
+            for event in events:
+                # Consumers publish the outputs of their components; they
+                # must not wait for the buffers they are draining themselves
+                while len(self.Q[event.queue]) >= size and not self._in_consumer():
+                    # The lock is released while waiting, so events are
+                    # logged beforehand to keep the order of the queues
+                    written.update(self._write(pending))
+                    pending = []
+                    self._ready.notify_all()
+                    self._ready.wait()
+                self.Q[event.queue].append(event)
+                self._since.setdefault(event.queue, time.monotonic())
+                pending.append(event)
+            written.update(self._write(pending))
+            self._ready.notify_all()
+        if written:
+            assert self.event_logs is not None
+            self.event_logs.sync(written)
+
+    def _start_consumers(self):
+        self._consumers = [c for c in self._consumers if c.is_alive()]
+        for _ in range(self._cfg.scheduler_consumers - len(self._consumers)):
+            consumer = threading.Thread(
+                target=self._consume, name='pinnacle-scheduler', daemon=True
             )
+            consumer.start()
+            self._consumers.append(consumer)
+
+    def _next_queue(self) -> t.Tuple[t.Any, t.Optional[float]]:
+        # The next queue ready to be consumed, or else the time to wait
+        # for the oldest batch to be due
+        cfg = self._cfg
+        max_events = max(
+            1, min(cfg.scheduler_batch_max_events, cfg.scheduler_queue_size)
+        )
+        now = time.monotonic()
+        wait = None
+        for queue, events in self.Q.items():
+            if queue == '_apply' or not events or queue in self._busy:
+                continue
+            if self._flushing or self._stopping or len(events) >= max_events:
+                return queue, None
+            due = self._since[queue] + cfg.scheduler_batch_max_latency - now
+            if due <= 0:
+                return queue, None
+            wait = due if wait is None else min(wait, due)
+        return None, wait
+
+    def _consume(self):
+        self._local.consumer = True
+        while True:
+            with self._ready:
+                queue, wait = self._next_queue()
+                while queue is None:
+                    if self._stopping:
+                        return
+                    self._ready.wait(wait)
+                    queue, wait = self._next_queue()
+                max_events = max(1, self._cfg.scheduler_batch_max_events)
+                events = self.Q[queue][:max_events]
+                self.Q[queue] = self.Q[queue][max_events:]
+                if self.Q[queue]:
+                    self._since[queue] = time.monotonic()
+                else:
+                    self._since.pop(queue, None)
+                self._busy.add(queue)
+                taken = self._take(queue, len(events))
+                self._ready.notify_all()
+            try:
+                consume_events(events=events, table=queue, db=self.db)
+            except Exception as e:
+                # The batch is not acked, so that it is consumed by ``replay``
+                logging.error(f'Error consuming {len(events)} events on {queue}: {e}')
+                with self.lock:
+                    self._errors.append(e)
+            else:
+                self._ack(taken)
+            finally:
+                with self._ready:
+                    self._busy.discard(queue)
+                    self._ready.notify_all()
+
+    def _pending(self):
+        return bool(self._busy) or any(
+            events for queue, events in self.Q.items() if queue != '_apply'
+        )
+
+    def flush(self, timeout: t.Optional[float] = None):
+        """Wait until the published events are consumed.
+
+        Errors raised by the consumers since the last flush are raised
+        here: a single error as is, several as a ``ConsumerError``
+        holding all of them.
+
+        :param timeout: Maximum time to wait in seconds
+        """
+        if self._in_consumer():
+            return
+        self._wait(timeout)
+        with self.lock:
+            errors, self._errors = self._errors, []
+        raise_consumer_errors(errors)
+
+    def _wait(self, timeout: t.Optional[float] = None):
+        # Consumers must not wait for the queues they are consuming
+        if self._in_consumer():
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready:
+            self._flushing += 1
+            self._ready.notify_all()
+            try:
+                while self._pending():
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise exceptions.TimeoutError(
+                                'Timed out waiting for events to be consumed'
+                            )
+                    self._ready.wait(remaining)
+            finally:
+                self._flushing -= 1
+
+    def shutdown(self, timeout: t.Optional[float] = None):
+        """Consume the published events and stop the consumer threads.
+
+        :param timeout: Maximum time to wait in seconds
+        """
+        try:
+            self.flush(timeout=timeout)
+        finally:
+            with self._ready:
+                self._stopping = True
+                self._ready.notify_all()
+                consumers, self._consumers = self._consumers, []
+            for consumer in consumers:
+                consumer.join(timeout)
+            with self._ready:
+                self._stopping = False
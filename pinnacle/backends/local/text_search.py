@@ -0,0 +1,271 @@
+import collections
+import math
+import re
+import threading
+import typing as t
+
+import numpy
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> t.List[str]:
+    """Split text into lower-cased word tokens.
+
+    :param text: Text to tokenize
+    """
+    return _TOKEN.findall(text.lower())
+
+
+def _smallest_uint(max_value: int):
+    for dtype in (numpy.uint8, numpy.uint16, numpy.uint32):
+        if max_value <= numpy.iinfo(dtype).max:
+            return dtype
+    return numpy.uint64
+
+
+class Postings:
+    """Compressed postings list of a term.
+
+    Document numbers are appended in increasing order. Every
+    ``BLOCK_SIZE`` postings are sealed into a block holding the first
+    document number, the gaps to the following ones and the term
+    frequencies, the gaps and frequencies each in the smallest unsigned
+    integer type which holds the block (frame-of-reference coding).
+    """
+
+    BLOCK_SIZE = 128
+
+    __slots__ = ('blocks', 'last', '_docs', '_tfs', '_size')
+
+    def __init__(self):
+        self.blocks: t.List[t.Tuple[int, numpy.ndarray, numpy.ndarray]] = []
+        self.last = -1
+        self._docs: t.List[int] = []
+        self._tfs: t.List[int] = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @classmethod
+    def from_arrays(cls, docs: numpy.ndarray, tfs: numpy.ndarray) -> 'Postings':
+        """Build postings from sorted document numbers and their frequencies.
+
+        :param docs: Increasing document numbers
+        :param tfs: Term frequencies of ``docs``
+        """
+        postings = cls()
+        full = len(docs) - len(docs) % cls.BLOCK_SIZE
+        for i in range(0, full, cls.BLOCK_SIZE):
+            postings._seal(docs[i : i + cls.BLOCK_SIZE], tfs[i : i + cls.BLOCK_SIZE])
+        postings._docs = [int(d) for d in docs[full:]]
+        postings._tfs = [int(f) for f in tfs[full:]]
+        postings._size = len(docs)
+        if len(docs):
+            postings.last = int(docs[-1])
+        return postings
+
+    def append(self, doc: int, tf: int):
+        """Append a posting.
+
+        :param doc: Document number, greater than the last one appended
+        :param tf: Frequency of the term in the document
+        """
+        assert doc > self.last, 'Postings must be appended in document order'
+        self._docs.append(doc)
+        self._tfs.append(tf)
+        self.last = doc
+        self._size += 1
+        if len(self._docs) == self.BLOCK_SIZE:
+            self._seal(self._docs, self._tfs)
+            self._docs, self._tfs = [], []
+
+    def _seal(self, docs, tfs):
+        docs = numpy.asarray(docs, dtype=numpy.int64)
+        tfs = numpy.asarray(tfs)
+        gaps = numpy.diff(docs)
+        self.blocks.append(
+            (
+                int(docs[0]),
+                gaps.astype(_smallest_uint(int(gaps.max(initial=0)))),
+                tfs.astype(_smallest_uint(int(tfs.max()))),
+            )
+        )
+
+    def arrays(self) -> t.Tuple[numpy.ndarray, numpy.ndarray]:
+        """Decode the document numbers and term frequencies."""
+        docs = []
+        tfs = []
+        for first, gaps, block_tfs in self.blocks:
+            block = numpy.empty(len(gaps) + 1, dtype=numpy.int64)
+            block[0] = first
+            numpy.cumsum(gaps, out=block[1:])
+            block[1:] += first
+            docs.append(block)
+            tfs.append(block_tfs)
+        docs.append(numpy.asarray(self._docs, dtype=numpy.int64))
+        tfs.append(numpy.asarray(self._tfs, dtype=numpy.uint32))
+        return numpy.concatenate(docs), numpy.concatenate(tfs).astype(numpy.float32)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the sealed blocks in bytes."""
+        return sum(8 + g.nbytes + f.nbytes for _, g, f in self.blocks)
+
+
+class BM25Index:
+    """
+    In-process inverted index of texts scored with BM25.
+
+    Documents are numbered in insertion order, so that postings are
+    appended in order and compressed in blocks (see ``Postings``).
+    Deleted documents are masked out of results, and dropped from the
+    postings once they make up more than ``COMPACT_RATIO`` of the index.
+    As in Lucene, document frequencies include the deleted documents
+    until then.
+
+    :param k1: Term frequency saturation
+    :param b: Document length normalization
+    """
+
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.clear()
+
+    def __len__(self):
+        return len(self.lookup)
+
+    def _grow(self, size: int):
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, 2 * len(self._lengths), 1024)
+        lengths = numpy.zeros(capacity, dtype=numpy.float32)
+        lengths[: len(self._lengths)] = self._lengths
+        deleted = numpy.zeros(capacity, dtype=bool)
+        deleted[: len(self._deleted)] = self._deleted
+        self._lengths, self._deleted = lengths, deleted
+
+    def add(self, ids: t.Sequence[str], texts: t.Sequence[t.Optional[str]]):
+        """Add texts to the index, replacing those of ids already indexed.
+
+        :param ids: Ids of the texts
+        :param texts: Texts to index
+        """
+        with self._lock:
+            self.delete([id for id in ids if id in self.lookup], compact=False)
+            self._grow(len(self.ids) + len(ids))
+            for id, text in zip(ids, texts):
+                tokens = tokenize(text) if isinstance(text, str) else []
+                doc = len(self.ids)
+                self.ids.append(id)
+                self.lookup[id] = doc
+                for term, tf in collections.Counter(tokens).items():
+                    postings = self.postings.get(term)
+                    if postings is None:
+                        postings = self.postings[term] = Postings()
+                    postings.append(doc, tf)
+                self._lengths[doc] = len(tokens)
+                self._total_length += len(tokens)
+
+    def delete(self, ids: t.Sequence[str], compact: bool = True):
+        """Delete texts from the index.
+
+        :param ids: Ids of the texts
+        :param compact: Compact the postings if enough documents are deleted
+        """
+        with self._lock:
+            for id in ids:
+                doc = self.lookup.pop(id, None)
+                if doc is None:
+                    continue
+                self._deleted[doc] = True
+                self._total_length -= float(self._lengths[doc])
+            deleted = len(self.ids) - len(self.lookup)
+            if compact and deleted > self.COMPACT_RATIO * len(self.ids):
+                self.compact()
+
+    def compact(self):
+        """Drop the deleted documents from the postings and renumber."""
+        with self._lock:
+            n = len(self.ids)
+            keep = ~self._deleted[:n]
+            renumber = numpy.cumsum(keep) - 1
+            postings = {}
+            for term, p in self.postings.items():
+                docs, tfs = p.arrays()
+                live = keep[docs]
+                if live.any():
+                    postings[term] = Postings.from_arrays(
+                        renumber[docs[live]], tfs[live].astype(numpy.uint32)
+                    )
+            self.postings = postings
+            self.ids = [id for id, k in zip(self.ids, keep) if k]
+            self.lookup = {id: i for i, id in enumerate(self.ids)}
+            lengths = self._lengths[:n][keep]
+            self._lengths = numpy.zeros(0, dtype=numpy.float32)
+            self._deleted = numpy.zeros(0, dtype=bool)
+            self._grow(len(self.ids))
+            self._lengths[: len(self.ids)] = lengths
+
+    def clear(self):
+        """Remove all texts from the index."""
+        with self._lock:
+            self.ids: t.List[str] = []
+            self.lookup: t.Dict[str, int] = {}
+            self.postings: t.Dict[str, Postings] = {}
+            self._lengths = numpy.zeros(0, dtype=numpy.float32)
+            self._deleted = numpy.zeros(0, dtype=bool)
+            self._total_length = 0.0
+
+    def search(
+        self,
+        query: str,
+        n: int = 100,
+        within_ids: t.Optional[t.Sequence[str]] = None,
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """Find the ``n`` best matching texts of a query.
+
+        Only documents containing at least one of the query terms are
+        returned, best first.
+
+        :param query: Query text
+        :param n: Number of results to return
+        :param within_ids: Only return results among these ids
+        """
+        with self._lock:
+            size = len(self.ids)
+            if not self.lookup or n <= 0:
+                return [], []
+            lengths = self._lengths[:size]
+            avgdl = max(self._total_length / len(self.lookup), 1e-9)
+            scores = numpy.zeros(size, dtype=numpy.float32)
+            matched = numpy.zeros(size, dtype=bool)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (size - df + 0.5) / (df + 0.5))
+                docs, tfs = postings.arrays()
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avgdl)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+                matched[docs] = True
+            matched &= ~self._deleted[:size]
+            if within_ids is not None:
+                within = numpy.zeros(size, dtype=bool)
+                within[[self.lookup[i] for i in within_ids if i in self.lookup]] = True
+                matched &= within
+            candidates = numpy.flatnonzero(matched)
+            if len(candidates) > n:
+                top = numpy.argpartition(-scores[candidates], n - 1)[:n]
+                candidates = candidates[top]
+            candidates = candidates[numpy.argsort(-scores[candidates], kind='stable')]
+            return (
+                [self.ids[i] for i in candidates],
+                scores[candidates].tolist(),
+            )
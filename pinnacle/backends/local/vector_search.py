@@ -1,20 +1,168 @@
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import shutil
+import struct
+import threading
 import typing as t
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy
 
-from pinnacle import logging
+from pinnacle import CFG, logging
 from pinnacle.backends.base.vector_search import (
     BaseVectorSearcher,
     VectorItem,
     VectorSearchBackend,
+    decode_vectors,
+    encode_vectors,
     measures,
+    top_n,
 )
 from pinnacle.base import exceptions
+from pinnacle.misc.importing import load_plugin
 
 if t.TYPE_CHECKING:
     from pinnacle import VectorIndex
 
 
+def load_searcher(engine: str):
+    """Load the searcher class of a vector-search engine.
+
+    ``local://<name>`` selects one of the searchers of the local plugin,
+    e.g. ``local://ivf``; any other engine loads the ``VectorSearcher``
+    of its plugin.
+
+    :param engine: Value of ``CFG.vector_search_engine``
+    """
+    plugin, _, name = engine.partition('://')
+    module = load_plugin(plugin)
+    if plugin == 'local' and name:
+        try:
+            return module.SEARCHERS[name]
+        except KeyError:
+            raise ValueError(
+                f'Unknown local searcher {name!r}; '
+                f'expected one of {sorted(module.SEARCHERS)}'
+            )
+    return module.VectorSearcher
+
+
+_SCORING_POOL: t.Optional[ThreadPoolExecutor] = None
+_SCORING_POOL_LOCK = threading.Lock()
+
+
+def scoring_pool() -> ThreadPoolExecutor:
+    """Thread pool shared by the sharded searches of all local indexes.
+
+    The pool has one worker per core, so that concurrent searches queue
+    for cores rather than oversubscribing them.
+    """
+    global _SCORING_POOL
+    with _SCORING_POOL_LOCK:
+        if _SCORING_POOL is None:
+            _SCORING_POOL = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix='vector-search',
+            )
+    return _SCORING_POOL
+
+
+class DeltaLog:
+    """Append-only log of the additions and deletions of a vector index.
+
+    Each record is a ``'<BII'`` header of the operation, the length and the
+    CRC-32 of the payload, followed by the ids and vectors in the
+    ``encode_vectors`` format. A record torn by a crash fails its checksum,
+    and is truncated away with anything after it on replay.
+
+    :param path: Path of the log file
+    :param fsync: Whether to sync the log to disk after every record
+    """
+
+    ADD: t.ClassVar[int] = 1
+    DELETE: t.ClassVar[int] = 2
+    _HEADER: t.ClassVar[struct.Struct] = struct.Struct('<BII')
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._file: t.Optional[t.BinaryIO] = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Size of the log in bytes."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def append(
+        self, op: int, ids: t.Sequence[str], vectors: t.Optional[numpy.ndarray] = None
+    ):
+        """Append a record to the log.
+
+        :param op: ``DeltaLog.ADD`` or ``DeltaLog.DELETE``
+        :param ids: IDs of the vectors
+        :param vectors: Matrix of the added vectors, one row per id
+        """
+        if vectors is None:
+            vectors = numpy.zeros((len(ids), 0), dtype=numpy.float32)
+        payload = encode_vectors(ids, vectors)
+        record = self._HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def replay(self) -> t.Iterator[t.Tuple[int, t.List[str], numpy.ndarray]]:
+        """Iterate over the operations, ids and vectors of the records."""
+        if not os.path.exists(self.path):
+            return
+        valid = 0
+        with open(self.path, 'rb') as f:
+            while True:
+                header = f.read(self._HEADER.size)
+                if len(header) < self._HEADER.size:
+                    break
+                op, length, crc = self._HEADER.unpack(header)
+                payload = f.read(length)
+                if (
+                    len(payload) < length
+                    or zlib.crc32(payload) != crc
+                    or op not in (self.ADD, self.DELETE)
+                ):
+                    break
+                valid = f.tell()
+                ids, vectors = decode_vectors(payload)
+                yield op, ids, vectors
+        if valid < self.size:
+            logging.warn(f'Discarding {self.size - valid} torn bytes of {self.path}')
+            with self._lock, open(self.path, 'r+b') as f:
+                f.truncate(valid)
+
+    def truncate(self):
+        """Remove all records from the log."""
+        with self._lock:
+            self.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        """Close the log file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
 class LocalVectorSearchBackend(VectorSearchBackend):
     """Local vector search backend.
 
@@ -50,7 +198,7 @@ class LocalVectorSearchBackend(VectorSearchBackend):
             if t.is_component and t.cls is not None:
                 if issubclass(t.cls, VectorIndex):
                     components.append(t.identifier)
-                    
+
         for component in components:
             try:
                 for identifier in self.db.show(component):
@@ -61,11 +209,21 @@ class LocalVectorSearchBackend(VectorSearchBackend):
                         tool = self.get_tool(vector_index.uuid)
                         deployed_ids = tool.list()
                         to_deploy_ids = list(set(all_ids) - set(deployed_ids))
+                        # Vectors deleted since the snapshot was saved
+                        to_delete_ids = list(set(deployed_ids) - set(all_ids))
+                        if to_delete_ids:
+                            tool.delete(to_delete_ids)
                         if to_deploy_ids:
-                            vectors = vector_index.get_vectors(ids=to_deploy_ids)
-                            vectors = [VectorItem(**vector) for vector in vectors]
-                            self.get_tool(vector_index.uuid).add(vectors)
-                        else:
+                            for ids, vectors in vector_index.iter_vectors(
+                                ids=to_deploy_ids
+                            ):
+                                tool.add(
+                                    [
+                                        VectorItem(id=id, vector=vector)
+                                        for id, vector in zip(ids, vectors)
+                                    ]
+                                )
+                        elif not to_delete_ids:
                             logging.info(
                                 'Skipping since have already deployed vectors for '
                                 f'component: {component}, vector_index: {vector_index.uuid}'
@@ -91,6 +249,12 @@ class LocalVectorSearchBackend(VectorSearchBackend):
     def describe(self, component, vector_index):
         return self[component, vector_index].describe()
 
+    def snapshot(self):
+        """Save snapshots of all vector indexes with a ``snapshot_dir``."""
+        for tool in self.tools.values():
+            if getattr(tool, 'snapshot_dir', None) is not None:
+                tool.snapshot()
+
     def find_nearest_from_array(
         self,
         h: numpy.typing.ArrayLike,
@@ -111,6 +275,27 @@ class LocalVectorSearchBackend(VectorSearchBackend):
             h, n=n, within_ids=within_ids
         )
 
+    def find_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Find the nearest vectors to each row of a matrix of query vectors.
+
+        :param h: matrix of query vectors
+        :param component: component class name
+        :param vector_index: name of vector-index
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        return self[component, vector_index].find_nearest_from_arrays(
+            h, n=n, within_ids=within_ids
+        )
+
     def find_nearest_from_id(
         self,
         id: str,
@@ -131,6 +316,69 @@ class LocalVectorSearchBackend(VectorSearchBackend):
             id, n=n, within_ids=within_ids
         )
 
+    async def afind_nearest_from_array(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the given vector without blocking.
+
+        :param h: vector
+        :param component: component class name
+        :param vector_index: name of vector-index
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        return await self[component, vector_index].afind_nearest_from_array(
+            h, n=n, within_ids=within_ids
+        )
+
+    async def afind_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Find the nearest vectors to each row of a matrix without blocking.
+
+        :param h: matrix of query vectors
+        :param component: component class name
+        :param vector_index: name of vector-index
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of ids to search within
+        """
+        return await self[component, vector_index].afind_nearest_from_arrays(
+            h, n=n, within_ids=within_ids
+        )
+
+    async def afind_nearest_from_id(
+        self,
+        id: str,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Find the nearest vectors to the vector of an id without blocking.
+
+        :param id: id of the vector to search with
+        :param component: component class name
+        :param vector_index: name of vector-index
+        :param n: number of nearest vectors to return
+        :param within_ids: list of ids to search within
+        """
+        return await self[component, vector_index].afind_nearest_from_id(
+            id, n=n, within_ids=within_ids
+        )
+
     def __getitem__(self, item):
         if item not in self.component_uuid_mapping:
             c = self.db.load(*item)
@@ -152,21 +400,75 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
     """
     Simple hash-set for looking up with vector similarity.
 
-    :param uuid: Unique string identifier of index
+    Vectors are kept in a preallocated buffer which doubles in capacity
+    when full. Upserts overwrite rows in place, and deletes only mark
+    rows as deleted; the buffer is compacted once the share of deleted
+    rows exceeds ``_COMPACT_RATIO``.
+
+    With a ``snapshot_dir``, the index is saved there as a ``.npy`` matrix,
+    an id table and a manifest, and every ``add`` and ``delete`` is
+    appended to a ``DeltaLog`` next to the snapshot before it is applied.
+    On startup the snapshot is memory-mapped copy-on-write and the log is
+    replayed on top of it, so that recovery takes time proportional to the
+    writes since the last snapshot. The log is compacted into a new
+    snapshot once it outgrows ``_LOG_COMPACT_RATIO`` of the vectors (and
+    ``_LOG_MIN_BYTES``). Snapshots written without a log are brought up to
+    date by comparing their ids with those of the ``VectorIndex``.
+    Subclasses save the structures they derive from the vectors with the
+    snapshot (see ``_state``), so that restoring does not rebuild them.
+
+    Searches, writes and compaction hold the searcher's ``_lock``, so that
+    concurrent searches never see a buffer being rewritten.
+
+    Searches restricted by ``within_ids`` convert the ids to slots and a
+    boolean mask once per filter, and keep the last ``_FILTER_CACHE_SIZE``
+    of them. Filters selecting less than ``_PREFILTER_RATIO`` of the index
+    only score the selected rows; larger filters score all rows and mask
+    out the others.
+
+    With ``n_shards > 1``, exact search splits the buffer into row shards
+    of at least ``_MIN_SHARD_SIZE`` rows, scores them concurrently on the
+    shared ``scoring_pool`` (NumPy releases the GIL) and merges the top
+    results of every shard.
+
+    :param identifier: Unique string identifier of index
     :param dimensions: Dimension of the vector embeddings
     :param measure: measure to assess similarity
+    :param component: Component class name
+    :param dtype: Storage type of the vectors, e.g. ``'float32'`` or
+                  ``'float16'`` (default: floating type of the first vectors)
+    :param snapshot_dir: Directory of the snapshots of the index
+    :param n_shards: Number of row shards scored concurrently by exact search
     """
 
+    _MIN_CAPACITY: t.ClassVar[int] = 1024
+    _COMPACT_RATIO: t.ClassVar[float] = 0.25
+    _SCORE_CHUNK: t.ClassVar[int] = 65536
+    _PREFILTER_RATIO: t.ClassVar[float] = 0.25
+    _FILTER_CACHE_SIZE: t.ClassVar[int] = 8
+    _MIN_SHARD_SIZE: t.ClassVar[int] = 16384
+    _LOG_COMPACT_RATIO: t.ClassVar[float] = 0.5
+    _LOG_MIN_BYTES: t.ClassVar[int] = 64 * 2**20
+
     def __init__(
         self,
         identifier: str,
         dimensions: int,
         measure: str = 'cosine',
         component: str = 'VectorIndex',
+        dtype: t.Optional[str] = None,
+        snapshot_dir: t.Optional[str] = None,
+        n_shards: int = 1,
     ):
         self.identifier = identifier
         self.dimensions = dimensions
         self.component = component
+        self.dtype = numpy.dtype(dtype) if dtype is not None else None
+        self.snapshot_dir = snapshot_dir
+        self.n_shards = n_shards
+        self._log: t.Optional[DeltaLog] = None
+        self._logged = False
+        self._lock = threading.RLock()
 
         self._cache: t.Sequence[VectorItem] = []
         self._CACHE_SIZE = 10000
@@ -178,39 +480,89 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
             self.measure_name = measure.__name__
             self.measure = measure
 
-        self.h = None
-        self.index = None
-        self.lookup = None
+        self._buffer: t.Optional[numpy.ndarray] = None
+        self._deleted = numpy.zeros(0, dtype=bool)
+        self._size = 0
+        self._n_deleted = 0
+        self.index: t.List[t.Optional[str]] = []
+        self.lookup: t.Dict[str, int] = {}
+        self._filters: t.OrderedDict[
+            t.Tuple[bytes, int, int], t.Tuple[numpy.ndarray, numpy.ndarray]
+        ] = OrderedDict()
+        # Incremented whenever ids are added, deleted or moved, so that
+        # cached filters of an earlier state are never looked up
+        self._mutations = 0
+
+    @classmethod
+    def from_component(cls, index: 'VectorIndex'):
+        """Create a vector searcher from a vector index.
+
+        Tuning parameters are read from ``CFG.vector_search_kwargs``; those
+        which the searcher does not take, e.g. ``nprobe`` for an HNSW
+        searcher, are ignored.
+
+        :param index: ``VectorIndex`` instance
+        """
+        kwargs = dict(
+            component=index.component,
+            identifier=index.uuid,
+            dimensions=index.dimensions,
+            measure=index.measure,
+            snapshot_dir=CFG.vector_search_snapshot_dir,
+        )
+        parameters = inspect.signature(cls).parameters
+        for key, value in CFG.vector_search_kwargs.items():
+            if key in parameters and key not in kwargs:
+                kwargs[key] = value
+        return cls(**kwargs)
+
+    @property
+    def h(self):
+        """Rows of the buffer in use, including rows marked as deleted."""
+        if self._buffer is None or not self.lookup:
+            return None
+        return self._buffer[: self._size]
 
     def drop(self):
         """Drop the vector index."""
+        if self.snapshot_path is not None:
+            shutil.rmtree(self.snapshot_path, ignore_errors=True)
+            self.delta_log.truncate()
 
     def __len__(self):
-        if self.h is not None:
-            return self.h.shape[0]
-        else:
-            return 0
+        return len(self.lookup)
 
-    def _setup(self, h, index):
+    def _prepare(self, h):
         h = numpy.array(h) if not isinstance(h, numpy.ndarray) else h
-
         if self.measure_name == 'cosine':
             # Normalization is required for cosine, hence preparing
-            # all vectors in advance.
+            # vectors in advance, as they are added.
             h = h / numpy.linalg.norm(h, axis=1)[:, None]
-        self.h = h
-        self.index = index
-        self.lookup = dict(zip(index, range(len(index))))
+        return h
+
+    def _allocate(self, capacity: int, dtype) -> numpy.ndarray:
+        return numpy.empty((capacity, self.dimensions), dtype=dtype)
+
+    def _reserve(self, size: int, dtype):
+        if self._buffer is not None and size <= self._buffer.shape[0]:
+            return
+        capacity = max(self._MIN_CAPACITY, size)
+        if self._buffer is not None:
+            capacity = max(capacity, 2 * self._buffer.shape[0])
+            dtype = self._buffer.dtype
+        buffer = self._allocate(capacity, self.dtype or dtype)
+        deleted = numpy.zeros(capacity, dtype=bool)
+        if self._buffer is not None:
+            buffer[: self._size] = self._buffer[: self._size]
+            deleted[: self._size] = self._deleted[: self._size]
+        self._buffer = buffer
+        self._deleted = deleted
 
     def list(self):
-        return self.index if self.index is not None else []
+        return list(self.lookup)
 
     def describe(self):
-        """Describe the vector index.
-
-        :param component: name of the component
-        :param vector_index: name of the vector index
-        """
+        """Describe the vector index."""
         return {
             'uuid': self.identifier,
             'dimensions': self.dimensions,
@@ -223,11 +575,13 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
 
         :param _id: ID of the vector
         :param n: number of nearest vectors to return
+        :param within_ids: list of IDs to search within
         """
-        self.post_create()
-        return self.find_nearest_from_array(
-            self.h[self.lookup[_id]], n=n, within_ids=within_ids
-        )
+        with self._lock:
+            self.post_create()
+            return self.find_nearest_from_array(
+                self.h[self.lookup[_id]], n=n, within_ids=within_ids
+            )
 
     def find_nearest_from_array(self, h, n=100, within_ids=None):
         """Find the nearest vectors to the given vector.
@@ -236,47 +590,324 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
         :param n: number of nearest vectors to return
         :param within_ids: list of IDs to search within
         """
-        self.post_create()
-
-        if self.h is None:
-            logging.error(
-                'Tried to search on an empty vector database',
-                'Vectors are not yet loaded in vector database.',
-                '\nPlease check if model outputs are ready.',
-            )
+        ids, scores = self.find_nearest_from_arrays(
+            self.to_numpy(h)[None, :], n=n, within_ids=within_ids
+        )
+        if not ids:
             return [], []
+        return ids[0], scores[0]
 
-        h = self.to_numpy(h)[None, :]
+    def find_nearest_from_arrays(self, h, n=100, within_ids=None):
+        """Find the nearest vectors to each row of a matrix of query vectors.
+
+        All queries are scored with a single matrix product.
+
+        :param h: matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: number of nearest vectors to return per query
+        :param within_ids: list of IDs to search within
+        """
+        with self._lock:
+            self.post_create()
+
+            if self.h is None:
+                logging.error(
+                    'Tried to search on an empty vector database',
+                    'Vectors are not yet loaded in vector database.',
+                    '\nPlease check if model outputs are ready.',
+                )
+                return [], []
+
+            h = numpy.atleast_2d(self.to_numpy(h))
+            slots, scores = self._search(h, n, within_ids)
+            ids = [[self.index[i] for i in row] for row in slots.tolist()]
+        return ids, scores.tolist()
+
+    def _similarities(self, h, ix=None):
+        rows = self.h if ix is None else self.h[ix]
+        if rows.dtype != numpy.float16:
+            return self.measure(h, rows)  # mypy: ignore
+        # There is no BLAS for half precision, hence score in chunks
+        # upcast to single precision.
+        return numpy.concatenate(
+            [
+                self.measure(h, rows[i : i + self._SCORE_CHUNK].astype(numpy.float32))
+                for i in range(0, rows.shape[0], self._SCORE_CHUNK)
+            ],
+            axis=1,
+        )
+
+    def _invalidate_filters(self):
+        self._filters.clear()
+        self._mutations += 1
+
+    def _filter(self, within_ids) -> t.Tuple[numpy.ndarray, numpy.ndarray]:
+        # Sorted slots and boolean mask of the ids in the filter; ids which
+        # are not in the index are ignored. Filters are cached by a digest
+        # of their ids, so that the cache does not hold copies of the ids.
+        if not isinstance(within_ids, t.Sequence):
+            within_ids = list(within_ids)
+        digest = hashlib.blake2b(
+            '\0'.join(within_ids).encode(), digest_size=16
+        ).digest()
+        key = (digest, len(within_ids), self._mutations)
+        if key in self._filters:
+            self._filters.move_to_end(key)
+            return self._filters[key]
+
+        slots = numpy.fromiter(
+            map(self.lookup.get, within_ids, itertools.repeat(-1)),
+            dtype=numpy.int64,
+            count=len(within_ids),
+        )
+        slots = numpy.unique(slots[slots >= 0]).astype(numpy.int32)
+        mask = numpy.zeros(self._size, dtype=bool)
+        mask[slots] = True
+
+        self._filters[key] = slots, mask
+        if len(self._filters) > self._FILTER_CACHE_SIZE:
+            self._filters.popitem(last=False)
+        return slots, mask
+
+    def _search(self, h, n, within_ids=None):
         if within_ids:
-            ix = list(map(self.lookup.__getitem__, within_ids))
-            similarities = self.measure(h, self.h[ix, :])  # mypy: ignore
-        else:
-            similarities = self.measure(h, self.h)  # mypy: ignore
-        similarities = similarities[0, :]
+            slots, mask = self._filter(within_ids)
+            if not len(slots):
+                empty = numpy.empty((h.shape[0], 0))
+                return empty.astype(int), empty
+            n = min(n, len(slots))
+            if len(slots) < self._PREFILTER_RATIO * self._size:
+                # Pre-filter: only score the selected rows
+                ix, scores = top_n(self._similarities(h, slots), n)
+                return slots[ix], scores
+            # Post-filter: score all rows, and mask out the others
+            return self._scan(h, n, ~mask)
+        if self._n_deleted:
+            return self._scan(h, n, self._deleted[: self._size])
+        return self._scan(h, n)
+
+    def _scan(self, h, n, excluded=None):
+        n_shards = min(self.n_shards, -(-self._size // self._MIN_SHARD_SIZE))
+        if excluded is not None:
+            n = min(n, self._size - int(excluded.sum()))
+        if n_shards <= 1:
+            return self._scan_shard(h, n, 0, self._size, excluded)
+
+        bounds = numpy.linspace(0, self._size, n_shards + 1).astype(int).tolist()
+        futures = [
+            scoring_pool().submit(self._scan_shard, h, n, start, stop, excluded)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        shards = [future.result() for future in futures]
+        slots = numpy.concatenate([slots for slots, _ in shards], axis=1)
+        scores = numpy.concatenate([scores for _, scores in shards], axis=1)
+        ix, scores = top_n(scores, n)
+        return numpy.take_along_axis(slots, ix, axis=1), scores
+
+    def _scan_shard(self, h, n, start, stop, excluded=None):
+        similarities = self._similarities(h, slice(start, stop))
+        if excluded is not None:
+            similarities[:, excluded[start:stop]] = -numpy.inf
         logging.debug(similarities)
-        scores = -numpy.sort(-similarities)
-        ## different ways of handling
-        if within_ids:
-            top_n_idxs = numpy.argsort(-similarities)[:n]
-            ix = [ix[i] for i in top_n_idxs]
-        else:
-            ix = numpy.argsort(-similarities)[:n]
-            ix = ix.tolist()
-        scores = scores.tolist()
-        _ids = [self.index[i] for i in ix]
-        return _ids, scores
+        ix, scores = top_n(similarities, n)
+        return ix + start, scores
 
     def initialize(self):
         """Initialize the vector index.
 
-        :param vector_index: Vector index to initialize
+        Restores the snapshot of the index if there is one, and replays the
+        changes since; otherwise loads all vectors of the ``VectorIndex``,
+        one page at a time.
         """
         c: VectorIndex = self.db.load(self.component, uuid=self.identifier)
-        vectors = c.get_vectors()
-        vectors = [
-            VectorItem(id=vector['id'], vector=vector['vector']) for vector in vectors
-        ]
-        self.add(vectors, cache=True)
+        if self.restore():
+            if not self._logged and self._replay(c):
+                self.snapshot()
+            return
+
+        self._load(c)
+        if self.snapshot_path is not None:
+            self.snapshot()
+
+    def _load(self, c: 'VectorIndex', ids: t.Optional[t.Sequence[str]] = None):
+        for page_ids, vectors in c.iter_vectors(ids=ids, batch_size=self._CACHE_SIZE):
+            self._add(
+                [
+                    VectorItem(id=id, vector=vector)
+                    for id, vector in zip(page_ids, vectors)
+                ]
+            )
+
+    def _replay(self, c: 'VectorIndex') -> bool:
+        ids = c.list()
+        stale = list(set(self.lookup) - set(ids))
+        missing = [_id for _id in ids if _id not in self.lookup]
+        logging.info(
+            f'Replaying {len(missing)} additions and {len(stale)} deletions '
+            f'on snapshot of {self.identifier}'
+        )
+        if stale:
+            self._delete(stale)
+        if missing:
+            self._load(c, ids=missing)
+        return bool(stale or missing)
+
+    @property
+    def snapshot_path(self) -> t.Optional[str]:
+        """Directory of the snapshot of the index."""
+        if self.snapshot_dir is None:
+            return None
+        return os.path.join(self.snapshot_dir, self.identifier)
+
+    @property
+    def delta_log(self) -> t.Optional[DeltaLog]:
+        """Log of the changes since the snapshot of the index."""
+        if self._log is None and self.snapshot_dir is not None:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            self._log = DeltaLog(f'{self.snapshot_path}.log')
+        return self._log
+
+    def _replay_log(self):
+        n_records = 0
+        for op, ids, vectors in self.delta_log.replay():
+            if op == DeltaLog.ADD:
+                self._add([VectorItem(id=id, vector=v) for id, v in zip(ids, vectors)])
+            else:
+                self._delete([id for id in ids if id in self.lookup])
+            n_records += 1
+        logging.info(f'Replayed {n_records} records of the log of {self.identifier}')
+
+    def _compact_log(self):
+        log = self.delta_log
+        threshold = self._LOG_COMPACT_RATIO * self._size * self.dimensions * 4
+        if log is not None and log.size > max(threshold, self._LOG_MIN_BYTES):
+            logging.info(f'Compacting the log of {self.identifier} into a snapshot')
+            self.snapshot()
+
+    def snapshot(self):
+        """Save the index to ``snapshot_dir``.
+
+        The snapshot is written to a temporary directory first and then
+        swapped in, so that a crash never leaves a partial snapshot.
+        """
+        with self._lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        self.post_create()
+        path = self.snapshot_path
+        delta_log = self.delta_log
+        if path is None or delta_log is None:
+            return
+        self.compact()
+        # An empty index is snapshotted too, so that it is not reloaded
+        # from the ``VectorIndex`` on startup
+        if self._buffer is not None:
+            dtype = self._buffer.dtype
+        else:
+            dtype = self.dtype or numpy.dtype(numpy.float32)
+
+        tmp = f'{path}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        vectors = numpy.lib.format.open_memmap(
+            os.path.join(tmp, 'vectors.npy'),
+            mode='w+',
+            dtype=dtype,
+            shape=(self._size, self.dimensions),
+        )
+        for i in range(0, self._size, self._SCORE_CHUNK):
+            assert self._buffer is not None
+            vectors[i : i + self._SCORE_CHUNK] = self._buffer[
+                i : min(i + self._SCORE_CHUNK, self._size)
+            ]
+        vectors.flush()
+        del vectors
+        with open(os.path.join(tmp, 'ids.json'), 'w') as f:
+            json.dump(self.index, f)
+        state = self._state()
+        if state:
+            numpy.savez(os.path.join(tmp, 'state.npz'), **state)
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(
+                {
+                    'uuid': self.identifier,
+                    'component': self.component,
+                    'dimensions': self.dimensions,
+                    'measure': self.measure_name,
+                    'dtype': dtype.name,
+                    'size': self._size,
+                    'delta_log': True,
+                },
+                f,
+            )
+
+        old = f'{path}.old'
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+        # Replaying the log on the new snapshot would be idempotent, so a
+        # crash before the log is truncated loses nothing
+        delta_log.truncate()
+        self._logged = True
+        logging.info(f'Saved snapshot of {self.identifier} with {self._size} vectors')
+
+    def restore(self) -> bool:
+        """Restore the index from its snapshot in ``snapshot_dir``.
+
+        Returns whether a valid snapshot was found.
+        """
+        path = self.snapshot_path
+        if path is None or not os.path.exists(os.path.join(path, 'manifest.json')):
+            return False
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        with open(os.path.join(path, 'ids.json')) as f:
+            ids = json.load(f)
+        if (
+            manifest['dimensions'] != self.dimensions
+            or manifest['measure'] != self.measure_name
+        ):
+            logging.warn(f'Ignoring snapshot of {self.identifier}: index has changed')
+            return False
+        vectors = numpy.load(os.path.join(path, 'vectors.npy'), mmap_mode='c')
+        if not (len(ids) == manifest['size'] == vectors.shape[0]):
+            logging.warn(f'Ignoring incomplete snapshot of {self.identifier}')
+            return False
+        if self.dtype is not None and vectors.dtype != self.dtype:
+            vectors = vectors.astype(self.dtype)
+
+        state: t.Dict[str, numpy.ndarray] = {}
+        if os.path.exists(os.path.join(path, 'state.npz')):
+            with numpy.load(os.path.join(path, 'state.npz')) as f:
+                state = dict(f)
+
+        self._restore(vectors, ids, state)
+        logging.info(f'Restored snapshot of {self.identifier} with {len(ids)} vectors')
+        self._logged = manifest.get('delta_log', False)
+        if self._logged:
+            self._replay_log()
+            self._compact_log()
+        return True
+
+    def _state(self) -> t.Dict[str, numpy.ndarray]:
+        # Arrays saved with a snapshot, from which ``_restore`` restores
+        # the structures derived from the vectors of a compacted index
+        return {}
+
+    def _restore(
+        self,
+        vectors: numpy.ndarray,
+        ids: t.List[str],
+        state: t.Dict[str, numpy.ndarray],
+    ):
+        self._buffer = vectors
+        self._deleted = numpy.zeros(len(ids), dtype=bool)
+        self._size = len(ids)
+        self._n_deleted = 0
+        self.index = list(ids)
+        self.lookup = dict(zip(ids, range(len(ids))))
+        self._invalidate_filters()
 
     def add(self, items: t.Sequence[VectorItem] = (), cache: bool = False) -> None:
         """Add vectors to the index.
@@ -286,43 +917,101 @@ class InMemoryVectorSearcher(BaseVectorSearcher):
         :param items: List of vectors to add
         :param cache: Flush the cache and add all vectors
         """
-        if not cache:
-            return self._add(items)
+        with self._lock:
+            if self._logged and items:
+                assert self.delta_log is not None
+                self.delta_log.append(
+                    DeltaLog.ADD,
+                    [item.id for item in items],
+                    numpy.stack([self.to_numpy(item.vector) for item in items]),
+                )
 
-        for item in items:
-            self._cache.append(item)
-        if len(self._cache) == self._CACHE_SIZE:
-            self._add(self._cache)
-            self._cache = []
+            if not cache:
+                self._add(items)
+            else:
+                for item in items:
+                    self._cache.append(item)
+                if len(self._cache) == self._CACHE_SIZE:
+                    self._add(self._cache)
+                    self._cache = []
+
+            if self._logged:
+                self._compact_log()
 
     def post_create(self):
         """Post create method to incorporate remaining vectors to be added in cache."""
-        if self._cache:
-            self._add(self._cache)
-            self._cache = []
+        with self._lock:
+            if self._cache:
+                self._add(self._cache)
+                self._cache = []
 
-    def _add(self, items: t.Sequence[VectorItem]) -> None:
+    def _add(self, items: t.Sequence[VectorItem]) -> numpy.ndarray:
         if not items:
-            return
-        index = [item.id for item in items]
-        h = numpy.stack([item.vector for item in items])
-
-        if self.h is not None:
-            old_not_in_new = list(set(self.index) - set(index))
-            ix_old = [self.lookup[_id] for _id in old_not_in_new]
-            h = numpy.concatenate((self.h[ix_old], h), axis=0)
-            index = [self.index[i] for i in ix_old] + index
-
-        out = self._setup(h, index)
-        return out
+            return numpy.empty(0, dtype=numpy.int64)
+        # Later items win over earlier items with the same id.
+        latest = {item.id: item.vector for item in items}
+        h = self._prepare(numpy.stack(list(latest.values())))
+
+        slots = numpy.empty(len(latest), dtype=numpy.int64)
+        new: t.List[str] = []
+        for i, _id in enumerate(latest):
+            slot = self.lookup.get(_id)
+            if slot is None:
+                slot = self._size + len(new)
+                new.append(_id)
+            slots[i] = slot
+
+        self._reserve(self._size + len(new), numpy.result_type(h, numpy.float32))
+        assert self._buffer is not None
+        self._buffer[slots] = h
+        if new:
+            self._invalidate_filters()
+        for _id in new:
+            self.lookup[_id] = len(self.index)
+            self.index.append(_id)
+        self._size += len(new)
+        return slots
 
     def delete(self, ids):
         """Delete vectors from the index.
 
         :param ids: List of IDs to delete
         """
-        self.post_create()
+        with self._lock:
+            self.post_create()
+            if self._logged and ids:
+                self.delta_log.append(DeltaLog.DELETE, list(ids))
+            self._delete(ids)
+            if self._logged:
+                self._compact_log()
+
+    def _delete(self, ids):
+        # Ids which are not in the index are ignored, as in ``_filter``
+        ids = [_id for _id in dict.fromkeys(ids) if _id in self.lookup]
         ix = list(map(self.lookup.__getitem__, ids))
-        h = numpy.delete(self.h, ix, axis=0)
-        index = [_id for _id in self.index if _id not in set(ids)]
-        self._setup(h, index)
+        if not ix:
+            return
+        for _id, i in zip(ids, ix):
+            del self.lookup[_id]
+            self.index[i] = None
+        self._deleted[ix] = True
+        self._n_deleted += len(ix)
+        self._invalidate_filters()
+
+        if self._n_deleted > self._COMPACT_RATIO * self._size:
+            self.compact()
+
+    def compact(self):
+        """Remove rows marked as deleted from the buffer."""
+        with self._lock:
+            if not self._n_deleted:
+                return
+            assert self._buffer is not None
+            keep = numpy.flatnonzero(~self._deleted[: self._size])
+            self._buffer[: len(keep)] = self._buffer[keep]
+            self._deleted[:] = False
+            self.index = [self.index[i] for i in keep]
+            self.lookup = dict(zip(self.index, range(len(self.index))))
+            self._size = len(keep)
+            self._n_deleted = 0
+            self._invalidate_filters()
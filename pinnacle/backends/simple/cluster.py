@@ -6,14 +6,16 @@ from pinnacle import logging, pinnacle
 from pinnacle.backends.base.cluster import Cluster
 from pinnacle.backends.local.cdc import LocalCDCBackend
 from pinnacle.backends.local.crontab import LocalCrontabBackend
-from pinnacle.backends.local.vector_search import LocalVectorSearchBackend
+from pinnacle.backends.local.vector_search import (
+    LocalVectorSearchBackend,
+    load_searcher,
+)
 from pinnacle.backends.simple.compute import SimpleComputeBackend, SimpleComputeClient
 from pinnacle.backends.simple.scheduler import SimpleScheduler
 from pinnacle.backends.simple.vector_search import (
     SimpleVectorSearch,
     SimpleVectorSearchClient,
 )
-from pinnacle.misc.importing import load_plugin
 
 
 class SimpleCluster(Cluster):
@@ -38,6 +40,10 @@ class SimpleCluster(Cluster):
             crontab=LocalCrontabBackend(),
         )
 
+    def disconnect(self):
+        """Disconnect from the cluster, closing the vector-search sessions."""
+        self.vector_search.close()
+
     def drop(self, force: bool = False):
         """Drop the cluster.
 
@@ -68,7 +74,7 @@ class SimpleClusterBackend(Cluster):
     @classmethod
     def build(cls, CFG, **kwargs):
         """Build the local cluster."""
-        searcher_impl = load_plugin(CFG.vector_search_engine).VectorSearcher
+        searcher_impl = load_searcher(CFG.vector_search_engine)
 
         return SimpleClusterBackend(
             scheduler=SimpleScheduler(),
@@ -1,10 +1,13 @@
 import threading
 import typing as t
 
+from pinnacle import logging
 from pinnacle.backends.base.backends import Bookkeeping
+from pinnacle.backends.base.event_log import EventLogs
 from pinnacle.backends.base.scheduler import (
     BaseScheduler,
     consume_events,
+    raise_consumer_errors,
 )
 from pinnacle.base.event import Create, Delete, Signal, Update
 from pinnacle.base.metadata import Job
@@ -39,6 +42,10 @@ class SimpleScheduler(Bookkeeping, BaseScheduler):
     Contains a local queue which holds listeners, vector indices in a queue which
     consists of events to be consumed by the corresponding components.
 
+    With ``CFG.scheduler_log_dir`` set, table events are also written to
+    durable logs (see ``EventLogs``) before they are consumed, and the
+    events not consumed before a restart are consumed on ``replay``.
+
     :param uri: uri to connect.
     """
 
@@ -48,6 +55,7 @@ class SimpleScheduler(Bookkeeping, BaseScheduler):
 
         self.lock = threading.Lock()
         self.Q: t.Dict = {'_apply': []}
+        self.event_logs: t.Optional[EventLogs] = None
 
     @property
     def db(self):
@@ -60,6 +68,8 @@ class SimpleScheduler(Bookkeeping, BaseScheduler):
     def drop(self):
         """Drop the queue."""
         self.Q = {}
+        if self.event_logs is not None:
+            self.event_logs.drop()
 
     def build_tool(self, component):
         return QueueWrapper(component.cdc_table, self)
@@ -75,6 +85,29 @@ class SimpleScheduler(Bookkeeping, BaseScheduler):
                 self.put_component(c.component, c.uuid)
                 with self.lock:
                     self.Q[component, identifier] = []
+        if self.db.cfg.scheduler_log_dir:
+            self.event_logs = EventLogs(
+                self.db.cfg.scheduler_log_dir, fsync=self.db.cfg.scheduler_log_fsync
+            )
+
+    def replay(self):
+        """Consume the events which were not consumed before a restart."""
+        if self.event_logs is None:
+            return
+        # The logs are read without blocking the publishers
+        replayed = self.event_logs.replay()
+        dropped = []
+        with self.lock:
+            for queue, events in replayed.items():
+                if queue not in self.Q:
+                    dropped.append((queue, len(events)))
+                    continue
+                logging.info(f'Replaying {len(events)} events on {queue}')
+                self.Q[queue] = events + self.Q[queue]
+        for queue, n in dropped:
+            # No component consumes the table anymore
+            self.event_logs.ack(self.event_logs.take(queue, n))
+        self.publish([])
 
     def publish(self, events: t.List[Event]):
         """
@@ -82,9 +115,12 @@ class SimpleScheduler(Bookkeeping, BaseScheduler):
 
         :param events: list of events
         """
+        written: t.Dict = {}
         with self.lock:
             for event in events:
                 self.Q[event.queue].append(event)
+            if self.event_logs is not None:
+                written = self.event_logs.write(events)
 
             queues = list(self.Q.keys())
             data = []
@@ -92,11 +128,29 @@ class SimpleScheduler(Bookkeeping, BaseScheduler):
                 events = self.Q[queue].copy()
                 self.Q[queue] = []
                 if len(events) > 0:
-                    data.append((queue, events))
-
-        for queue, events in data:
-            consume_events(
-                events=events,  # type: ignore[arg-type]
-                table=queue,
-                db=self.db,
-            )
+                    taken = None
+                    if self.event_logs is not None and queue != '_apply':
+                        taken = self.event_logs.take(queue, len(events))
+                    data.append((queue, events, taken))
+
+        if written:
+            assert self.event_logs is not None
+            self.event_logs.sync(written)
+        # Each queue is consumed even if another fails; failed batches
+        # are not acked, so that they are consumed again by ``replay``
+        errors = []
+        for queue, events, taken in data:
+            try:
+                consume_events(
+                    events=events,  # type: ignore[arg-type]
+                    table=queue,
+                    db=self.db,
+                )
+            except Exception as e:
+                logging.error(f'Error consuming {len(events)} events on {queue}: {e}')
+                errors.append(e)
+            else:
+                if taken is not None:
+                    assert self.event_logs is not None
+                    self.event_logs.ack(taken)
+        raise_consumer_errors(errors)
@@ -1,12 +1,24 @@
+import asyncio
 import traceback
 import typing as t
+import weakref
 
+import httpx
 import numpy
 import requests
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
 
 from pinnacle import logging
-from pinnacle.backends.base.vector_search import VectorSearchBackend
+from pinnacle.backends.base.vector_search import (
+    BaseVectorSearcher,
+    VectorItem as ArrayVectorItem,
+    VectorSearchBackend,
+    decode_vectors,
+    encode_vectors,
+)
+
+VECTORS_CONTENT_TYPE = 'application/x-pinnacle-vectors'
 
 
 class VectorItem(BaseModel):
@@ -26,10 +38,76 @@ class SimpleVectorSearchClient(VectorSearchBackend):
 
     Inherits from both Client and VectorSearchBackend to provide vector search
     functionality with a REST API interface.
+
+    Requests go through a pooled keep-alive session. Vectors are added in
+    the binary ``encode_vectors`` format, with one request per
+    ``chunk_size`` vectors, sent one after the other. The
+    ``afind_nearest_*`` methods are natively async, with one pooled
+    ``httpx.AsyncClient`` per event loop; ``close`` closes all sessions.
+
+    :param chunk_size: Number of vectors sent per ``add`` request
+    :param pool_size: Maximum number of pooled connections
     """
 
-    def __init__(self):
+    def __init__(self, chunk_size: int = 10000, pool_size: int = 16):
         self.uri = 'http://localhost:8001/'
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool_size = pool_size
+        self._async_sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _async_session(self) -> httpx.AsyncClient:
+        # httpx clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        try:
+            return self._async_sessions[loop]
+        except KeyError:
+            session = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+                timeout=None,
+            )
+            self._async_sessions[loop] = session
+            return session
+
+    def close(self):
+        """Close the pooled sessions.
+
+        Async sessions are closed on their event loop; those of closed
+        loops are dropped.
+        """
+        self.session.close()
+        sessions, self._async_sessions = (
+            list(self._async_sessions.items()),
+            weakref.WeakKeyDictionary(),
+        )
+        for loop, session in sessions:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.aclose(), loop)
+            else:
+                loop.run_until_complete(session.aclose())
+
+    async def aclose(self):
+        """Close the pooled sessions, awaiting the async session of this loop."""
+        session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.aclose()
+        self.close()
+
+    async def _apost(self, path: str, payload: t.Dict) -> t.Dict:
+        response = await self._async_session().post(
+            f"{self.uri.rstrip('/')}/vector_search/{path}", json=payload
+        )
+        if response.status_code != 200:
+            raise Exception(f"Failed to find nearest vectors: {response.text}")
+        return response.json()
 
     def add(self, uuid: str, vectors: t.List['VectorItem']):
         """Add vectors to a vector index.
@@ -38,21 +116,30 @@ class SimpleVectorSearchClient(VectorSearchBackend):
         :param vectors: Vectors to add
         :return: Response from the add operation
         """
-        vectors = [{'id': x.id, 'vector': x.vector.tolist()} for x in vectors]
-        response = requests.post(
-            f'{self.uri}/vector_search/add', json={'uuid': uuid, 'vectors': vectors}
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"Failed to add vectors: {response.text}")
-        return response.json()
+        out = None
+        for i in range(0, len(vectors), self.chunk_size):
+            chunk = vectors[i : i + self.chunk_size]
+            payload = encode_vectors(
+                [x.id for x in chunk],
+                numpy.stack([BaseVectorSearcher.to_numpy(x.vector) for x in chunk]),
+            )
+            response = self.session.post(
+                f'{self.uri}/vector_search/add',
+                params={'uuid': uuid},
+                data=payload,
+                headers={'Content-Type': VECTORS_CONTENT_TYPE},
+            )
+            if response.status_code != 200:
+                raise Exception(f"Failed to add vectors: {response.text}")
+            out = response.json()
+        return out
 
     def initialize(self):
         """Initialize the vector search service.
 
         This method is a placeholder for any initialization logic needed.
         """
-        return requests.post(f'{self.uri}/vector_search/initialize')
+        return self.session.post(f'{self.uri}/vector_search/initialize')
 
     def delete(self, uuid, ids):
         """Delete ids from index.
@@ -61,7 +148,7 @@ class SimpleVectorSearchClient(VectorSearchBackend):
         :param ids: Ids to delete
         :return: Response from the delete operation
         """
-        response = requests.post(
+        response = self.session.post(
             f'{self.uri}/vector_search/delete',
             json={'uuid': uuid, 'ids': ids},
         )
@@ -75,7 +162,7 @@ class SimpleVectorSearchClient(VectorSearchBackend):
         :param component: component class name.
         :param vector_index: vector index identifier.
         """
-        return requests.get(
+        return self.session.get(
             f'{self.uri}/vector_search/describe?'
             f'component={component}&vector_index={vector_index}'
         )
@@ -86,7 +173,7 @@ class SimpleVectorSearchClient(VectorSearchBackend):
         :param component: Component to add
         :return: Response from the put operation
         """
-        response = requests.post(
+        response = self.session.post(
             f'{self.uri}/vector_search/put_component?component={component}&uuid={uuid}',
         )
         if response.status_code != 200:
@@ -109,7 +196,7 @@ class SimpleVectorSearchClient(VectorSearchBackend):
         :param within_ids: Optional list of IDs to search within
         :return: Tuple of (ids, scores) of nearest neighbors
         """
-        response = requests.post(
+        response = self.session.post(
             f'{self.uri}/vector_search/find_nearest_from_id',
             json={
                 'id': id,
@@ -141,7 +228,7 @@ class SimpleVectorSearchClient(VectorSearchBackend):
         :param within_ids: Optional list of IDs to search within
         :return: Tuple of (ids, scores) of nearest neighbors
         """
-        response = requests.post(
+        response = self.session.post(
             f'{self.uri}/vector_search/find_nearest_from_array',
             json={
                 'h': h.tolist(),  # type: ignore[union-attr]
@@ -156,6 +243,127 @@ class SimpleVectorSearchClient(VectorSearchBackend):
         out = response.json()
         return out['ids'], out['scores']
 
+    def find_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ):
+        """Find nearest vectors to each row of a matrix of query vectors.
+
+        All queries are sent in a single request.
+
+        :param h: Matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param component: Component class name
+        :param vector_index: Name of the vector index to search
+        :param n: Number of results to return per query
+        :param within_ids: Optional list of IDs to search within
+        :return: Tuple of (ids, scores) of nearest neighbors of each query
+        """
+        response = self.session.post(
+            f'{self.uri}/vector_search/find_nearest_from_arrays',
+            json={
+                'h': numpy.asarray(h).tolist(),
+                'component': component,
+                'vector_index': vector_index,
+                'n': n,
+                'within_ids': list(within_ids or ()),
+            },
+        )
+        if response.status_code != 200:
+            raise Exception(f"Failed to find nearest vectors: {response.text}")
+        out = response.json()
+        return out['ids'], out['scores']
+
+    async def afind_nearest_from_id(
+        self,
+        id: str,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ):
+        """Find nearest vectors to a vector with the given id without blocking.
+
+        :param id: ID of the vector to find nearest neighbors for
+        :param component: Component class name
+        :param vector_index: Name of the vector index to search
+        :param n: Number of results to return
+        :param within_ids: Optional list of IDs to search within
+        :return: Tuple of (ids, scores) of nearest neighbors
+        """
+        out = await self._apost(
+            'find_nearest_from_id',
+            {
+                'id': id,
+                'component': component,
+                'vector_index': vector_index,
+                'n': n,
+                'within_ids': list(within_ids or ()),
+            },
+        )
+        return out['ids'], out['scores']
+
+    async def afind_nearest_from_array(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ):
+        """Find nearest vectors to a given vector array without blocking.
+
+        :param h: Vector array to find nearest neighbors for
+        :param component: Component class name
+        :param vector_index: Name of the vector index to search
+        :param n: Number of results to return
+        :param within_ids: Optional list of IDs to search within
+        :return: Tuple of (ids, scores) of nearest neighbors
+        """
+        out = await self._apost(
+            'find_nearest_from_array',
+            {
+                'h': numpy.asarray(h).tolist(),
+                'component': component,
+                'vector_index': vector_index,
+                'n': n,
+                'within_ids': list(within_ids or ()),
+            },
+        )
+        return out['ids'], out['scores']
+
+    async def afind_nearest_from_arrays(
+        self,
+        h: numpy.typing.ArrayLike,
+        component: str,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ):
+        """Find nearest vectors to each row of a matrix without blocking.
+
+        :param h: Matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param component: Component class name
+        :param vector_index: Name of the vector index to search
+        :param n: Number of results to return per query
+        :param within_ids: Optional list of IDs to search within
+        :return: Tuple of (ids, scores) of nearest neighbors of each query
+        """
+        out = await self._apost(
+            'find_nearest_from_arrays',
+            {
+                'h': numpy.asarray(h).tolist(),
+                'component': component,
+                'vector_index': vector_index,
+                'n': n,
+                'within_ids': list(within_ids or ()),
+            },
+        )
+        return out['ids'], out['scores']
+
 
 class SimpleVectorSearch(VectorSearchBackend):
     """Service for vector similarity search.
@@ -248,6 +456,32 @@ class SimpleVectorSearch(VectorSearchBackend):
         )
         return {"ids": ids, "scores": scores}
 
+    def find_nearest_from_arrays(
+        self,
+        h: t.List,
+        vector_index: str,
+        n: int = 100,
+        within_ids: t.List | None = None,
+        component: str = 'VectorIndex',
+    ):
+        """Query the vector index with a batch of vectors.
+
+        :param h: Query vectors
+        :param vector_index: Vector index to query
+        :param n: Number of results to return per query
+        :param within_ids: Optional list of IDs to search within
+        :param component: Component type
+        :return: Dictionary with ids and scores of nearest neighbors of each query
+        """
+        ids, scores = self.backend.find_nearest_from_arrays(
+            numpy.asarray(h),
+            vector_index=vector_index,
+            component=component,
+            n=n,
+            within_ids=within_ids or (),
+        )
+        return {"ids": ids, "scores": scores}
+
     def add(self, vectors: t.List[VectorItem], uuid: str):
         """Add vectors to a vector index.
 
@@ -312,6 +546,8 @@ class SimpleVectorSearch(VectorSearchBackend):
 
         :param app: FastAPI application to set routes on
         """
+        from fastapi import HTTPException, Request
+        from fastapi.concurrency import run_in_threadpool
 
         @app.post("/vector_search/initialize")
         def initialize():
@@ -323,14 +559,32 @@ class SimpleVectorSearch(VectorSearchBackend):
             return {"status": "ok"}
 
         @app.post("/vector_search/add")
-        def add(kwargs: t.Dict):
+        async def add(request: Request, uuid: str | None = None):
             """Add vectors to a vector index.
 
-            :param kwargs: Dictionary containing 'vectors' and 'uuid' keys
+            Accepts the binary ``encode_vectors`` format with the ``uuid``
+            as query parameter, or JSON with 'vectors' and 'uuid' keys.
+
+            :param request: Request with the vectors
+            :param uuid: Vector index identifier for binary payloads
             :return: Result of the add operation
+            :raises HTTPException: If a binary payload has no ``uuid``
             """
+            if request.headers.get('content-type') == VECTORS_CONTENT_TYPE:
+                if uuid is None:
+                    raise HTTPException(
+                        status_code=400,
+                        detail='The uuid query parameter is required',
+                    )
+                ids, vectors = decode_vectors(await request.body())
+                items = [
+                    ArrayVectorItem(id=id, vector=vector)
+                    for id, vector in zip(ids, vectors)
+                ]
+                return await run_in_threadpool(self.add, vectors=items, uuid=uuid)
+            kwargs = await request.json()
             kwargs['vectors'] = [VectorItem(**x) for x in kwargs['vectors']]
-            return self.add(**kwargs)
+            return await run_in_threadpool(self.add, **kwargs)
 
         @app.post("/vector_search/delete")
         def delete(kwargs: t.Dict):
@@ -392,3 +646,12 @@ class SimpleVectorSearch(VectorSearchBackend):
             :return: Dictionary with ids and scores of nearest neighbors
             """
             return self.find_nearest_from_array(**kwargs)
+
+        @app.post("/vector_search/find_nearest_from_arrays")
+        def find_nearest_from_arrays(kwargs: t.Dict):
+            """Find nearest vectors to each of a batch of vector arrays.
+
+            :param kwargs: Dictionary containing search parameters
+            :return: Dictionary with ids and scores of nearest neighbors
+            """
+            return self.find_nearest_from_arrays(**kwargs)
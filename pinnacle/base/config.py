@@ -138,7 +138,43 @@ class Config(BaseConfig):
     :param bytes_encoding: (Deprecated)
     :param output_prefix: The prefix for the output table and output field key
     :param vector_search_kwargs: The keyword arguments to pass to the vector search
+    :param vector_search_snapshot_dir: Directory of on-disk snapshots of local
+                                       vector indexes (disabled if ``None``)
+    :param vector_search_max_workers: Number of threads which run blocking
+                                      searches and embeddings for the async
+                                      API (default: one per core)
     :param use_component_cache: Whether to use the component cache
+    :param query_embedding_cache_size: Number of query embeddings cached by
+                                       ``VectorIndex`` (disabled if ``0``,
+                                       the default)
+    :param query_embedding_cache_ttl: Seconds after which cached query
+                                      embeddings expire (never if ``None``)
+    :param change_event_batch_size: Maximum number of ids of each ``Change``
+                                    event published on inserts, updates
+                                    and deletes
+    :param scheduler_consumers: Number of threads consuming the events of
+                                the local scheduler in the background
+                                (on the publishing thread if ``0``)
+    :param scheduler_queue_size: Maximum number of events buffered per
+                                 queue before publishing blocks
+    :param scheduler_batch_max_events: Maximum number of events consumed
+                                       at once from a queue
+    :param scheduler_batch_max_latency: Seconds for which events are
+                                        buffered to be consumed together
+    :param scheduler_log_dir: Directory of the durable logs of the events of
+                              the scheduler (disabled if ``None``)
+    :param scheduler_log_fsync: Whether the event logs are synced to disk
+                                before the events are consumed
+    :param streaming_max_workers: Maximum number of jobs run at once on the
+                                  events of a table, by components which
+                                  don't depend on each other; above 1,
+                                  the backends must be usable from
+                                  several threads (see ``execute_jobs``)
+    :param compute_max_workers: Maximum number of jobs of an apply run at
+                                once by ``LocalComputeBackend``, for
+                                components which don't depend on each
+                                other; above 1, the backends must be
+                                usable from several threads
     """
 
     envs: dc.InitVar[t.Optional[t.Dict[str, str]]] = None
@@ -166,7 +202,20 @@ class Config(BaseConfig):
 
     output_prefix: str = "_outputs__"
     vector_search_kwargs: t.Dict = dc.field(default_factory=dict)
+    vector_search_snapshot_dir: t.Optional[str] = None
+    vector_search_max_workers: t.Optional[int] = None
     use_component_cache: bool = False
+    query_embedding_cache_size: int = 0
+    query_embedding_cache_ttl: t.Optional[float] = None
+    change_event_batch_size: int = 10000
+    scheduler_consumers: int = 0
+    scheduler_queue_size: int = 10000
+    scheduler_batch_max_events: int = 1000
+    scheduler_batch_max_latency: float = 0.05
+    scheduler_log_dir: t.Optional[str] = None
+    scheduler_log_fsync: bool = True
+    streaming_max_workers: int = 1
+    compute_max_workers: int = 1
 
     def __post_init__(self, envs):
         if envs is not None:
@@ -80,7 +80,7 @@ def _split_address(
 
 
 def _environ_dict(prefix: str, environ: t.Optional[StrDict] = None) -> StrDict:
-    if not (prefix.isupper() and prefix.endswith(SEP) and not prefix.startswith(SEP)):
+    if not (prefix.endswith(SEP) and not prefix.startswith(SEP)):
         raise ValueError(f'Bad prefix={prefix}')
 
     d = os.environ if environ is None else environ
@@ -332,6 +332,9 @@ class Datalayer:
         """
         Trigger computation jobs after data insertion.
 
+        The ids are published in ``Change`` events of at most
+        ``CFG.change_event_batch_size`` ids each.
+
         :param table: The table to trigger computation jobs on.
         :param ids: IDs that further reduce the scope of computations.
         :param event_type: The type of event to trigger.
@@ -345,11 +348,16 @@ class Datalayer:
             )
             return
 
-        events = []
-        for id in ids:
-            event = Change(ids=[str(id)], queue=table, type=event_type)
-            events.append(event)
-        logging.info(f'Created {len(events)} events for {event_type} on [{table}]')
+        ids = [str(id) for id in ids]
+        batch_size = max(1, self.cfg.change_event_batch_size)
+        events = [
+            Change(ids=ids[i : i + batch_size], queue=table, type=event_type)
+            for i in range(0, len(ids), batch_size)
+        ]
+        logging.info(
+            f'Created {len(events)} events for {event_type} of {len(ids)} ids '
+            f'on [{table}]'
+        )
         logging.info(f'Publishing {len(events)} events')
         assert self.cluster is not None
         return self.cluster.scheduler.publish(events)  # type: ignore[arg-type]
@@ -650,29 +658,27 @@ class Datalayer:
             uuid = info['uuid']
             info.update(overrides or {})
         else:
-            if use_component_cache and (component, identifier) in self._component_cache:
+            # Jobs may load components from several threads, so the
+            # cache is read once and entries evicted without checks
+            cached = None
+            if identifier is not None:
+                cached = self._component_cache.get((component, identifier))
+            if use_component_cache and cached is not None:
                 assert isinstance(identifier, str)
-                if self._component_cache[
-                    (component, identifier)
-                ].uuid == self.metadata.get_latest_uuid(
+                if cached.uuid == self.metadata.get_latest_uuid(
                     component=component,
                     identifier=identifier,
                 ):
                     logging.debug(f'Found {component, identifier} in cache...')
-                    return self._component_cache[(component, identifier)]
+                    return cached
                 else:
                     logging.info(
                         f'Found {component, identifier} '
                         'in cache but UUID does not match...'
                     )
-                    del self._uuid_component_cache[
-                        self._component_cache[(component, identifier)].uuid
-                    ]
-                    del self._component_cache[(component, identifier)]
-            elif (
-                not use_component_cache
-                and (component, identifier) in self._component_cache
-            ):
+                    self._uuid_component_cache.pop(cached.uuid, None)
+                    self._component_cache.pop((component, identifier), None)
+            elif not use_component_cache and cached is not None:
                 logging.info(
                     f'Found {component, identifier} in cache but '
                     'component_cache is disabled...'
@@ -682,9 +688,10 @@ class Datalayer:
             uuid = huuid.split(':')[-1]
 
         if uuid is not None:
-            if uuid in self._uuid_component_cache and use_component_cache:
+            cached = self._uuid_component_cache.get(uuid)
+            if cached is not None and use_component_cache:
                 logging.debug(f'Found {component, uuid} in cache...')
-                return self._uuid_component_cache[uuid]
+                return cached
             info = self.metadata.get_component_by_uuid(
                 component=component,
                 uuid=uuid,
@@ -771,26 +778,130 @@ class Datalayer:
         if not isinstance(like, Document):
             assert isinstance(like, dict)
             like = Document(like)
+        index, outs = self._nearest_args(vector_index, outputs)
+        return index.get_nearest(like, ids=ids, n=n, outputs=outs)
 
-        logging.info('Getting vector-index')
-        import time
+    def select_nearest_many(
+        self,
+        likes: t.Sequence[t.Union[t.Dict, Document]],
+        vector_index: str,
+        ids: t.Optional[t.Sequence[str]] = None,
+        outputs: t.Optional[Document] = None,
+        n: int = 100,
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Performs a batch of vector search queries on the given vector index.
 
-        start = time.time()
+        The vector index is loaded once, the queries are embedded in batches
+        and searched in a single call to the vector-search backend. Returns
+        the IDs and scores of each query, in the order of ``likes``.
 
-        from pinnacle.components.vector_index import VectorIndex
+        :param likes: Vector search documents to search.
+        :param vector_index: Vector index to search.
+        :param ids: (Optional) IDs to search within.
+        :param outputs: (Optional) Seed outputs dictionary.
+        :param n: Get top k results from vector search.
+        """
+        likes = [
+            like if isinstance(like, Document) else Document(like) for like in likes
+        ]
+        if not likes:
+            return [], []
+        index, outs = self._nearest_args(vector_index, outputs)
+        return index.get_nearest(likes, ids=ids, n=n, outputs=outs)
+
+    async def aselect_nearest(
+        self,
+        like: t.Union[t.Dict, Document],
+        vector_index: str,
+        ids: t.Optional[t.Sequence[str]] = None,
+        outputs: t.Optional[Document] = None,
+        n: int = 100,
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Performs a vector search query on the given vector index without blocking.
+
+        Embedding and search are awaited, so that many concurrent searches
+        can share one event loop.
+
+        :param like: Vector search document to search.
+        :param vector_index: Vector index to search.
+        :param ids: (Optional) IDs to search within.
+        :param outputs: (Optional) Seed outputs dictionary.
+        :param n: Get top k results from vector search.
+        """
+        if not isinstance(like, Document):
+            assert isinstance(like, dict)
+            like = Document(like)
+        index, outs = self._nearest_args(vector_index, outputs)
+        return await index.aget_nearest(like, ids=ids, n=n, outputs=outs)
 
-        vector_index: VectorIndex = self.load('VectorIndex', vector_index)
+    async def aselect_nearest_many(
+        self,
+        likes: t.Sequence[t.Union[t.Dict, Document]],
+        vector_index: str,
+        ids: t.Optional[t.Sequence[str]] = None,
+        outputs: t.Optional[Document] = None,
+        n: int = 100,
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """
+        Performs a batch of vector search queries without blocking.
 
-        logging.info(f'Getting vector-index in {time.time() - start}s ... DONE')
+        :param likes: Vector search documents to search.
+        :param vector_index: Vector index to search.
+        :param ids: (Optional) IDs to search within.
+        :param outputs: (Optional) Seed outputs dictionary.
+        :param n: Get top k results from vector search.
+        """
+        likes = [
+            like if isinstance(like, Document) else Document(like) for like in likes
+        ]
+        if not likes:
+            return [], []
+        index, outs = self._nearest_args(vector_index, outputs)
+        return await index.aget_nearest(likes, ids=ids, n=n, outputs=outs)
 
+    def select_text(
+        self,
+        query: str,
+        text_index: str,
+        ids: t.Optional[t.Sequence[str]] = None,
+        n: int = 100,
+        mode: t.Optional[str] = None,
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """
+        Performs a keyword (or hybrid) search on the given text index.
+
+        :param query: Query text.
+        :param text_index: Text index to search.
+        :param ids: (Optional) IDs to search within.
+        :param n: Get top k results.
+        :param mode: (Optional) ``'lexical'``, ``'rrf'`` or ``'rerank'``;
+                     see ``TextIndex.search``.
+        """
+        from pinnacle.components.text_index import TextIndex
+
+        index: TextIndex = self.load('TextIndex', text_index)
+        return index.search(query, n=n, ids=ids, mode=mode)
+
+    def _nearest_args(self, vector_index: str, outputs: t.Optional[Document]):
+        from pinnacle.components.vector_index import VectorIndex
+
+        index: VectorIndex = self.load('VectorIndex', vector_index)
         if outputs is None:
-            outs: t.Dict = {}
-        else:
-            outs = outputs.encode()
-            if not isinstance(outs, dict):
-                raise TypeError(f'Expected dict, got {type(outputs)}')
-        logging.info(str(outs))
-        return vector_index.get_nearest(like, ids=ids, n=n, outputs=outs)
+            return index, {}
+        outs = outputs.encode()
+        if not isinstance(outs, dict):
+            raise TypeError(f'Expected dict, got {type(outputs)}')
+        return index, outs
+
+    def flush(self, timeout: t.Optional[float] = None):
+        """Wait until the events published so far are consumed.
+
+        :param timeout: Maximum time to wait in seconds
+        """
+        assert self.cluster is not None
+        self.cluster.scheduler.flush(timeout=timeout)
 
     def disconnect(self):
         """Gracefully shutdown the Datalayer."""
@@ -233,6 +233,11 @@ class Create(Event):
                         parent_uuid=self.data['uuid'],
                     )
 
+            if db.metadata.is_cdc_component(self.component):
+                db.metadata.invalidate_streaming_graphs(
+                    db.metadata.get_streaming_tables(self.component, self.data['uuid'])
+                )
+
             logging.info(
                 f'Creating {self.path.split("/")[-1]}:'
                 f'{self.data["identifier"]}:{self.data["uuid"]}... DONE'
@@ -428,6 +433,11 @@ class Teardown(Event):
         except NotFound:
             pass
 
+        if db.metadata.is_cdc_component(self.component):
+            db.metadata.invalidate_streaming_graphs(
+                db.metadata.get_streaming_tables(self.component, self.uuid)
+            )
+
 
 class Delete(Event):
     """
@@ -457,6 +467,13 @@ class Delete(Event):
         try:
             object = db.load(component=self.component, identifier=self.identifier)
 
+            # Found before the relationships of the component are deleted
+            streaming_tables = set()
+            if db.metadata.is_cdc_component(self.component):
+                streaming_tables = db.metadata.get_streaming_tables(
+                    self.component, object.uuid
+                )
+
             for service in object.services:
                 getattr(db.cluster, service).drop_component(
                     component=self.component, identifier=self.identifier
@@ -492,6 +509,8 @@ class Delete(Event):
                 parent_identifier=self.identifier,
             )
 
+            db.metadata.invalidate_streaming_graphs(streaming_tables)
+
         except Exception as e:
             try:
                 db.metadata.set_component_failed(
@@ -535,6 +554,12 @@ class Update(Event):
         :param db: Datalayer instance.
         """
         try:
+            # The graphs holding the component before and after the update
+            streaming_tables = set()
+            if db.metadata.is_cdc_component(self.component):
+                streaming_tables = db.metadata.get_streaming_tables(
+                    self.component, self.data['uuid']
+                )
             artifact_ids, _ = db._find_artifacts(self.data)
             db.metadata.create_artifact_relation(
                 component=self.component,
@@ -545,6 +570,11 @@ class Update(Event):
             db.metadata.replace_object(
                 self.component, uuid=self.data['uuid'], info=self.data
             )
+            if db.metadata.is_cdc_component(self.component):
+                streaming_tables |= db.metadata.get_streaming_tables(
+                    self.component, self.data['uuid']
+                )
+            db.metadata.invalidate_streaming_graphs(streaming_tables)
         except Exception as e:
             db.metadata.set_component_failed(
                 component=self.component,
@@ -1,4 +1,5 @@
 import sys
+import typing as t
 from enum import Enum
 from http import HTTPStatus
 
@@ -270,6 +271,23 @@ class TimeoutError(AppException):
         )
 
 
+class ConsumerError(AppException):
+    """
+    Events published to a scheduler failed to be consumed.
+
+    :param errors: the errors raised by the consumers
+    """
+
+    def __init__(self, errors: t.Sequence[Exception]):
+        self.errors = list(errors)
+        super().__init__(
+            code=HTTPStatus.INTERNAL_SERVER_ERROR,
+            reason=StatusReason.INTERNAL_ERROR,
+            message=f"{len(self.errors)} errors consuming events: "
+            + "; ".join(f"{type(e).__name__}: {e}" for e in self.errors),
+        )
+
+
 class InvalidResource(AppException):
     """
     The request is valid, but the server was unable to process the contained instructions for the resource.
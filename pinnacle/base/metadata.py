@@ -428,13 +428,31 @@ class ArtifactRelations(Base):
     artifact_id: str
 
 
+class Version(Base):
+    """Version table.
+
+    :param name: name of the version
+    :param value: random token, replaced whenever the version changes
+    """
+
+    primary_id: t.ClassVar[str] = 'name'
+    name: str
+    value: str = ''
+
+
 metaclasses = {
     'Table': Table,
     'ParentChildAssociations': ParentChildAssociations,
     'ArtifactRelations': ArtifactRelations,
     'Job': Job,
+    'Version': Version,
 }
 
+# Prefix of the versions of the tables, bumped whenever the ``CDC``
+# components in their streaming graphs change, so that processes know
+# when to rebuild these graphs
+CDC_VERSION = 'cdc'
+
 _component_cache = contextvars.ContextVar('component_cache', default=None)
 
 
@@ -454,7 +472,10 @@ class MetaDataStore:
             "ParentChildAssociations": "uuid",
             "ArtifactRelations": "relation_id",
             "Job": "job_id",
+            "Version": "name",
         }
+        # table -> (version of the table, components in topological order)
+        self.streaming_graphs: t.Dict[str, t.Tuple[str, t.List]] = {}
 
     def __getitem__(self, item: str):
         return self.db[item]
@@ -490,6 +511,7 @@ class MetaDataStore:
         self.create(ParentChildAssociations)
         self.create(ArtifactRelations)
         self.create(Job)
+        self.create(Version)
 
     @contextmanager
     def cache(self):
@@ -589,6 +611,7 @@ class MetaDataStore:
             logging.warn('Aborting drop of metadata store')
         self.db.databackend.drop(force=force)
         self.db.artifact_store.drop(force=force)
+        self.streaming_graphs.clear()
 
     def is_component(self, table: str):
         """Check if a table is a component.
@@ -1097,6 +1120,94 @@ class MetaDataStore:
             cdc_tables.extend(self.db[r['identifier']].distinct('cdc_table'))
         return cdc_tables
 
+    def get_version(self, name: str) -> str:
+        """Get the token of a version, ``''`` if never bumped.
+
+        :param name: name of the version.
+        """
+        r = self.db['Version'].get(name=name)
+        return '' if r is None else r['value']
+
+    def bump_version(self, name: str) -> str:
+        """Replace the token of a version with a new one and return it.
+
+        The new token does not depend on the old one, so that concurrent
+        bumps are never lost, as increments read beforehand would be.
+
+        :param name: name of the version.
+        """
+        token = str(uuid.uuid4())
+        if self.db['Version'].get(name=name) is not None:
+            self.db['Version'].update({'name': name}, 'value', token)
+            return token
+        try:
+            self.db['Version'].insert([{'name': name, 'value': token}])
+        except Exception:
+            # Inserted concurrently by another process
+            self.db['Version'].update({'name': name}, 'value', token)
+        return token
+
+    def is_cdc_component(self, component: str) -> bool:
+        """Check whether a type of component is a ``CDC`` component.
+
+        :param component: type of component.
+        """
+        try:
+            info = self._get_component_class_info(component)
+        except exceptions.NotFound:
+            return False
+        if not info or not info.get('path'):
+            return False
+        return issubclass(import_object(info['path']), CDC)
+
+    def get_streaming_version(self, table: str) -> str:
+        """Get the version of the streaming graph of a table.
+
+        :param table: table of the graph.
+        """
+        return self.get_version(f'{CDC_VERSION}:{table}')
+
+    def get_streaming_tables(self, component: str, uuid: str) -> t.Set[str]:
+        """Get the tables whose streaming graphs hold a ``CDC`` component.
+
+        These are the table of the component and, recursively, the tables
+        of the upstream ``CDC`` components whose outputs it consumes.
+
+        :param component: type of component.
+        :param uuid: UUID of the component.
+        """
+        associations = self.db['ParentChildAssociations']
+        tables = set()
+        todo, seen = [(component, uuid)], set()
+        while todo:
+            component, uuid = todo.pop()
+            if uuid in seen:
+                continue
+            seen.add(uuid)
+            try:
+                r = self.get_component_by_uuid(component, uuid)
+            except exceptions.NotFound:
+                continue
+            if not r.get('cdc_table'):
+                continue
+            tables.add(r['cdc_table'])
+            children = associations.filter(associations['parent_uuid'] == uuid).select(
+                'child_component', 'child_uuid'
+            )
+            todo.extend(
+                (c['child_component'], c['child_uuid']) for c in children.execute()
+            )
+        return tables
+
+    def invalidate_streaming_graphs(self, tables: t.Iterable[str]):
+        """Invalidate the streaming graphs of tables in all processes.
+
+        :param tables: tables of the graphs, see ``get_streaming_tables``.
+        """
+        for table in tables:
+            self.streaming_graphs.pop(table, None)
+            self.bump_version(f'{CDC_VERSION}:{table}')
+
     def show_cdcs(self, table):
         """
         Show the ``CDC`` components running on a given table.
@@ -518,12 +518,15 @@ def filter(self, *filters):
 
 
 @bind
-def like(self, r: t.Dict, vector_index: str, n: int = 10):
+def like(self, r: t.Union[t.Dict, t.List[t.Dict]], vector_index: str, n: int = 10):
     """Create a similarity query with a vector_index.
 
+    Given a list of documents, the queries are searched as one batch, and
+    the query returns a list of results for each document.
+
     # noqa
 
-    :param r: The vector to compare against.
+    :param r: The vector (or list of vectors) to compare against.
     :param vector_index: The index of the vector.
     :param n: The number of results to return.
     """
@@ -67,6 +67,27 @@ def _get_downstream_cdc_components(component: CDC, db: 'Datalayer'):
     return out
 
 
+def get_streaming_components(table, db: "Datalayer") -> t.List[CDC]:
+    """Get the components of the streaming graph of a table in topological order.
+
+    The list is cached per table until ``CDC`` components of the graph
+    are created, updated, torn down or deleted, in this or any other
+    process, as tracked by the version of the table in the metadata store.
+
+    :param table: The table to get the components of.
+    :param db: Datalayer instance
+    """
+    # Read before building, so that a change made meanwhile invalidates
+    version = db.metadata.get_streaming_version(table)
+    cached = db.metadata.streaming_graphs.get(table)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    G = build_streaming_graph(table, db)
+    components = [G.nodes[huuid]['component'] for huuid in nx.topological_sort(G)]
+    db.metadata.streaming_graphs[table] = (version, components)
+    return components
+
+
 def build_streaming_graph(table, db: "Datalayer") -> nx.DiGraph:
     """Build a streaming graph from a table.
 
@@ -30,6 +30,7 @@ from pinnacle.misc.importing import isreallyinstance
 from pinnacle.misc.utils import hash_item
 
 if t.TYPE_CHECKING:
+    from pinnacle.backends.base.scheduler import Future
     from pinnacle.base.datalayer import Datalayer
     from pinnacle.base.metadata import Job
 
@@ -143,7 +144,10 @@ class ComponentMeta(BaseMeta):
         for base in bases:
             if hasattr(base, 'metadata_fields'):
                 pinnacled_metadata_fields.update(base.metadata_fields)
-        new_cls.metadata_fields = {**new_cls.metadata_fields, **pinnacled_metadata_fields}
+        new_cls.metadata_fields = {
+            **new_cls.metadata_fields,
+            **pinnacled_metadata_fields,
+        }
 
         for base in bases:
             if hasattr(base, 'triggers'):
@@ -495,7 +499,7 @@ class Component(Base, metaclass=ComponentMeta):
         self,
         context: str,
         event_type: str,
-        ids: t.Sequence[str] | None = None,
+        ids: t.Union[t.Sequence[str], 'Future', None] = None,
         jobs: t.Sequence['Job'] = (),
         requires: t.Sequence[str] | None = None,
     ) -> t.List['Job']:
@@ -503,7 +507,7 @@ class Component(Base, metaclass=ComponentMeta):
 
         :param context: The context of the component.
         :param event_type: The event type.
-        :param ids: The ids of the component.
+        :param ids: The ids of the component, or the ``Future`` of upstream outputs.
         :param jobs: The jobs of the component.
         :param requires: The requirements of the component.
         """
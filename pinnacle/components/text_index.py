@@ -0,0 +1,171 @@
+import threading
+import typing as t
+
+from pinnacle.base.annotations import trigger
+from pinnacle.base.datalayer import Datalayer
+from pinnacle.base.document import Document
+from pinnacle.components.cdc import CDC
+from pinnacle.components.vector_index import VectorIndex, ibatch
+
+if t.TYPE_CHECKING:
+    from pinnacle.backends.local.text_search import BM25Index
+
+# Keyword indexes of this process, by component uuid; they are only
+# updated by the triggers run in this process
+_TEXT_INDEXES: t.Dict[str, 'BM25Index'] = {}
+_TEXT_INDEXES_LOCK = threading.RLock()
+
+FUSIONS = ('rrf', 'rerank')
+
+
+def reciprocal_rank_fusion(
+    rankings: t.Sequence[t.Sequence[str]], k: int = 60, n: t.Optional[int] = None
+) -> t.Tuple[t.List[str], t.List[float]]:
+    """Fuse rankings of ids by reciprocal rank fusion.
+
+    Each id scores ``sum(1 / (k + rank))`` over the rankings it is in,
+    ``rank`` counting from 1.
+
+    :param rankings: Rankings of ids, best first
+    :param k: Rank offset, damping the weight of the top ranks
+    :param n: Number of results to return
+    """
+    scores: t.Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0.0) + 1.0 / (k + rank)
+    ids = sorted(scores, key=scores.__getitem__, reverse=True)[:n]
+    return ids, [scores[id] for id in ids]
+
+
+class TextIndex(CDC):
+    """
+    A component carrying a BM25 keyword index over a text column.
+
+    The index is held in-process, built from ``cdc_table`` when first
+    used, and kept up to date by the same triggers as ``VectorIndex``.
+    Given a ``vector_index`` over the same table, searches fuse the
+    keyword and vector results, only ever handling ``candidates`` ids
+    of each.
+
+    As the index lives in the memory of the process, it only supports
+    clusters which run the triggers of the component in the process
+    which searches it, such as the ``local`` cluster. With triggers run
+    by another process, e.g. on a ``simple`` cluster, the index of the
+    searching process misses the changes since it was built.
+
+    :param key: Column holding the text to index
+    :param cdc_table: Table to index; defaults to the table of
+                      ``vector_index``
+    :param vector_index: Vector index to fuse with the keyword results
+    :param fusion: Default fusion of keyword and vector results;
+                   ``'rrf'`` (reciprocal rank fusion) or ``'rerank'``
+                   (vector re-ranking of the keyword candidates)
+    :param candidates: Number of results taken from each retriever
+    :param rrf_k: Rank offset of reciprocal rank fusion
+    :param k1: BM25 term frequency saturation
+    :param b: BM25 document length normalization
+    """
+
+    breaks: t.ClassVar[t.Sequence[str]] = ('cdc_table', 'key', 'k1', 'b')
+
+    key: str
+    cdc_table: str = ''
+    vector_index: t.Optional[VectorIndex] = None
+    fusion: str = 'rrf'
+    candidates: int = 100
+    rrf_k: int = 60
+    k1: float = 1.2
+    b: float = 0.75
+
+    component_cache: t.ClassVar[bool] = True
+
+    def postinit(self):
+        """Post-initialization method."""
+        super().postinit()
+        if not self.cdc_table and self.vector_index is not None:
+            self.cdc_table = self.vector_index.indexing_listener.cdc_table
+        if self.fusion not in FUSIONS:
+            raise ValueError(
+                f'Unknown fusion {self.fusion!r}; expected one of {FUSIONS}'
+            )
+
+    def _index(self, load: bool = True) -> 'BM25Index':
+        # The keyword index of this component, loading the texts of
+        # ``cdc_table`` into it when it is created if ``load``
+        from pinnacle.backends.local.text_search import BM25Index
+
+        with _TEXT_INDEXES_LOCK:
+            index = _TEXT_INDEXES.get(self.uuid)
+            if index is None:
+                index = _TEXT_INDEXES[self.uuid] = BM25Index(k1=self.k1, b=self.b)
+                if load:
+                    self._add_texts(index)
+            return index
+
+    def _add_texts(self, index: 'BM25Index', ids=None, batch_size: int = 10000):
+        assert isinstance(self.db, Datalayer)
+        select = self.db[self.cdc_table].select()
+        if ids is None:
+            ids = select.ids()
+        primary_id = select.primary_id.execute()
+        for batch in ibatch(ids, batch_size):
+            docs = [r.unpack() for r in select.subset(batch)]
+            index.add(
+                [str(d[primary_id]) for d in docs], [d.get(self.key) for d in docs]
+            )
+
+    @trigger('apply', 'insert', 'update')
+    def copy_texts(self, ids: t.Sequence[str] | None = None):
+        """Copy texts to the keyword index."""
+        self._add_texts(self._index(load=ids is not None), ids=ids)
+
+    @trigger('delete')
+    def delete_texts(self, ids: t.Sequence[str] | None = None):
+        """Delete texts from the keyword index."""
+        self._index().delete(ids or [])
+
+    def search(
+        self,
+        query: str,
+        n: int = 100,
+        ids: t.Optional[t.Sequence[str]] = None,
+        like: t.Optional[Document] = None,
+        mode: t.Optional[str] = None,
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """Search the index, returned as two parallel lists of ids and scores.
+
+        :param query: Query text
+        :param n: Number of results to return
+        :param ids: A list of ids to match
+        :param like: Document to search ``vector_index`` with; defaults to
+                     ``{key: query}``
+        :param mode: ``'lexical'``, ``'rrf'`` or ``'rerank'``; defaults to
+                     ``fusion`` if there is a ``vector_index``, else
+                     ``'lexical'``
+        """
+        if mode is None:
+            mode = 'lexical' if self.vector_index is None else self.fusion
+        index = self._index()
+        if mode == 'lexical':
+            return index.search(query, n=n, within_ids=ids)
+        if mode not in FUSIONS:
+            raise ValueError(f'Unknown mode {mode!r}')
+        if self.vector_index is None:
+            raise ValueError(f'{self.huuid} has no vector_index to fuse with')
+
+        if like is None:
+            like = Document({self.key: query})
+        candidates, _ = index.search(query, n=max(n, self.candidates), within_ids=ids)
+        if mode == 'rerank':
+            if not candidates:
+                return [], []
+            return self.vector_index.get_nearest(like, ids=candidates, n=n)
+        nearest, _ = self.vector_index.get_nearest(like, ids=ids, n=self.candidates)
+        return reciprocal_rank_fusion([candidates, nearest], k=self.rrf_k, n=n)
+
+    def cleanup(self):
+        """Clean up the keyword index."""
+        super().cleanup()
+        with _TEXT_INDEXES_LOCK:
+            _TEXT_INDEXES.pop(self.uuid, None)
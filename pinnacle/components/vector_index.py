@@ -1,10 +1,19 @@
+import asyncio
+import copy
 import dataclasses as dc
+import hashlib
 import itertools
 import time
 import typing as t
 
+import numpy
+
 from pinnacle import CFG, logging
-from pinnacle.backends.base.vector_search import VectorItem
+from pinnacle.backends.base.vector_search import (
+    BaseVectorSearcher,
+    VectorItem,
+    run_in_search_executor,
+)
 from pinnacle.base.annotations import trigger
 from pinnacle.base.datalayer import Datalayer
 from pinnacle.base.document import Document
@@ -12,7 +21,8 @@ from pinnacle.components.cdc import CDC
 from pinnacle.components.component import ensure_setup
 from pinnacle.components.listener import Listener
 from pinnacle.components.table import Table
-from pinnacle.misc.special_dicts import DeepKeyedDict
+from pinnacle.misc.special_dicts import DeepKeyedDict, LRUCache
+from pinnacle.misc.utils import hash_item
 
 if t.TYPE_CHECKING:
     pass
@@ -36,6 +46,139 @@ def ibatch(iterable: t.Iterable[T], batch_size: int) -> t.Iterator[t.List[T]]:
         yield batch
 
 
+_QUERY_EMBEDDING_CACHE = LRUCache(max_size=0)
+# Latest uuid of each model whose embeddings are cached, by identifier
+_QUERY_EMBEDDING_MODELS: t.Dict[str, str] = {}
+
+
+def query_embedding_cache() -> LRUCache:
+    """Cache of query embeddings shared by all vector indexes.
+
+    Sized by ``CFG.query_embedding_cache_size`` and
+    ``CFG.query_embedding_cache_ttl``.
+    """
+    _QUERY_EMBEDDING_CACHE.max_size = CFG.query_embedding_cache_size
+    _QUERY_EMBEDDING_CACHE.ttl = CFG.query_embedding_cache_ttl
+    return _QUERY_EMBEDDING_CACHE
+
+
+def _content_hash(value: t.Any) -> t.Optional[str]:
+    # Only inputs whose content is fully captured by the hash are cached.
+    if isinstance(value, numpy.ndarray):
+        header = f'{value.dtype}{value.shape}'.encode()
+        return hashlib.sha256(header + value.tobytes()).hexdigest()
+    if value is None or isinstance(value, (str, bytes, int, float)):
+        return hash_item(repr(value))
+    if isinstance(value, (list, tuple)):
+        parts = [_content_hash(v) for v in value]
+    elif isinstance(value, dict):
+        parts = [
+            _content_hash(x) for k in sorted(value, key=repr) for x in (k, value[k])
+        ]
+    else:
+        return None
+    if None in parts:
+        return None
+    return hash_item(f'{type(value).__name__}{parts}')
+
+
+def _likes(
+    like: t.Union[Document, t.Sequence[Document]],
+) -> t.Tuple[t.List[Document], bool]:
+    # The queries of a search, and whether it searches a batch of queries
+    if isinstance(like, (list, tuple)):
+        return list(like), True
+    assert isinstance(like, dict)
+    return [like], False
+
+
+def _frozen(h):
+    # Cached embeddings are shared by all later queries, hence arrays are
+    # cached as read-only copies, and other values copied in and out
+    if isinstance(h, numpy.ndarray):
+        h = h.copy()
+        h.flags.writeable = False
+        return h
+    return copy.deepcopy(h)
+
+
+def _thawed(h):
+    return h if isinstance(h, numpy.ndarray) else copy.deepcopy(h)
+
+
+def _cached_queries(model, key: KeyType, inputs: t.Sequence):
+    # Look ``inputs`` up in the query embedding cache; returns the cached
+    # embeddings (``None`` if missing), the cache keys, and the positions
+    # of the missing inputs grouped by input, so that repeats are
+    # predicted once.
+    cache = query_embedding_cache()
+    cache_keys: t.List[t.Optional[t.Tuple]] = [None] * len(inputs)
+    if cache.max_size > 0:
+        previous = _QUERY_EMBEDDING_MODELS.get(model.identifier)
+        if previous != model.uuid:
+            if previous is not None:
+                cache.evict(lambda k: isinstance(k, tuple) and k[0] == previous)
+            _QUERY_EMBEDDING_MODELS[model.identifier] = model.uuid
+        key_hash = hash_item(key)
+        for i, input in enumerate(inputs):
+            content = _content_hash(input)
+            if content is not None:
+                cache_keys[i] = (model.uuid, key_hash, content)
+
+    out = [None if k is None else _thawed(cache.get(k)) for k in cache_keys]
+    pending: t.Dict[t.Any, t.List[int]] = {}
+    for i, h in enumerate(out):
+        if h is None:
+            pending.setdefault(cache_keys[i] or i, []).append(i)
+    return out, cache_keys, list(pending.values())
+
+
+def _cache_queries(out, cache_keys, positions, predictions) -> t.List:
+    cache = query_embedding_cache()
+    for p, h in zip(positions, predictions):
+        for i in p:
+            out[i] = h
+        if cache_keys[p[0]] is not None:
+            cache.put(cache_keys[p[0]], _frozen(h))
+    return out
+
+
+def _predict_queries(model, key: KeyType, inputs: t.Sequence) -> t.List:
+    # Embed ``inputs`` with ``model``, only predicting those which are not
+    # cached.
+    out, cache_keys, positions = _cached_queries(model, key, inputs)
+    if not positions:
+        return out
+    if len(positions) == 1:
+        predictions = [model.predict(inputs[positions[0][0]])]
+    else:
+        predictions = model.predict_batches([inputs[p[0]] for p in positions])
+    return _cache_queries(out, cache_keys, positions, predictions)
+
+
+async def _apredict_queries(model, key: KeyType, inputs: t.Sequence) -> t.List:
+    # As ``_predict_queries``, awaiting the model's ``async_predict_batches``
+    # or ``async_predict`` if it has them, or else predicting on
+    # ``search_executor()``.
+    out, cache_keys, positions = _cached_queries(model, key, inputs)
+    if not positions:
+        return out
+    misses = [inputs[p[0]] for p in positions]
+    if len(misses) > 1 and hasattr(model, 'async_predict_batches'):
+        predictions = await model.async_predict_batches(misses)
+    elif hasattr(model, 'async_predict'):
+        predictions = await asyncio.gather(*[model.async_predict(x) for x in misses])
+    elif len(misses) == 1:
+        predictions = [await run_in_search_executor(model.predict, misses[0])]
+    else:
+        predictions = await run_in_search_executor(model.predict_batches, misses)
+    return _cache_queries(out, cache_keys, positions, predictions)
+
+
+def _predict_query(model, key: KeyType, input: t.Any):
+    return _predict_queries(model, key, [input])[0]
+
+
 class VectorIndex(CDC):
     """
     A component carrying the information to apply a vector index.
@@ -86,6 +229,7 @@ class VectorIndex(CDC):
         return self
 
     def list(self):
+        """List the ids of the vectors in the vector index."""
         return self.db[self.indexing_listener.outputs].ids()
 
     @ensure_setup
@@ -94,6 +238,25 @@ class VectorIndex(CDC):
 
         :param ids: A list of ids to match
         """
+        return [
+            {'vector': vector, 'id': id}
+            for page_ids, vectors in self.iter_vectors(ids=ids)
+            for id, vector in zip(page_ids, vectors)
+        ]
+
+    @ensure_setup
+    def iter_vectors(
+        self, ids: t.Sequence[str] | None = None, batch_size: int = 10000
+    ) -> t.Iterator[t.Tuple[t.List[str], numpy.ndarray]]:
+        """Iterate over the vectors of the vector index in pages.
+
+        Reads all outputs with one query, or those of ``ids`` with one
+        query per page, and decodes them one page at a time. Yields the
+        ids of each page and its vectors stacked in a single array.
+
+        :param ids: A list of ids to match
+        :param batch_size: Number of outputs per page
+        """
         self.indexing_listener.setup()
         if not hasattr(self.indexing_listener.model, 'datatype'):
             self.indexing_listener.model = self.db.load(
@@ -105,28 +268,26 @@ class VectorIndex(CDC):
         # TODO do this using the backfill_vector_search functionality here
         if ids is None:
             assert self.indexing_listener.select is not None
-            ids = select.ids()
-            docs = [r.unpack() for r in select.execute()]
+            pages = ibatch(select.execute(), batch_size)
         else:
-            docs = [r.unpack() for r in select.subset(ids)]
+            pages = (select.subset(batch) for batch in ibatch(ids, batch_size))
 
-        vectors = []
+        key = f'{CFG.output_prefix}{self.indexing_listener.predict_id}'
         nokeys = 0
-        for doc in docs:
-            try:
-                vector = DeepKeyedDict(doc)[
-                    f'{CFG.output_prefix}{self.indexing_listener.predict_id}'
-                ]
-            except KeyError:
-                nokeys += 1
-                continue
-
-            vectors.append(
-                {
-                    'vector': vector,
-                    'id': str(doc['_source']),
-                }
-            )
+        for page in pages:
+            page_ids = []
+            vectors = []
+            for r in page:
+                doc = r.unpack()
+                try:
+                    vector = DeepKeyedDict(doc)[key]
+                except KeyError:
+                    nokeys += 1
+                    continue
+                page_ids.append(str(doc['_source']))
+                vectors.append(BaseVectorSearcher.to_numpy(vector))
+            if vectors:
+                yield page_ids, numpy.stack(vectors)
 
         if nokeys:
             logging.warn(
@@ -135,23 +296,19 @@ class VectorIndex(CDC):
                 'trigged before model outputs are yet to be computed.'
             )
 
-        for r in vectors:
-            if hasattr(r['vector'], 'numpy'):
-                r['vector'] = r['vector'].numpy()
-
-        return vectors
-
     # TODO consider a flag such as depends='*'
     # so that an "apply" trigger runs after all of the other
     # triggers
     @trigger('apply', 'insert', 'update')
     def copy_vectors(self, ids: t.Sequence[str] | None = None):
         """Copy vectors to the vector index."""
-        vectors = self.get_vectors(ids=ids)
         # TODO combine logic from backfill
-        if vectors:
+        for page_ids, vectors in self.iter_vectors(ids=ids):
             self.db.cluster.vector_search.add(
-                uuid=self.uuid, vectors=[VectorItem(**vector) for vector in vectors]
+                uuid=self.uuid,
+                vectors=[
+                    VectorItem(id=id, vector=v) for id, v in zip(page_ids, vectors)
+                ],
             )
 
     @trigger('delete')
@@ -170,7 +327,9 @@ class VectorIndex(CDC):
         """Peform vector search.
 
         Perform vector search with query `like` from outputs in db
-        on `self.identifier` vector index.
+        on `self.identifier` vector index. Embeddings of queries are
+        cached in ``query_embedding_cache()``, keyed by the model uuid,
+        the key and a hash of the input.
 
         :param like: The document to compare against
         :param models: List of models to retrieve outputs
@@ -178,6 +337,80 @@ class VectorIndex(CDC):
         :param outputs: (optional) update `like` with outputs
 
         """
+        model, key, document = self._resolve_query(like, models, keys, outputs)
+        return (
+            _predict_query(model, key, document[key]),
+            model.identifier,
+            key,
+        )
+
+    def get_query_vectors(
+        self,
+        likes: t.Sequence[Document],
+        models: t.Dict,
+        keys: KeyType,
+        outputs: t.Optional[t.Dict] = None,
+    ) -> numpy.ndarray:
+        """Embed many queries at once.
+
+        Queries are grouped by the model and key which embed them, and the
+        queries of each group which are not in ``query_embedding_cache()``
+        are embedded in a single call to ``predict_batches``.
+
+        :param likes: The documents to compare against
+        :param models: List of models to retrieve outputs
+        :param keys: Keys available to retrieve outputs of model
+        :param outputs: (optional) update each of `likes` with outputs
+        """
+        out: t.List[t.Any] = [None] * len(likes)
+        for model, key, positions, inputs in self._group_queries(
+            likes, models, keys, outputs
+        ):
+            for i, h in zip(positions, _predict_queries(model, key, inputs)):
+                out[i] = BaseVectorSearcher.to_numpy(h)
+        return numpy.stack(out)
+
+    async def aget_query_vectors(
+        self,
+        likes: t.Sequence[Document],
+        models: t.Dict,
+        keys: KeyType,
+        outputs: t.Optional[t.Dict] = None,
+    ) -> numpy.ndarray:
+        """Embed many queries at once without blocking.
+
+        As ``get_query_vectors``, awaiting models with an ``async_predict``
+        method, and running the others on ``search_executor()``.
+
+        :param likes: The documents to compare against
+        :param models: List of models to retrieve outputs
+        :param keys: Keys available to retrieve outputs of model
+        :param outputs: (optional) update each of `likes` with outputs
+        """
+        groups = self._group_queries(likes, models, keys, outputs)
+        predictions = await asyncio.gather(
+            *[_apredict_queries(model, key, inputs) for model, key, _, inputs in groups]
+        )
+        out: t.List[t.Any] = [None] * len(likes)
+        for (_, _, positions, _), group in zip(groups, predictions):
+            for i, h in zip(positions, group):
+                out[i] = BaseVectorSearcher.to_numpy(h)
+        return numpy.stack(out)
+
+    def _group_queries(self, likes, models, keys, outputs):
+        # Group the inputs of ``likes`` by the model and key which embed them
+        groups: t.Dict[str, t.Tuple[t.Any, t.Any, t.List[int], t.List]] = {}
+        for i, like in enumerate(likes):
+            model, key, document = self._resolve_query(like, models, keys, outputs)
+            group = groups.setdefault(
+                f'{model.identifier}/{hash_item(key)}', (model, key, [], [])
+            )
+            group[2].append(i)
+            group[3].append(document[key])
+        return list(groups.values())
+
+    def _resolve_query(self, like: Document, models: t.Dict, keys: KeyType, outputs):
+        # Find the model and key which embed ``like``
         document = DeepKeyedDict(like.unpack())
         if outputs is not None:
             document.update(outputs)
@@ -210,25 +443,25 @@ class VectorIndex(CDC):
 
         model = models[model_name]
         assert model.signature == 'singleton'
-        return (
-            model.predict(document[key]),
-            model.identifier,
-            key,
-        )
+        return model, key, document
 
     def get_nearest(
         self,
-        like: Document,
+        like: t.Union[Document, t.Sequence[Document]],
         outputs: t.Optional[t.Dict] = None,
         ids: t.Optional[t.Sequence[str]] = None,
         n: int = 100,
-    ) -> t.Tuple[t.List[str], t.List[float]]:
+    ) -> t.Tuple[t.List, t.List]:
         """Get nearest results in this vector index.
 
         Given a document, find the nearest results in this vector index, returned as
         two parallel lists of result IDs and scores.
 
-        :param like: The document to compare against
+        Given a list of documents, the queries are embedded in batches and
+        sent to the vector-search backend as a single batch, and the result
+        is two lists holding the IDs and scores of each query.
+
+        :param like: The document (or list of documents) to compare against
         :param outputs: An optional dictionary
         :param ids: A list of ids to match
         :param n: Number of items to return
@@ -237,20 +470,33 @@ class VectorIndex(CDC):
         if len(models) != len(keys):
             raise ValueError(f'len(model={models}) != len(keys={keys})')
         within_ids = ids or ()
+        likes, batched = _likes(like)
 
         logging.info('Building vector for search')
         start = time.time()
-        h = self.get_vector(
-            like=like,
-            models=models,
-            keys=keys,
-            outputs=outputs,
-        )[0]
+        if batched:
+            h = self.get_query_vectors(
+                likes=likes, models=models, keys=keys, outputs=outputs
+            )
+        else:
+            (like,) = likes
+            h = self.get_vector(
+                like=like,
+                models=models,
+                keys=keys,
+                outputs=outputs,
+            )[0]
         logging.info(f'Building vector for search ... DONE ({time.time() - start}s)')
 
         logging.info('Comparing vectors')
         start = time.time()
-        results = self.db.cluster.vector_search.find_nearest_from_array(
+        vector_search = self.db.cluster.vector_search
+        method = (
+            vector_search.find_nearest_from_arrays
+            if batched
+            else vector_search.find_nearest_from_array
+        )
+        results = method(
             component=self.component,
             vector_index=self.identifier,
             h=h,
@@ -260,6 +506,52 @@ class VectorIndex(CDC):
         logging.info(f'Comparing vectors ... DONE ({time.time() - start}s)')
         return results
 
+    async def aget_nearest(
+        self,
+        like: t.Union[Document, t.Sequence[Document]],
+        outputs: t.Optional[t.Dict] = None,
+        ids: t.Optional[t.Sequence[str]] = None,
+        n: int = 100,
+    ) -> t.Tuple[t.List, t.List]:
+        """Get nearest results in this vector index without blocking.
+
+        As ``get_nearest``; the queries are embedded with
+        ``aget_query_vectors`` and searched with the ``afind_nearest_*``
+        methods of the vector-search backend.
+
+        :param like: The document (or list of documents) to compare against
+        :param outputs: An optional dictionary
+        :param ids: A list of ids to match
+        :param n: Number of items to return
+        """
+        models, keys = self.models_keys
+        if len(models) != len(keys):
+            raise ValueError(f'len(model={models}) != len(keys={keys})')
+        likes, batched = _likes(like)
+
+        h = await self.aget_query_vectors(
+            likes=likes,
+            models=models,
+            keys=keys,
+            outputs=outputs,
+        )
+        vector_search = self.db.cluster.vector_search
+        if batched:
+            return await vector_search.afind_nearest_from_arrays(
+                h,
+                component=self.component,
+                vector_index=self.identifier,
+                n=n,
+                within_ids=ids or (),
+            )
+        return await vector_search.afind_nearest_from_array(
+            h[0],
+            component=self.component,
+            vector_index=self.identifier,
+            n=n,
+            within_ids=ids or (),
+        )
+
     def cleanup(self):
         """Clean up the vector index."""
         super().cleanup()
@@ -1,3 +1,5 @@
+import threading
+import time
 import typing as t
 from collections import OrderedDict
 
@@ -40,6 +42,87 @@ class IndexableDict(OrderedDict):
             raise IndexError(f"Index {index} is out of range.")
 
 
+class LRUCache:
+    """Thread-safe cache evicting the least recently used items.
+
+    Counts the hits and misses of ``get``.
+
+    :param max_size: Maximum number of items in the cache
+    :param ttl: Seconds after which items expire (never if ``None``)
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: t.Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: t.Hashable, default: t.Any = None):
+        """Get an item, and mark it as recently used.
+
+        :param key: Key of the item
+        :param default: Value returned if the item is missing or expired
+        """
+        with self._lock:
+            try:
+                expires, value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.monotonic():
+                del self._items[key]
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: t.Hashable, value: t.Any):
+        """Put an item, evicting the least recently used item if full.
+
+        :param key: Key of the item
+        :param value: Value of the item
+        """
+        if self.max_size <= 0:
+            return
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def evict(self, predicate: t.Callable[[t.Hashable], bool]):
+        """Remove all items whose key matches ``predicate``.
+
+        :param predicate: Function of the key of an item
+        """
+        with self._lock:
+            for key in [k for k in self._items if predicate(k)]:
+                del self._items[key]
+
+    def clear(self):
+        """Remove all items, and reset the counters."""
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> t.Dict[str, int]:
+        """Size and hit/miss counters of the cache."""
+        return {
+            'size': len(self),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
 # TODO - incorporate into `Document`
 class DeepKeyedDict(t.Dict[str, t.Any]):
     """Dictionary object mirroring how MongoDB handles fields.
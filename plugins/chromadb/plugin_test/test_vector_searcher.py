@@ -48,3 +48,21 @@ def test_index(index_data, teardown):
     res, _ = index.find_nearest_from_array(y, 1)
 
     assert res[0] == "new_id"
+
+
+def test_find_nearest_from_arrays(index_data):
+    from pinnacle import CFG
+
+    CFG.vector_search_engine = "chromadb"
+
+    vectors, ids = index_data
+    index = ChromaDBVectorSearcher(identifier="batch", measure='cosine', dimensions=3)
+    index.add(items=[VectorItem(id=id_, vector=hh) for hh, id_ in zip(vectors, ids)])
+
+    res, dists = index.find_nearest_from_arrays(vectors, 1)
+    assert [r[0] for r in res] == ids
+    assert len(dists) == 3
+
+    res, _ = index.find_nearest_from_arrays(vectors[:2], 3, within_ids=ids[2:])
+    assert res == [[ids[2]], [ids[2]]]
+    index.drop()
@@ -32,6 +32,7 @@ class ChromaDBVectorSearcher(BaseVectorSearcher):
         component: str = 'VectorIndex',
         batch_size: int = 512,
     ):
+        port = None
         try:
             plugin, uri = CFG.vector_search_engine.split("://")
             port = int(CFG.vector_search_engine.split(":")[-1])
@@ -44,7 +45,11 @@ class ChromaDBVectorSearcher(BaseVectorSearcher):
             else:
                 raise e
 
-        self.client = chromadb.HttpClient(host="localhost", port=port)
+        if port is None:
+            # ``vector_search_engine: chromadb`` runs an in-process client
+            self.client = chromadb.EphemeralClient()
+        else:
+            self.client = chromadb.HttpClient(host="localhost", port=port)
 
         self.identifier = identifier
         self.measure = measure
@@ -160,17 +165,46 @@ class ChromaDBVectorSearcher(BaseVectorSearcher):
         res = self.collection.query(
             query_embeddings=[h], n_results=n, include=["distances"]
         )
+        return self._results(res, within_ids)[0]
+
+    def find_nearest_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """Find the nearest vectors to each row of a matrix of query vectors.
 
-        ids = res.get("ids", [[]])[0]
-        dists = res.get("distances", [[]])[0]
+        All queries are sent in a single ``query`` call.
 
-        if within_ids:
+        :param h: Matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: Number of results to return per query
+        :param within_ids: List of IDs to search within
+        """
+        queries = [self.to_list(row) for row in h]
+        if not queries:
+            return [], []
+        res = self.collection.query(
+            query_embeddings=queries, n_results=n, include=["distances"]
+        )
+        results = self._results(res, within_ids)
+        return [ids for ids, _ in results], [dists for _, dists in results]
+
+    def _results(
+        self, res, within_ids: t.Sequence[str]
+    ) -> t.List[t.Tuple[t.List[str], t.List[float]]]:
+        within = set(within_ids)
+        if within:
             logging.warning(f"Searching within specific IDs: {within_ids}")
 
-            ix = [i for i, id in enumerate(ids) if id in within_ids]
-            ids = [ids[i] for i in ix]
-            dists = [dists[i] for i in ix]
-        return ids, dists
+        out = []
+        for ids, dists in zip(res.get("ids") or [[]], res.get("distances") or [[]]):
+            if within:
+                ix = [i for i, id in enumerate(ids) if id in within]
+                ids = [ids[i] for i in ix]
+                dists = [dists[i] for i in ix]
+            out.append((ids, dists))
+        return out
 
     def _distance_mapping(self, measure: t.Optional[str] = None):
         if measure == "cosine":
@@ -1,3 +1,4 @@
+import asyncio
 import typing as t
 
 import tqdm
@@ -54,6 +55,28 @@ class JinaEmbedding(Jina):
         """
         return self.client.encode_batch([X])[0]
 
+    async def async_predict(self, X: str):
+        """Predict the embedding of a single text without blocking.
+
+        :param X: The text to predict the embedding of.
+        """
+        return (await self.client.aencode_batch([X]))[0]
+
+    async def async_predict_batches(self, dataset: t.List[str]) -> t.List:
+        """Predict the embeddings of a list of texts without blocking.
+
+        Batches of ``batch_size`` texts are sent concurrently.
+
+        :param dataset: The texts to predict the embeddings of.
+        """
+        batches = await asyncio.gather(
+            *[
+                self.client.aencode_batch(dataset[i : i + self.batch_size])
+                for i in range(0, len(dataset), self.batch_size)
+            ]
+        )
+        return [x for batch in batches for x in batch]
+
     def _predict_a_batch(self, texts: t.List[str]):
         return self.client.encode_batch(texts)
 
@@ -39,3 +39,50 @@ def test_index(index_data, measure, vector_index_cls):
     res, _ = h.find_nearest_from_array(y, 1)
 
     assert res[0] == "new"
+
+
+def test_find_nearest_from_arrays(index_data):
+    vectors, ids, _ = index_data
+    h = LanceVectorSearcher(uuid="batch", measure="cosine", dimensions=3)
+    h.add(items=[VectorItem(id=id_, vector=hh) for hh, id_ in zip(vectors, ids)])
+
+    res, scores = h.find_nearest_from_arrays(vectors, 1)
+    assert [r[0] for r in res] == ids
+    assert len(scores) == 3
+
+    res, _ = h.find_nearest_from_arrays(vectors[:2], 3, within_ids=ids[2:])
+    assert res == [[ids[2]], [ids[2]]]
+
+
+def test_index_build_and_compaction(index_data):
+    h = LanceVectorSearcher(
+        uuid="tuned",
+        measure="l2",
+        dimensions=16,
+        index_min_rows=300,
+        max_fragments=4,
+        nprobes=4,
+    )
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(400, 16)).astype(np.float32)
+    for i in range(0, 400, 40):
+        h.add(
+            [
+                VectorItem(id=str(j), vector=vectors[j])
+                for j in range(i, min(i + 40, 400))
+            ]
+        )
+
+    dataset = h.dataset
+    assert len(dataset.get_fragments()) <= 5
+    assert [i['name'] for i in dataset.list_indices()] == ['vector_idx']
+    assert h._indexed_rows == 320
+
+    res, _ = h.find_nearest_from_array(vectors[7], 1, nprobes=20, refine_factor=10)
+    assert res == ['7']
+    res, _ = h.find_nearest_from_arrays(vectors[:3], 1, refine_factor=10)
+    assert [r[0] for r in res] == ['0', '1', '2']
+
+    # The index is only rebuilt once the dataset doubles
+    h.add([VectorItem(id='extra', vector=vectors[0])])
+    assert h._indexed_rows == 320
@@ -1,23 +1,48 @@
+import math
 import os
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 
 import lance
 import numpy as np
 import pyarrow as pa
+from pinnacle import CFG
 from pinnacle.backends.base.vector_search import (
     BaseVectorSearcher,
     VectorIndexMeasureType,
     VectorItem,
 )
 
+if t.TYPE_CHECKING:
+    from pinnacle.components.vector_index import VectorIndex
+
+INDEX_NAME = 'vector_idx'
+# Product quantization trains 256 centroids per sub-vector
+PQ_MIN_ROWS = 256
+
 
 class LanceVectorSearcher(BaseVectorSearcher):
     """
     Implementation of a vector index using the ``lance`` library.
 
+    Once the dataset holds ``index_min_rows`` vectors, an IVF_PQ index is
+    built over it, with about ``sqrt(rows)`` partitions and sub-vectors
+    of (at most) 16 dimensions. The index is rebuilt whenever the dataset
+    has grown ``reindex_factor`` times since the last build; rows added
+    in between are searched exhaustively by Lance. The fragments left by
+    many small ``add`` calls are compacted once there are more than
+    ``max_fragments`` of them.
+
     :param uuid: Unique string identifier of index
     :param dimensions: Dimension of the vector embeddings in the Lance dataset
     :param measure: measure to assess similarity
+    :param index_min_rows: Number of rows at which the ANN index is built
+    :param reindex_factor: Growth of the dataset since the last build at
+                           which the ANN index is rebuilt
+    :param max_fragments: Number of fragments above which they are compacted
+    :param nprobes: Default number of IVF partitions searched per query
+    :param refine_factor: Default multiple of ``n`` candidates re-ranked
+                          with exact distances; ``None`` not to re-rank
     """
 
     def __init__(
@@ -25,6 +50,11 @@ class LanceVectorSearcher(BaseVectorSearcher):
         uuid: str,
         dimensions: int,
         measure: t.Optional[str] = None,
+        index_min_rows: int = 100_000,
+        reindex_factor: float = 2.0,
+        max_fragments: int = 32,
+        nprobes: int = 20,
+        refine_factor: t.Optional[int] = None,
     ):
         self.dataset_path = os.path.join(
             os.environ.get(
@@ -37,6 +67,27 @@ class LanceVectorSearcher(BaseVectorSearcher):
         self.measure = (
             measure.name if isinstance(measure, VectorIndexMeasureType) else measure
         )
+        self.index_min_rows = index_min_rows
+        self.reindex_factor = reindex_factor
+        self.max_fragments = max_fragments
+        self.nprobes = nprobes
+        self.refine_factor = refine_factor
+        self._indexed_rows: t.Optional[int] = None
+
+    @classmethod
+    def from_component(cls, index: 'VectorIndex'):
+        """Create a vector searcher from a vector index.
+
+        Tuning parameters are read from ``CFG.vector_search_kwargs``.
+
+        :param index: ``VectorIndex`` instance
+        """
+        return cls(
+            uuid=index.uuid,
+            dimensions=index.dimensions,
+            measure=index.measure,
+            **CFG.vector_search_kwargs,
+        )
 
     def initialize(self, db):
         """Initialize the vector index."""
@@ -83,6 +134,7 @@ class LanceVectorSearcher(BaseVectorSearcher):
         ids = [item.id for item in items]
         vectors = [item.vector for item in items]
         self._create_or_append_to_dataset(vectors, ids, mode='append')
+        self._maintain()
 
     def delete(self, ids: t.Sequence[str]) -> None:
         """Delete vectors from the index.
@@ -91,6 +143,54 @@ class LanceVectorSearcher(BaseVectorSearcher):
         """
         to_remove = ", ".join(f"'{str(id)}'" for id in ids)
         self.dataset.delete(f"id IN ({to_remove})")
+        self._maintain()
+
+    def post_create(self):
+        """Compact the dataset and build the ANN index if they are due."""
+        self._maintain()
+
+    def build_index(self):
+        """Build (or rebuild) the IVF_PQ index over all rows of the dataset."""
+        dataset = self.dataset
+        rows = dataset.count_rows()
+        num_partitions, num_sub_vectors = self._index_params(rows)
+        dataset.create_index(
+            'vector',
+            index_type='IVF_PQ',
+            name=INDEX_NAME,
+            metric=self.measure or 'l2',
+            num_partitions=num_partitions,
+            num_sub_vectors=num_sub_vectors,
+            replace=True,
+        )
+        self._indexed_rows = rows
+
+    def _index_params(self, rows: int) -> t.Tuple[int, int]:
+        num_partitions = max(1, min(round(math.sqrt(rows)), rows // PQ_MIN_ROWS))
+        sub_dimensions = next(d for d in (16, 8, 4, 2, 1) if self.dimensions % d == 0)
+        return num_partitions, self.dimensions // sub_dimensions
+
+    def _get_indexed_rows(self, dataset) -> int:
+        # Number of rows covered by the ANN index when it was last built,
+        # read back from the dataset after a restart
+        if self._indexed_rows is None:
+            if any(i['name'] == INDEX_NAME for i in dataset.list_indices()):
+                stats = dataset.stats.index_stats(INDEX_NAME)
+                self._indexed_rows = stats['num_indexed_rows']
+            else:
+                self._indexed_rows = 0
+        return self._indexed_rows
+
+    def _maintain(self):
+        dataset = self.dataset
+        if len(dataset.get_fragments()) > self.max_fragments:
+            dataset.optimize.compact_files()
+            dataset = self.dataset
+        rows = dataset.count_rows()
+        if rows < max(self.index_min_rows, PQ_MIN_ROWS):
+            return
+        if rows >= self.reindex_factor * self._get_indexed_rows(dataset):
+            self.build_index()
 
     def find_nearest_from_id(
         self,
@@ -121,39 +221,103 @@ class LanceVectorSearcher(BaseVectorSearcher):
         h: np.typing.ArrayLike,
         n: int = 100,
         within_ids: t.Sequence[str] = (),
+        nprobes: t.Optional[int] = None,
+        refine_factor: t.Optional[int] = None,
     ) -> t.Tuple[t.List[str], t.List[float]]:
         """Find the nearest vectors to a given vector.
 
         :param h: Vector to search
         :param n: Number of results to return
         :param within_ids: List of IDs to search within
+        :param nprobes: Number of IVF partitions to search;
+                        defaults to ``self.nprobes``
+        :param refine_factor: Multiple of ``n`` candidates to re-rank;
+                              defaults to ``self.refine_factor``
         """
+        nearest = self._nearest(n, nprobes, refine_factor)
+        return self._search(self.dataset, h, nearest, self._within_filter(within_ids))
+
+    def find_nearest_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+        nprobes: t.Optional[int] = None,
+        refine_factor: t.Optional[int] = None,
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """Find the nearest vectors to each row of a matrix of query vectors.
+
+        The dataset is opened and the ``within_ids`` filter built once for
+        all queries, which run concurrently as Lance releases the GIL
+        while it searches.
+
+        :param h: Matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: Number of results to return per query
+        :param within_ids: List of IDs to search within
+        :param nprobes: Number of IVF partitions to search;
+                        defaults to ``self.nprobes``
+        :param refine_factor: Multiple of ``n`` candidates to re-rank;
+                              defaults to ``self.refine_factor``
+        """
+        if not len(h):
+            return [], []
+        dataset = self.dataset
+        nearest = self._nearest(n, nprobes, refine_factor)
+        filter = self._within_filter(within_ids)
+        workers = min(len(h), CFG.vector_search_max_workers or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(
+                pool.map(lambda q: self._search(dataset, q, nearest, filter), list(h))
+            )
+        return [ids for ids, _ in results], [scores for _, scores in results]
+
+    @staticmethod
+    def _within_filter(within_ids: t.Sequence[str]) -> t.Optional[str]:
+        if not within_ids:
+            return None
+        if isinstance(within_ids, (list, set)):
+            within_ids = tuple(within_ids)
+        assert (
+            type(within_ids) is tuple
+        ), 'within_ids must be a [tuple | list | set] for lance sql parser'
+        return f"id in {within_ids}"
+
+    def _nearest(
+        self, n: int, nprobes: t.Optional[int], refine_factor: t.Optional[int]
+    ) -> t.Dict:
+        # Arguments of the ``nearest`` search, without the query vector;
+        # ``nprobes`` and ``refine_factor`` only apply once there is an index
+        nearest = {
+            'column': 'vector',
+            'k': n,
+            'metric': self.measure,
+            'nprobes': nprobes or self.nprobes,
+        }
+        refine_factor = refine_factor or self.refine_factor
+        if refine_factor:
+            nearest['refine_factor'] = refine_factor
+        return nearest
+
+    def _search(
+        self,
+        dataset,
+        h: np.typing.ArrayLike,
+        nearest: t.Dict,
+        filter: t.Optional[str],
+    ) -> t.Tuple[t.List[str], t.List[float]]:
         # NOTE: filter is currently applied AFTER vector-search
         # See https://lancedb.github.io/lance/api/python/lance.html#lance.dataset.LanceDataset.scanner
-        if within_ids:
-            if isinstance(within_ids, (list, set)):
-                within_ids = tuple(within_ids)
-            assert (
-                type(within_ids) is tuple
-            ), 'within_ids must be a [tuple | list | set] for lance sql parser'
-            result = self.dataset.to_table(
+        nearest = {**nearest, 'q': h}
+        if filter is not None:
+            result = dataset.to_table(
                 columns=['id'],
-                nearest={
-                    'column': 'vector',
-                    'q': h,
-                    'k': n,
-                    'metric': self.measure,
-                },
-                filter=f"id in {within_ids}",
+                nearest=nearest,
+                filter=filter,
                 prefilter=True,
                 offset=0,
             )
         else:
-            result = self.dataset.to_table(
-                columns=['id'],
-                nearest={"column": 'vector', "q": h, "k": n, 'metric': self.measure},
-                offset=0,
-            )
+            result = dataset.to_table(columns=['id'], nearest=nearest, offset=0)
         ids = result['id'].to_pylist()
         distances = result['_distance'].to_pylist()
         scores = self._convert_distances_to_scores(distances)
@@ -37,3 +37,52 @@ def test_index(index_data, measure, vector_index_cls):
     res, _ = h.find_nearest_from_array(y, 1)
 
     assert res[0] == "new"
+
+
+def test_find_nearest_from_arrays(index_data):
+    from pinnacle import CFG
+
+    CFG.vector_search_engine = "qdrant://:memory:"
+    vectors, ids = index_data
+    h = QdrantVectorSearcher(identifier="batch", measure="cosine", dimensions=3)
+    h.add(items=[VectorItem(id=id_, vector=hh) for hh, id_ in zip(vectors, ids)])
+
+    res, scores = h.find_nearest_from_arrays(vectors, 1)
+    assert [r[0] for r in res] == ids
+    assert len(scores) == 3
+
+    res, _ = h.find_nearest_from_arrays(vectors[:2], 3, within_ids=ids[2:])
+    assert res == [[ids[2]], [ids[2]]]
+
+
+def test_async_clients_are_per_event_loop(monkeypatch):
+    import asyncio
+    import sys
+    from unittest import mock
+
+    from pinnacle import CFG
+
+    CFG.vector_search_engine = "qdrant://:memory:"
+    h = QdrantVectorSearcher(identifier="loops", measure="cosine", dimensions=3)
+    monkeypatch.setattr(
+        sys.modules[QdrantVectorSearcher.__module__],
+        'AsyncQdrantClient',
+        lambda **kwargs: mock.AsyncMock(),
+    )
+
+    async def aclient():
+        return h._aclient()
+
+    loops = [asyncio.new_event_loop(), asyncio.new_event_loop()]
+    try:
+        clients = [loop.run_until_complete(aclient()) for loop in loops]
+        assert loops[0].run_until_complete(aclient()) is clients[0]
+        assert clients[0] is not clients[1]
+
+        loops[0].run_until_complete(h.aclose())
+        for client in clients:
+            client.close.assert_awaited_once()
+        assert not h._async_clients
+    finally:
+        for loop in loops:
+            loop.close()
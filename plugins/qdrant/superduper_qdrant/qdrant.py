@@ -1,10 +1,12 @@
+import asyncio
 import re
 import typing as t
 import uuid
+import weakref
 from copy import deepcopy
 
 import numpy as np
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 from pinnacle import CFG, logging
 from pinnacle.backends.base.vector_search import (
     BaseVectorSearcher,
@@ -48,6 +50,10 @@ class QdrantVectorSearcher(BaseVectorSearcher):
     """
     Implementation of a vector index using [Qdrant](https://qdrant.tech/).
 
+    The ``afind_nearest_*`` methods query the server with an
+    ``AsyncQdrantClient``; the in-memory mode runs them on the shared
+    search executor instead, as an async client would not share its data.
+
     :param identifier: Unique string identifier of index
     :param dimensions: Dimension of the vector embeddings
     :param h: Seed vectors ``numpy.ndarray``
@@ -90,6 +96,8 @@ class QdrantVectorSearcher(BaseVectorSearcher):
             if "timeout" not in config_dict:
                 config_dict["timeout"] = 60  # 60 seconds timeout
         self.client = QdrantClient(**config_dict)
+        self._config = config_dict
+        self._async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
         logging.info('Found these collections in the qdrant connection:')
         collections = self.client.get_collections().collections
@@ -160,7 +168,6 @@ class QdrantVectorSearcher(BaseVectorSearcher):
 
         return ids
 
-
     def _create_collection(self):
         measure = (
             self.measure.name
@@ -268,36 +275,194 @@ class QdrantVectorSearcher(BaseVectorSearcher):
         """
         return self._query_nearest(h, n, within_ids)
 
-    def _query_nearest(
+    async def afind_nearest_from_id(
         self,
-        query: t.Union[np.typing.ArrayLike, str],
+        _id,
         n: int = 100,
         within_ids: t.Sequence[str] = (),
     ) -> t.Tuple[t.List[str], t.List[float]]:
-        query_filter = None
-        if within_ids:
-            query_filter = models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key=ID_PAYLOAD_KEY, match=models.MatchAny(any=list(within_ids))
-                    )
-                ]
-            )
+        """Find the nearest vectors to a given ID without blocking.
 
-        search_result = self.client.query_points(
+        :param _id: ID to search
+        :param n: Number of results to return
+        :param within_ids: List of IDs to search within
+        """
+        if self._config.get('location') == ':memory:':
+            return await super().afind_nearest_from_id(_id, n, within_ids)
+        return await self._aquery_nearest(_id, n, within_ids)
+
+    async def afind_nearest_from_array(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        """Find the nearest vectors to a given vector without blocking.
+
+        :param h: Vector to search
+        :param n: Number of results to return
+        :param within_ids: List of IDs to search within
+        """
+        if self._config.get('location') == ':memory:':
+            return await super().afind_nearest_from_array(h, n, within_ids)
+        return await self._aquery_nearest(h, n, within_ids)
+
+    def find_nearest_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """Find the nearest vectors to each row of a matrix of query vectors.
+
+        All queries are sent in a single ``query_batch_points`` request.
+
+        :param h: Matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: Number of results to return per query
+        :param within_ids: List of IDs to search within
+        """
+        if not len(h):
+            return [], []
+        responses = self.client.query_batch_points(**self._batch_args(h, n, within_ids))
+        return self._batch_results(responses)
+
+    async def afind_nearest_from_arrays(
+        self,
+        h: np.typing.ArrayLike,
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        """Find the nearest vectors to each row of a matrix without blocking.
+
+        :param h: Matrix of query vectors of shape ``(n_queries, dimensions)``
+        :param n: Number of results to return per query
+        :param within_ids: List of IDs to search within
+        """
+        if self._config.get('location') == ':memory:' or not len(h):
+            return await super().afind_nearest_from_arrays(h, n, within_ids)
+        responses = await self._aclient().query_batch_points(
+            **self._batch_args(h, n, within_ids)
+        )
+        return self._batch_results(responses)
+
+    def _query_filter(self, within_ids: t.Sequence[str]) -> t.Optional[models.Filter]:
+        if not within_ids:
+            return None
+        return models.Filter(
+            must=[
+                models.FieldCondition(
+                    key=ID_PAYLOAD_KEY, match=models.MatchAny(any=list(within_ids))
+                )
+            ]
+        )
+
+    def _query_args(
+        self,
+        query: t.Union[np.typing.ArrayLike, str],
+        n: int,
+        within_ids: t.Sequence[str],
+    ) -> t.Dict:
+        return dict(
             collection_name=self.identifier,
             query=query,
             limit=n,
-            query_filter=query_filter,
+            query_filter=self._query_filter(within_ids),
             with_payload=[ID_PAYLOAD_KEY],
             using=None,
-        ).points
+        )
 
-        ids = [hit.payload[ID_PAYLOAD_KEY] for hit in search_result if hit.payload]
-        scores = [hit.score for hit in search_result]
+    def _batch_args(
+        self, h: np.typing.ArrayLike, n: int, within_ids: t.Sequence[str]
+    ) -> t.Dict:
+        query_filter = self._query_filter(within_ids)
+        return dict(
+            collection_name=self.identifier,
+            requests=[
+                models.QueryRequest(
+                    query=self.to_list(row),
+                    limit=n,
+                    filter=query_filter,
+                    with_payload=[ID_PAYLOAD_KEY],
+                )
+                for row in h
+            ],
+        )
+
+    @staticmethod
+    def _results(points) -> t.Tuple[t.List[str], t.List[float]]:
+        ids = [hit.payload[ID_PAYLOAD_KEY] for hit in points if hit.payload]
+        scores = [hit.score for hit in points]
+        return ids, scores
 
+    @classmethod
+    def _batch_results(
+        cls, responses
+    ) -> t.Tuple[t.List[t.List[str]], t.List[t.List[float]]]:
+        ids, scores = [], []
+        for response in responses:
+            response_ids, response_scores = cls._results(response.points)
+            ids.append(response_ids)
+            scores.append(response_scores)
         return ids, scores
 
+    def _query_nearest(
+        self,
+        query: t.Union[np.typing.ArrayLike, str],
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        search_result = self.client.query_points(
+            **self._query_args(query, n, within_ids)
+        ).points
+        return self._results(search_result)
+
+    def _aclient(self) -> AsyncQdrantClient:
+        # Async clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        try:
+            return self._async_clients[loop]
+        except KeyError:
+            client = AsyncQdrantClient(**self._config)
+            self._async_clients[loop] = client
+            return client
+
+    def close(self):
+        """Close the clients.
+
+        Async clients are closed on their event loop; those of closed
+        loops are dropped.
+        """
+        self.client.close()
+        clients, self._async_clients = (
+            list(self._async_clients.items()),
+            weakref.WeakKeyDictionary(),
+        )
+        for loop, client in clients:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.close(), loop)
+            else:
+                loop.run_until_complete(client.close())
+
+    async def aclose(self):
+        """Close the clients, awaiting the async client of this loop."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+        self.close()
+
+    async def _aquery_nearest(
+        self,
+        query: t.Union[np.typing.ArrayLike, str],
+        n: int = 100,
+        within_ids: t.Sequence[str] = (),
+    ) -> t.Tuple[t.List[str], t.List[float]]:
+        response = await self._aclient().query_points(
+            **self._query_args(query, n, within_ids)
+        )
+        return self._results(response.points)
+
     def _distance_mapping(self, measure: t.Optional[str] = None) -> models.Distance:
         if measure == "cosine":
             return models.Distance.COSINE
@@ -0,0 +1,91 @@
+import os
+
+from pinnacle.backends.base.event_log import EventLog, EventLogs
+from pinnacle.base.event import Change
+
+
+def _changes(*ids, queue='documents'):
+    return [Change(ids=[str(id)], queue=queue, type='insert') for id in ids]
+
+
+def _ids(events):
+    return [e.ids[0] for e in events]
+
+
+def test_event_log_replays_unconsumed_events(tmpdir):
+    log = EventLog(str(tmpdir / 'documents'))
+    log.sync(log.write(_changes(0, 1, 2)))
+    log.sync(log.write(_changes(3)))
+    log.ack(*log.take(2))
+    log.close()
+
+    log = EventLog(str(tmpdir / 'documents'))
+    events = log.replay()
+    assert _ids(events) == ['2', '3']
+    assert {(e.queue, e.type) for e in events} == {('documents', 'insert')}
+
+    # New events follow the replayed ones
+    log.sync(log.write(_changes(4)))
+    assert log.take(3) == (3, 5)
+    log.ack(3, 5)
+    log.close()
+    assert EventLog(str(tmpdir / 'documents')).replay() == []
+
+
+def test_event_log_offset_waits_for_earlier_events(tmpdir):
+    log = EventLog(str(tmpdir))
+    log.sync(log.write(_changes(0, 1, 2, 3)))
+    first = log.take(2)
+    second = log.take(2)
+    log.ack(*second)
+    assert log.offset == 0
+    log.ack(*first)
+    assert log.offset == 4
+
+
+def test_event_log_truncates_torn_records(tmpdir):
+    log = EventLog(str(tmpdir))
+    log.sync(log.write(_changes(0, 1)))
+    log.close()
+    (segment,) = [f for f in os.listdir(tmpdir) if f.endswith('.log')]
+    with open(tmpdir / segment, 'r+b') as f:
+        f.truncate(os.path.getsize(tmpdir / segment) - 1)
+
+    log = EventLog(str(tmpdir))
+    assert _ids(log.replay()) == ['0']
+    log.sync(log.write(_changes(2)))
+    assert _ids(log.replay()) == ['0', '2']
+
+
+def test_event_log_drops_consumed_segments(tmpdir, monkeypatch):
+    monkeypatch.setattr(EventLog, 'SEGMENT_SIZE', 1)
+    log = EventLog(str(tmpdir))
+    for i in range(3):
+        log.sync(log.write(_changes(i)))
+
+    def segments():
+        return sorted(f for f in os.listdir(tmpdir) if f.endswith('.log'))
+
+    assert len(segments()) == 3
+    log.ack(*log.take(2))
+    assert segments() == [f'{3:020d}.log']
+    assert _ids(log.replay()) == ['2']
+
+
+def test_event_logs_by_queue(tmpdir):
+    logs = EventLogs(str(tmpdir))
+    # Only ``Change`` events are logged
+    other: list = [object()]
+    written = logs.write(_changes(0, 1) + _changes(2, queue='a/b') + other)
+    assert written == {'documents': 2, 'a/b': 1}
+    logs.sync(written)
+    logs.ack(logs.take('documents', 1))
+
+    replayed = EventLogs(str(tmpdir)).replay()
+    assert {q: _ids(events) for q, events in replayed.items()} == {
+        'a/b': ['2'],
+        'documents': ['1'],
+    }
+
+    logs.drop()
+    assert not os.path.exists(tmpdir / 'documents')
@@ -0,0 +1,73 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+
+def test_consume_streaming_events_merges_ids():
+    from pinnacle.backends.base import scheduler
+    from pinnacle.base.event import Change
+
+    events = [
+        Change(ids=['1', '2'], queue='documents', type='insert'),
+        Change(ids=['3'], queue='documents', type='delete'),
+        Change(ids=['2', '4'], queue='documents', type='insert'),
+    ]
+    with patch.object(scheduler, '_consume_event_type') as consume:
+        scheduler.consume_streaming_events(events, table='documents', db=None)
+
+    calls = {c.args[0]: c.kwargs['ids'] for c in consume.call_args_list}
+    assert calls == {'insert': ['1', '2', '4'], 'delete': ['3']}
+
+
+class _Job:
+    def __init__(self, job_id, run, dependencies=(), **kwargs):
+        self.job_id = job_id
+        self.run = run
+        self.dependencies = list(dependencies)
+        self.args = []
+        self.kwargs = kwargs
+
+    def execute(self, db):
+        return self.run(self.job_id)
+
+
+def test_execute_jobs_runs_independent_jobs_concurrently():
+    from pinnacle.backends.base.scheduler import Future, execute_jobs
+
+    barrier = threading.Barrier(2, timeout=5)
+    done = []
+
+    def run(job_id):
+        if job_id != 'c':
+            # Only passes if ``a`` and ``b`` run at the same time
+            barrier.wait()
+        done.append(job_id)
+
+    jobs = [
+        _Job('a', run),
+        _Job('b', run),
+        _Job('c', run, dependencies=['a'], ids=Future('b')),
+    ]
+    execute_jobs(jobs, db=None, max_workers=2)
+    assert sorted(done[:2]) == ['a', 'b'] and done[2] == 'c'
+
+
+def test_execute_jobs_skips_jobs_downstream_of_failures():
+    from pinnacle.backends.base.scheduler import Future, execute_jobs
+
+    done = []
+
+    def run(job_id):
+        if job_id == 'a':
+            raise ValueError(job_id)
+        done.append(job_id)
+
+    jobs = [
+        _Job('a', run),
+        _Job('b', run),
+        _Job('c', run, ids=Future('a')),
+    ]
+    with pytest.raises(ValueError):
+        execute_jobs(jobs, db=None, max_workers=4)
+    assert done == ['b']
@@ -0,0 +1,218 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+
+def _scheduler(**cfg):
+    from pinnacle.backends.local.scheduler import LocalScheduler
+
+    scheduler = LocalScheduler()
+    scheduler.Q['documents'] = []
+    defaults = dict(
+        scheduler_consumers=1,
+        scheduler_queue_size=100,
+        scheduler_batch_max_events=100,
+        scheduler_batch_max_latency=0.01,
+    )
+    scheduler.db = SimpleNamespace(cfg=SimpleNamespace(**{**defaults, **cfg}))
+    return scheduler
+
+
+def _change(id):
+    from pinnacle.base.event import Change
+
+    return Change(ids=[str(id)], queue='documents', type='insert')
+
+
+def _consumer(release):
+    consumed = []
+
+    def consume_events(events, table, db, **kwargs):
+        release.wait(5)
+        consumed.append((table, [getattr(e, 'ids', [''])[0] for e in events]))
+
+    return consumed, consume_events
+
+
+def test_publish_returns_before_consumption():
+    from pinnacle.backends.local import scheduler as local
+
+    release = threading.Event()
+    consumed, consume_events = _consumer(release)
+    scheduler = _scheduler()
+    with patch.object(local, 'consume_events', consume_events):
+        scheduler.publish([_change(0), _change(1)])
+        assert consumed == []
+
+        release.set()
+        scheduler.flush(timeout=5)
+        assert consumed == [('documents', ['0', '1'])]
+        scheduler.shutdown(timeout=5)
+
+
+def test_publish_batches_events():
+    from pinnacle.backends.local import scheduler as local
+
+    release = threading.Event()
+    release.set()
+    consumed, consume_events = _consumer(release)
+    scheduler = _scheduler(scheduler_batch_max_events=3, scheduler_batch_max_latency=60)
+    with patch.object(local, 'consume_events', consume_events):
+        for i in range(4):
+            scheduler.publish([_change(i)])
+        # A full batch is consumed without waiting for the latency window
+        deadline = time.monotonic() + 5
+        while not consumed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert consumed == [('documents', ['0', '1', '2'])]
+
+        # Flushing consumes the rest right away
+        scheduler.flush(timeout=5)
+        assert consumed[1:] == [('documents', ['3'])]
+        scheduler.shutdown(timeout=5)
+
+
+def test_publish_blocks_when_queue_is_full():
+    from pinnacle.backends.local import scheduler as local
+
+    release = threading.Event()
+    consumed, consume_events = _consumer(release)
+    scheduler = _scheduler(scheduler_queue_size=2, scheduler_batch_max_events=1)
+    with patch.object(local, 'consume_events', consume_events):
+        scheduler.publish([_change(0)])
+        while scheduler.Q['documents']:
+            time.sleep(0.01)
+        scheduler.publish([_change(1), _change(2)])
+
+        publisher = threading.Thread(target=scheduler.publish, args=([_change(3)],))
+        publisher.start()
+        publisher.join(0.2)
+        assert publisher.is_alive()
+
+        release.set()
+        publisher.join(5)
+        assert not publisher.is_alive()
+        scheduler.flush(timeout=5)
+        assert [ids for _, ids in consumed] == [['0'], ['1'], ['2'], ['3']]
+        scheduler.shutdown(timeout=5)
+
+
+def test_apply_events_wait_for_queues():
+    from pinnacle.backends.local import scheduler as local
+    from pinnacle.base.event import CreateTable
+
+    release = threading.Event()
+    consumed, consume_events = _consumer(release)
+    scheduler = _scheduler(scheduler_batch_max_latency=60)
+    with patch.object(local, 'consume_events', consume_events):
+        scheduler.publish([_change(0)])
+        release.set()
+        scheduler.publish([CreateTable(identifier='t', primary_id='id', fields={})])
+        assert [table for table, _ in consumed] == ['documents', '_apply']
+        scheduler.shutdown(timeout=5)
+
+
+def test_flush_raises_consumer_errors():
+    from pinnacle.backends.local import scheduler as local
+
+    def consume_events(events, table, db, **kwargs):
+        raise ValueError('failed')
+
+    scheduler = _scheduler()
+    with patch.object(local, 'consume_events', consume_events):
+        scheduler.publish([_change(0)])
+        with pytest.raises(ValueError):
+            scheduler.flush(timeout=5)
+        # Errors are only raised once
+        scheduler.flush(timeout=5)
+        scheduler.shutdown(timeout=5)
+
+
+def test_flush_raises_all_consumer_errors():
+    from pinnacle.backends.local import scheduler as local
+    from pinnacle.base import exceptions
+    from pinnacle.base.event import CreateTable
+
+    def consume_events(events, table, db, **kwargs):
+        if table != '_apply':
+            raise ValueError(events[0].ids[0])
+
+    scheduler = _scheduler(scheduler_batch_max_events=1)
+    with patch.object(local, 'consume_events', consume_events):
+        scheduler.publish([_change(0), _change(1)])
+        # The errors of the table events are not raised by unrelated events
+        scheduler.publish([CreateTable(identifier='t', primary_id='id', fields={})])
+        with pytest.raises(exceptions.ConsumerError) as excinfo:
+            scheduler.flush(timeout=5)
+        assert [str(e) for e in excinfo.value.errors] == ['0', '1']
+        scheduler.shutdown(timeout=5)
+
+
+def test_replay_consumes_logged_events(tmpdir):
+    from pinnacle.backends.base.event_log import EventLogs
+    from pinnacle.backends.local import scheduler as local
+
+    release = threading.Event()
+    release.set()
+    consumed, consume_events = _consumer(release)
+
+    # Events logged but never consumed, as after a crash
+    logs = EventLogs(str(tmpdir))
+    logs.sync(logs.write([_change(0), _change(1)]))
+    logs.ack(logs.take('documents', 1))
+
+    scheduler = _scheduler(scheduler_consumers=0)
+    scheduler.event_logs = EventLogs(str(tmpdir))
+    read = scheduler.event_logs.replay
+
+    def replay():
+        # Publishers are not blocked while the logs are read
+        assert not scheduler.lock.locked()
+        return read()
+
+    with patch.object(local, 'consume_events', consume_events), patch.object(
+        scheduler.event_logs, 'replay', replay
+    ):
+        scheduler.replay()
+        assert consumed == [('documents', ['1'])]
+
+        scheduler.publish([_change(2)])
+        assert consumed[1:] == [('documents', ['2'])]
+
+    assert EventLogs(str(tmpdir)).replay() == {}
+
+
+@pytest.mark.parametrize('consumers', [0, 1])
+def test_failed_batches_stay_in_the_log(tmpdir, consumers):
+    from pinnacle.backends.base.event_log import EventLogs
+    from pinnacle.backends.local import scheduler as local
+    from pinnacle.base.event import Change
+
+    consumed = []
+
+    def consume_events(events, table, db, **kwargs):
+        if table == 'documents':
+            raise ValueError('failed')
+        consumed.append(table)
+
+    scheduler = _scheduler(scheduler_consumers=consumers)
+    scheduler.Q['other'] = []
+    scheduler.event_logs = EventLogs(str(tmpdir))
+    with patch.object(local, 'consume_events', consume_events):
+        # The queues after a failed one are still consumed
+        with pytest.raises(ValueError):
+            scheduler.publish(
+                [_change(0), Change(ids=['1'], queue='other', type='insert')]
+            )
+            scheduler.flush(timeout=5)
+        scheduler.shutdown(timeout=5)
+    assert consumed == ['other']
+
+    # Only the failed batch is left to be replayed
+    replayed = EventLogs(str(tmpdir)).replay()
+    assert [(q, [e.ids for e in events]) for q, events in replayed.items()] == [
+        ('documents', [['0']])
+    ]
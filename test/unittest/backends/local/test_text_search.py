@@ -0,0 +1,73 @@
+import numpy
+
+
+def test_postings_blocks_roundtrip():
+    from pinnacle.backends.local.text_search import Postings
+
+    rng = numpy.random.default_rng(0)
+    docs = numpy.cumsum(rng.integers(1, 1000, size=1000))
+    tfs = rng.integers(1, 300, size=1000)
+
+    postings = Postings()
+    for d, f in zip(docs, tfs):
+        postings.append(int(d), int(f))
+
+    assert len(postings) == 1000
+    assert len(postings.blocks) == 1000 // Postings.BLOCK_SIZE
+    # Gaps below 1000 and frequencies below 300 fit in 16 bits
+    assert postings.nbytes < len(postings.blocks) * (8 + 4 * Postings.BLOCK_SIZE)
+
+    for p in (postings, Postings.from_arrays(docs, tfs)):
+        decoded_docs, decoded_tfs = p.arrays()
+        assert decoded_docs.tolist() == docs.tolist()
+        assert decoded_tfs.tolist() == tfs.tolist()
+
+
+def test_bm25_ranking():
+    from pinnacle.backends.local.text_search import BM25Index
+
+    index = BM25Index()
+    index.add(
+        ['a', 'b', 'c', 'd'],
+        [
+            'the quick brown fox',
+            'the lazy dog',
+            'quick quick fox jumps over the lazy dog',
+            None,
+        ],
+    )
+
+    ids, scores = index.search('quick fox')
+    assert ids == ['a', 'c']
+    assert scores[0] > scores[1] > 0
+
+    assert index.search('lazy', within_ids=['b', 'a'])[0] == ['b']
+    assert index.search('unicorn') == ([], [])
+    assert len(index.search('the', n=2)[0]) == 2
+
+
+def test_bm25_update_delete_and_compact():
+    from pinnacle.backends.local.text_search import BM25Index
+
+    index = BM25Index()
+    ids = [str(i) for i in range(10)]
+    index.add(ids, [f'document number {i}' for i in range(10)])
+    index.add(['3'], ['something else entirely'])
+
+    assert '3' not in index.search('document', n=100)[0]
+    assert index.search('entirely')[0] == ['3']
+
+    index.delete(ids[:4], compact=False)
+    assert len(index) == 6
+    assert len(index.ids) == 11
+
+    expected = index.search('document number 7')
+    index.compact()
+    assert len(index.ids) == 6
+    assert index.search('document number 7')[0] == expected[0]
+    assert sorted(index.search('document')[0]) == sorted(ids[4:])
+
+    # Deleting most of the index compacts it
+    index.delete(ids[4:9])
+    assert index.ids == ['9']
+    assert index.search('number 9')[0] == ['9']
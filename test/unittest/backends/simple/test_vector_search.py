@@ -0,0 +1,196 @@
+from unittest import mock
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from pinnacle.backends.base.vector_search import VectorItem
+
+# The simple backend is imported inside the tests, so that collecting this
+# module does not add it to the modules checked by ``test_docstrings``.
+
+
+def test_encode_decode_vectors():
+    from pinnacle.backends.simple.vector_search import decode_vectors, encode_vectors
+
+    vectors = np.random.randn(5, 7)
+    ids = [f'id-{i}' for i in range(5)]
+    payload = encode_vectors(ids, vectors)
+    assert len(payload) < 5 * 7 * 4 + 200
+
+    decoded_ids, decoded = decode_vectors(payload)
+    assert decoded_ids == ids
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, vectors, rtol=1e-6)
+
+
+def test_client_add_is_chunked_and_binary():
+    from pinnacle.backends.simple.vector_search import (
+        VECTORS_CONTENT_TYPE,
+        SimpleVectorSearch,
+        SimpleVectorSearchClient,
+    )
+
+    backend = mock.MagicMock()
+    service = SimpleVectorSearch(backend=backend)
+    app = FastAPI()
+    service.build(app)
+    server = TestClient(app)
+
+    client = SimpleVectorSearchClient(chunk_size=4)
+    client.session = mock.MagicMock()
+
+    def post(url, params=None, data=None, headers=None, **kwargs):
+        return server.post(
+            '/vector_search/add', params=params, content=data, headers=headers
+        )
+
+    client.session.post.side_effect = post
+
+    vectors = np.random.randn(10, 3)
+    client.add(
+        'my-uuid', [VectorItem(id=str(i), vector=v) for i, v in enumerate(vectors)]
+    )
+
+    assert client.session.post.call_count == 3
+    headers = client.session.post.call_args.kwargs['headers']
+    assert headers['Content-Type'] == VECTORS_CONTENT_TYPE
+
+    added = [call.kwargs for call in backend.add.call_args_list]
+    assert [x['uuid'] for x in added] == ['my-uuid'] * 3
+    items = [item for x in added for item in x['vectors']]
+    assert [item.id for item in items] == [str(i) for i in range(10)]
+    np.testing.assert_allclose(
+        np.stack([item.vector for item in items]), vectors, rtol=1e-6
+    )
+
+
+def test_service_add_accepts_json():
+    from pinnacle.backends.simple.vector_search import SimpleVectorSearch
+
+    backend = mock.MagicMock()
+    service = SimpleVectorSearch(backend=backend)
+    app = FastAPI()
+    service.build(app)
+
+    response = TestClient(app).post(
+        '/vector_search/add',
+        json={'uuid': 'my-uuid', 'vectors': [{'id': '1', 'vector': [1.0, 2.0]}]},
+    )
+    assert response.status_code == 200
+    (item,) = backend.add.call_args.kwargs['vectors']
+    assert item.id == '1' and item.vector == [1.0, 2.0]
+
+
+def test_service_binary_add_requires_uuid():
+    from pinnacle.backends.simple.vector_search import (
+        VECTORS_CONTENT_TYPE,
+        SimpleVectorSearch,
+        encode_vectors,
+    )
+
+    backend = mock.MagicMock()
+    service = SimpleVectorSearch(backend=backend)
+    app = FastAPI()
+    service.build(app)
+
+    response = TestClient(app).post(
+        '/vector_search/add',
+        content=encode_vectors(['1'], np.ones((1, 2))),
+        headers={'Content-Type': VECTORS_CONTENT_TYPE},
+    )
+    assert response.status_code == 400
+    backend.add.assert_not_called()
+
+
+def test_client_find_nearest_from_arrays():
+    from pinnacle.backends.simple.vector_search import (
+        SimpleVectorSearch,
+        SimpleVectorSearchClient,
+    )
+
+    backend = mock.MagicMock()
+    backend.find_nearest_from_arrays.return_value = ([['a'], ['b']], [[1.0], [0.5]])
+    service = SimpleVectorSearch(backend=backend)
+    app = FastAPI()
+    service.build(app)
+    server = TestClient(app)
+
+    client = SimpleVectorSearchClient()
+    client.session = mock.MagicMock()
+    client.session.post.side_effect = lambda url, json: server.post(
+        url.split(client.uri)[-1], json=json
+    )
+
+    h = np.random.randn(2, 3)
+    ids, scores = client.find_nearest_from_arrays(
+        h, component='VectorIndex', vector_index='v', n=1
+    )
+
+    assert ids == [['a'], ['b']]
+    assert scores == [[1.0], [0.5]]
+    assert client.session.post.call_count == 1
+    sent = backend.find_nearest_from_arrays.call_args
+    np.testing.assert_allclose(sent.args[0], h)
+
+
+def test_client_afind_nearest_from_array():
+    import asyncio
+
+    import httpx
+
+    from pinnacle.backends.simple.vector_search import (
+        SimpleVectorSearch,
+        SimpleVectorSearchClient,
+    )
+
+    backend = mock.MagicMock()
+    backend.find_nearest_from_array.return_value = (['a', 'b'], [1.0, 0.5])
+    service = SimpleVectorSearch(backend=backend)
+    app = FastAPI()
+    service.build(app)
+
+    client = SimpleVectorSearchClient()
+    client.session = mock.MagicMock()
+
+    session = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+
+    async def search():
+        client._async_sessions[asyncio.get_running_loop()] = session
+        results = await asyncio.gather(
+            *[
+                client.afind_nearest_from_array(
+                    np.random.randn(3), component='VectorIndex', vector_index='v', n=2
+                )
+                for _ in range(4)
+            ]
+        )
+        await client.aclose()
+        return results
+
+    results = asyncio.run(search())
+    assert results == [(['a', 'b'], [1.0, 0.5])] * 4
+    assert backend.find_nearest_from_array.call_count == 4
+    client.session.post.assert_not_called()
+    assert session.is_closed
+    client.session.close.assert_called_once()
+
+
+def test_client_close_closes_async_sessions():
+    import asyncio
+
+    from pinnacle.backends.simple.vector_search import SimpleVectorSearchClient
+
+    client = SimpleVectorSearchClient()
+    loop = asyncio.new_event_loop()
+    try:
+        session = loop.run_until_complete(_async_session(client))
+        client.close()
+        assert session.is_closed
+        assert not client._async_sessions
+    finally:
+        loop.close()
+
+
+async def _async_session(client):
+    return client._async_session()
@@ -463,3 +463,19 @@ def test_remove_shared(db: Datalayer):
     assert 'container2' not in db.show('Container')
     assert 'container1' in db.show('Container')
     assert 'test' in db.show('FakeModel')
+
+
+def test_on_event_batches_ids(db, monkeypatch):
+    monkeypatch.setattr(db.cfg, 'change_event_batch_size', 4)
+    with patch.object(db.metadata, 'show_cdcs', return_value=[{}]), patch.object(
+        db.cluster.scheduler, 'publish'
+    ) as publish:
+        db.on_event(table='documents', ids=list(range(10)), event_type='insert')
+
+    events = publish.call_args[0][0]
+    assert [e.ids for e in events] == [
+        ['0', '1', '2', '3'],
+        ['4', '5', '6', '7'],
+        ['8', '9'],
+    ]
+    assert {(e.queue, e.type) for e in events} == {('documents', 'insert')}
@@ -1,4 +1,5 @@
 import random
+import threading
 import typing as t  # noqa: F401
 
 import numpy as np
@@ -424,3 +425,165 @@ def test_autofill_data_listener(db):
     assert isinstance(out.components[1], Listener)
 
     assert isinstance(out.components[0].model, ObjectModel)
+
+
+def test_streaming_graph_cache(db):
+    from unittest.mock import patch
+
+    from pinnacle.base.metadata import CDC_VERSION
+    from pinnacle.components import cdc
+
+    db.create(test)
+    table = db['test']
+    table.insert([Document({'x': i, 'y': i}) for i in range(3)])
+
+    m1 = ObjectModel("m1", object=lambda x: x + 1, datatype='int')
+    db.apply(Listener(model=m1, select=table.select(), key="x", identifier="l1"))
+
+    with patch.object(
+        cdc, 'build_streaming_graph', wraps=cdc.build_streaming_graph
+    ) as build:
+        table.insert([Document({'x': i, 'y': i}) for i in range(3, 6)])
+        table.insert([Document({'x': i, 'y': i}) for i in range(6, 9)])
+        assert build.call_count == 1
+
+        # Applying a CDC component invalidates the graph
+        m2 = ObjectModel("m2", object=lambda x: x + 2, datatype='int')
+        db.apply(Listener(model=m2, select=table.select(), key="y", identifier="l2"))
+        table.insert([Document({'x': 9, 'y': 9})])
+        assert build.call_count == 2
+        components = cdc.get_streaming_components('test', db)
+        assert {c.identifier for c in components} == {'l1', 'l2'}
+        assert build.call_count == 2
+
+        # As does a change made by another process
+        db.metadata.bump_version(f'{CDC_VERSION}:test')
+        cdc.get_streaming_components('test', db)
+        assert build.call_count == 3
+
+        # As does a CDC component downstream of the graph
+        l2 = db.load('Listener', 'l2')
+        m3 = ObjectModel("m3", object=lambda x: x + 3, datatype='int')
+        l3 = Listener(
+            model=m3,
+            select=db[l2.outputs].select(),
+            key=l2.outputs,
+            identifier='l3',
+            upstream=[l2],
+        )
+        db.apply(l3)
+        components = cdc.get_streaming_components('test', db)
+        assert {c.identifier for c in components} == {'l1', 'l2', 'l3'}
+        assert build.call_count == 4
+
+        # But not one on another table
+        db.apply(Table('other', fields={'x': 'int'}))
+        m4 = ObjectModel("m4", object=lambda x: x + 4, datatype='int')
+        db.apply(
+            Listener(model=m4, select=db['other'].select(), key="x", identifier="l4")
+        )
+        cdc.get_streaming_components('test', db)
+        assert build.call_count == 4
+
+    assert len(db[db.load('Listener', 'l2').outputs].select().execute()) == 10
+
+
+def test_listener_background_consumers(db, monkeypatch):
+    if db.cfg.data_backend == 'sqlite://':
+        pytest.skip('In-memory SQLite databases are not shared between threads')
+    monkeypatch.setattr(db.cfg, 'scheduler_consumers', 2)
+
+    db.create(test)
+    table = db['test']
+    m = ObjectModel("m", object=lambda x: x + 1, datatype='int')
+    db.apply(Listener(model=m, select=table.select(), key="x", identifier="l"))
+
+    for i in range(5):
+        table.insert([Document({'x': i, 'y': i})])
+    db.flush(timeout=30)
+
+    outputs = db.load('Listener', 'l').outputs
+    results = db[outputs].select().execute()
+    assert sorted(r[outputs] for r in results) == [1, 2, 3, 4, 5]
+    db.cluster.scheduler.shutdown(timeout=30)
+
+
+def test_listener_concurrent_jobs(db, monkeypatch):
+    if db.cfg.data_backend == 'sqlite://':
+        pytest.skip('In-memory SQLite databases are not shared between threads')
+    monkeypatch.setattr(db.cfg, 'streaming_max_workers', 4)
+
+    db.create(test)
+    table = db['test']
+    m1 = ObjectModel("m1", object=lambda x: x + 1, datatype='int')
+    l1 = Listener(model=m1, select=table.select(), key="x", identifier="l1")
+    db.apply(l1)
+    m2 = ObjectModel("m2", object=lambda x: x * 10, datatype='int')
+    db.apply(Listener(model=m2, select=table.select(), key="y", identifier="l2"))
+    m3 = ObjectModel("m3", object=lambda x: x * 2, datatype='int')
+    db.apply(
+        Listener(
+            model=m3,
+            select=db[l1.outputs].select(),
+            key=l1.outputs,
+            identifier="l3",
+            upstream=[l1],
+        )
+    )
+
+    table.insert([Document({'x': i, 'y': i}) for i in range(3)])
+
+    def results(identifier):
+        outputs = db.load('Listener', identifier).outputs
+        return sorted(r[outputs] for r in db[outputs].select().execute())
+
+    assert results('l1') == [1, 2, 3]
+    assert results('l2') == [0, 10, 20]
+    assert results('l3') == [2, 4, 6]
+
+
+_barrier = threading.Barrier(1)
+
+
+def _add_one(x):
+    # Only passes if the jobs of both models run at the same time
+    _barrier.wait()
+    return x + 1
+
+
+def _times_ten(x):
+    _barrier.wait()
+    return x * 10
+
+
+def test_apply_concurrent_jobs(db, monkeypatch):
+    if db.cfg.data_backend == 'sqlite://':
+        pytest.skip('In-memory SQLite databases are not shared between threads')
+    monkeypatch.setattr(db.cfg, 'compute_max_workers', 4)
+    monkeypatch.setitem(globals(), '_barrier', threading.Barrier(2, timeout=5))
+
+    db.create(test)
+    table = db['test']
+    table.insert([Document({'x': i, 'y': i}) for i in range(3)])
+
+    m1 = ObjectModel("m1", object=_add_one, datatype='int')
+    l1 = Listener(model=m1, select=table.select(), key="x", identifier="l1")
+    m2 = ObjectModel("m2", object=_times_ten, datatype='int')
+    l2 = Listener(model=m2, select=table.select(), key="y", identifier="l2")
+    m3 = ObjectModel("m3", object=lambda x: x * 2, datatype='int')
+    l3 = Listener(
+        model=m3,
+        select=db[l1.outputs].select(),
+        key=l1.outputs,
+        identifier="l3",
+        upstream=[l1],
+    )
+    db.apply(Application('app', components=[l1, l2, l3]))
+
+    def results(identifier):
+        outputs = db.load('Listener', identifier).outputs
+        return sorted(r[outputs] for r in db[outputs].select().execute())
+
+    assert results('l1') == [1, 2, 3]
+    assert results('l2') == [0, 10, 20]
+    assert results('l3') == [2, 4, 6]
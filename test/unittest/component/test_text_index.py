@@ -0,0 +1,87 @@
+import numpy
+
+from pinnacle import ObjectModel, Table, VectorIndex
+from pinnacle.components.listener import Listener
+from pinnacle.components.text_index import TextIndex, reciprocal_rank_fusion
+
+TEXTS = [
+    'the cat sat on the mat',
+    'dogs chase cats in the park',
+    'stock markets fell sharply today',
+    'the mat was red',
+    'a recipe for tomato soup',
+]
+WORDS = sorted({w for text in TEXTS for w in text.split()} | {'kitten'})
+
+
+def embed(text):
+    vector = numpy.zeros(len(WORDS))
+    for w in text.split():
+        if w in WORDS:
+            vector[WORDS.index(w)] = 1
+    return vector
+
+
+def _build(db, **kwargs):
+    db.apply(Table('texts', fields={'txt': 'str'}))
+    db['texts'].insert([{'txt': text} for text in TEXTS])
+    vector_index = VectorIndex(
+        'texts_vectors',
+        indexing_listener=Listener(
+            'embed',
+            model=ObjectModel(
+                'embed', object=embed, datatype=f'vector[float:{len(WORDS)}]'
+            ),
+            key='txt',
+            select=db['texts'].select(),
+        ),
+    )
+    db.apply(
+        TextIndex('texts_keywords', key='txt', vector_index=vector_index, **kwargs)
+    )
+    primary_id = db['texts'].primary_id.execute()
+    return {r['txt']: r[primary_id] for r in db['texts'].select().execute()}
+
+
+def test_reciprocal_rank_fusion():
+    ids, scores = reciprocal_rank_fusion([['a', 'b', 'c'], ['c', 'a']], k=1, n=2)
+    assert ids == ['a', 'c']
+    assert scores == [1 / 2 + 1 / 3, 1 / 4 + 1 / 2]
+
+
+def test_text_index_lexical(db):
+    lookup = _build(db)
+
+    ids, _ = db.select_text('mat', 'texts_keywords', mode='lexical')
+    assert sorted(ids) == sorted([lookup[TEXTS[0]], lookup[TEXTS[3]]])
+
+    db['texts'].insert([{'txt': 'the mat on the floor'}])
+    ids, _ = db.select_text('floor', 'texts_keywords', mode='lexical')
+    assert len(ids) == 1
+
+
+def test_text_index_hybrid(db):
+    lookup = _build(db, candidates=3)
+
+    # The vector index finds the cat text from its other words, and rank
+    # fusion puts the texts found by both retrievers first
+    ids, _ = db.select_text('cat mat kitten', 'texts_keywords', n=2)
+    assert ids[0] == lookup[TEXTS[0]]
+
+    # Re-ranking only orders the keyword candidates
+    ids, scores = db.select_text('mat', 'texts_keywords', mode='rerank')
+    assert sorted(ids) == sorted([lookup[TEXTS[0]], lookup[TEXTS[3]]])
+    assert scores[0] >= scores[1]
+
+    assert db.select_text('kitten', 'texts_keywords', mode='rerank') == ([], [])
+
+
+def test_text_index_rebuilt_after_restart(db):
+    from pinnacle.components import text_index
+
+    lookup = _build(db)
+    uuid = db.show('TextIndex', 'texts_keywords', -1)['uuid']
+    text_index._TEXT_INDEXES.pop(uuid)
+
+    ids, _ = db.select_text('soup', 'texts_keywords', mode='lexical')
+    assert ids == [lookup[TEXTS[4]]]
@@ -1,5 +1,10 @@
+import os
 from test.utils.usecase.vector_search import add_data
+from unittest import mock
+from unittest.mock import patch
 
+from pinnacle import CFG
+from pinnacle.base.query import Query
 from pinnacle.components.listener import Listener
 from pinnacle.components.model import ObjectModel
 from pinnacle.components.vector_index import VectorIndex
@@ -30,6 +35,54 @@ def test_vector_index_recovery(db):
     assert len(ids) == 10
 
 
+def test_vector_index_recovery_from_snapshot(db, tmp_path, monkeypatch):
+    from test.utils.usecase.vector_search import build_vector_index
+
+    from pinnacle import CFG
+
+    monkeypatch.setattr(CFG, 'vector_search_snapshot_dir', str(tmp_path))
+    build_vector_index(db)
+
+    vector_search = db.cluster.vector_search
+    vector_search.snapshot()
+    uuid = db.show('VectorIndex', 'vector_index', -1)['uuid']
+    assert os.path.exists(tmp_path / uuid / 'manifest.json')
+
+    # Simulate restart: the snapshot is restored without reloading vectors
+    vector_index = db.load('VectorIndex', 'vector_index')
+    searcher = vector_search.searcher_impl.from_component(vector_index)
+    searcher.db = db
+    with patch.object(
+        VectorIndex, 'iter_vectors', side_effect=AssertionError('full reload')
+    ):
+        searcher.initialize()
+
+    assert sorted(searcher.list()) == sorted(vector_search.get_tool(uuid).list())
+
+
+def test_vector_index_recovery_deletes_stale_vectors(db):
+    from test.utils.usecase.vector_search import build_vector_index
+
+    import numpy
+
+    from pinnacle.backends.base.vector_search import VectorItem
+
+    build_vector_index(db)
+
+    vector_search = db.cluster.vector_search
+    uuid = db.show('VectorIndex', 'vector_index', -1)['uuid']
+    tool = vector_search.get_tool(uuid)
+    expected = sorted(tool.list())
+
+    # Vectors deleted from the table while the searcher was down
+    vector = numpy.random.randn(db.load('VectorIndex', 'vector_index').dimensions)
+    tool.add([VectorItem(id='stale', vector=vector)])
+
+    vector_search.initialize()
+
+    assert sorted(tool.list()) == expected
+
+
 def test_vector_index_cleanup(db):
     from test.utils.usecase.vector_search import build_vector_index
 
@@ -72,3 +125,203 @@ def test_initialize_output_datatype_with_dimensions(db):
     )
 
     assert vector_index.dimensions == 32
+
+
+def test_vector_index_get_nearest_batch(db):
+    from test.utils.usecase.vector_search import build_vector_index
+
+    from pinnacle import Document
+
+    build_vector_index(db)
+
+    table = db["documents"]
+    samples = table.select().execute()[:3]
+    vector_index = db.load('VectorIndex', 'vector_index')
+
+    likes = [Document({"x": r["x"]}) for r in samples]
+    ids, scores = vector_index.get_nearest(likes, n=5)
+
+    assert len(ids) == len(scores) == 3
+    for like, batch_ids, batch_scores in zip(likes, ids, scores):
+        single_ids, single_scores = vector_index.get_nearest(like, n=5)
+        assert batch_ids == single_ids
+        assert len(batch_scores) == 5
+
+
+def test_vector_index_iter_vectors(db):
+    from test.utils.usecase.vector_search import VECTOR_SIZE, build_vector_index
+
+    build_vector_index(db, n=25)
+    vector_index = db.load('VectorIndex', 'vector_index')
+
+    pages = list(vector_index.iter_vectors(batch_size=10))
+    assert [len(ids) for ids, _ in pages] == [10, 10, 5]
+    assert all(vectors.shape == (len(ids), VECTOR_SIZE) for ids, vectors in pages)
+
+    ids = [id for page_ids, _ in pages for id in page_ids]
+    assert sorted(ids) == sorted(v['id'] for v in vector_index.get_vectors())
+
+    # All outputs are read with one query, not one query per page
+    with patch.object(Query, 'subset', side_effect=AssertionError('subset')):
+        assert len(list(vector_index.iter_vectors(batch_size=10))) == 3
+
+    pages = list(vector_index.iter_vectors(ids=ids[:15], batch_size=10))
+    assert sorted(id for page_ids, _ in pages for id in page_ids) == sorted(ids[:15])
+
+
+def test_query_embedding_cache(db, monkeypatch):
+    from test.utils.usecase.vector_search import build_vector_index
+
+    from pinnacle.components.vector_index import query_embedding_cache
+
+    monkeypatch.setattr(CFG, 'query_embedding_cache_size', 1024)
+    build_vector_index(db)
+    cache = query_embedding_cache()
+    cache.clear()
+
+    table = db["documents"]
+    for _ in range(3):
+        table.like({"x": 10}, vector_index="vector_index", n=5).select().execute()
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] == 2
+
+    table.like({"x": 11}, vector_index="vector_index", n=5).select().execute()
+    assert cache.stats()['misses'] == 2
+
+
+def test_query_embedding_cache_model_change(monkeypatch):
+    from pinnacle.components.vector_index import _predict_query, query_embedding_cache
+
+    monkeypatch.setattr(CFG, 'query_embedding_cache_size', 1024)
+    cache = query_embedding_cache()
+    cache.clear()
+    model = mock.MagicMock(identifier='model', uuid='1')
+    model.predict.side_effect = lambda x: f'{model.uuid}:{x}'
+
+    assert _predict_query(model, 'x', 'query') == '1:query'
+    assert _predict_query(model, 'x', 'query') == '1:query'
+    assert model.predict.call_count == 1
+
+    # A new version of the model evicts the embeddings of the old one
+    model.uuid = '2'
+    assert _predict_query(model, 'x', 'query') == '2:query'
+    assert len(cache) == 1
+
+    # Inputs which can't be hashed by content are not cached
+    _predict_query(model, 'x', object())
+    _predict_query(model, 'x', object())
+    assert model.predict.call_count == 4
+
+
+def test_query_embedding_cache_is_read_only(monkeypatch):
+    import numpy as np
+
+    from pinnacle.components.vector_index import _predict_query, query_embedding_cache
+
+    model = mock.MagicMock(identifier='model', uuid='1')
+    model.predict.side_effect = lambda x: np.ones(2)
+
+    # The cache is disabled by default
+    query_embedding_cache().clear()
+    _predict_query(model, 'x', 'query')
+    assert len(query_embedding_cache()) == 0
+
+    monkeypatch.setattr(CFG, 'query_embedding_cache_size', 1024)
+    h = _predict_query(model, 'x', 'query')
+    h[0] = 2
+    cached = _predict_query(model, 'x', 'query')
+    assert model.predict.call_count == 2
+    assert cached.tolist() == [1, 1]
+    assert not cached.flags.writeable
+
+
+def test_select_nearest_many(db):
+    from test.utils.usecase.vector_search import build_vector_index
+
+    from pinnacle.components.vector_index import query_embedding_cache
+
+    build_vector_index(db)
+    query_embedding_cache().clear()
+
+    table = db["documents"]
+    primary_id = table.primary_id.execute()
+    samples = table.select().execute()[:4]
+    likes = [{"x": r["x"]} for r in samples]
+
+    ids, scores = db.select_nearest_many(likes, vector_index="vector_index", n=5)
+    assert len(ids) == len(scores) == 4
+    for like, batch_ids in zip(likes, ids):
+        single_ids, _ = db.select_nearest(like, vector_index="vector_index", n=5)
+        assert batch_ids == single_ids
+
+    results = table.like(likes, vector_index="vector_index", n=5).select().execute()
+    assert len(results) == 4
+    for batch_ids, rows in zip(ids, results):
+        assert [r[primary_id] for r in rows] == batch_ids
+        assert all('score' in r for r in rows)
+
+
+def test_predict_queries_batches_misses(monkeypatch):
+    from pinnacle.components.vector_index import _predict_queries, query_embedding_cache
+
+    monkeypatch.setattr(CFG, 'query_embedding_cache_size', 1024)
+    query_embedding_cache().clear()
+    model = mock.MagicMock(identifier='model', uuid='1')
+    model.predict.side_effect = lambda x: f'p:{x}'
+    model.predict_batches.side_effect = lambda xs: [f'b:{x}' for x in xs]
+
+    assert _predict_queries(model, 'x', ['a']) == ['p:a']
+    assert _predict_queries(model, 'x', ['a', 'b', 'b', 'c']) == [
+        'p:a',
+        'b:b',
+        'b:b',
+        'b:c',
+    ]
+    model.predict_batches.assert_called_once_with(['b', 'c'])
+
+
+def test_aselect_nearest(db):
+    import asyncio
+    from test.utils.usecase.vector_search import build_vector_index
+
+    build_vector_index(db)
+
+    table = db["documents"]
+    likes = [{"x": r["x"]} for r in table.select().execute()[:4]]
+
+    async def search():
+        return await asyncio.gather(
+            *[
+                db.aselect_nearest(like, vector_index="vector_index", n=5)
+                for like in likes
+            ],
+            db.aselect_nearest_many(likes, vector_index="vector_index", n=5),
+        )
+
+    *single, (many_ids, _) = asyncio.run(search())
+    for like, (ids, scores), batch_ids in zip(likes, single, many_ids):
+        assert ids == db.select_nearest(like, vector_index="vector_index", n=5)[0]
+        assert batch_ids == ids
+        assert len(scores) == 5
+
+
+def test_apredict_queries_uses_async_predict():
+    import asyncio
+
+    from pinnacle.components.vector_index import (
+        _apredict_queries,
+        query_embedding_cache,
+    )
+
+    query_embedding_cache().clear()
+    model = mock.MagicMock(identifier='async-model', uuid='1')
+    del model.async_predict_batches
+
+    async def async_predict(x):
+        return f'a:{x}'
+
+    model.async_predict = async_predict
+    out = asyncio.run(_apredict_queries(model, 'x', ['a', 'b', 'a']))
+    assert out == ['a:a', 'a:b', 'a:a']
+    model.predict.assert_not_called()
+    model.predict_batches.assert_not_called()
@@ -0,0 +1,36 @@
+from unittest import mock
+
+from pinnacle.misc.special_dicts import LRUCache
+
+
+def test_lru_cache_eviction_and_counters():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    # 'b' is now the least recently used item
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats() == {'size': 2, 'max_size': 2, 'hits': 3, 'misses': 1}
+
+    cache.evict(lambda key: key == 'a')
+    assert cache.get('a') is None
+    assert len(cache) == 1
+
+
+def test_lru_cache_ttl():
+    cache = LRUCache(max_size=2, ttl=10)
+    with mock.patch('time.monotonic', return_value=100.0):
+        cache.put('a', 1)
+    with mock.patch('time.monotonic', return_value=105.0):
+        assert cache.get('a') == 1
+    with mock.patch('time.monotonic', return_value=111.0):
+        assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(max_size=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+
+from pinnacle.backends.base.benchmark import (
+    exact_neighbours,
+    main,
+    make_dataset,
+    recall_at_k,
+    run_benchmark,
+)
+
+
+def test_make_dataset():
+    dataset = make_dataset('clustered', n=100, d=8, n_queries=10)
+    assert dataset.vectors.shape == (100, 8)
+    assert dataset.queries.shape == (10, 8)
+    assert dataset.vectors.dtype == np.float32
+    assert dataset.ids[:2] == ['0', '1']
+
+    again = make_dataset('clustered', n=100, d=8, n_queries=10)
+    np.testing.assert_array_equal(dataset.vectors, again.vectors)
+
+
+def test_recall_at_k():
+    dataset = make_dataset('uniform', n=50, d=4, n_queries=5)
+    exact = exact_neighbours(dataset, 3, measure='l2')
+    found = [[str(x) for x in row] for row in exact.tolist()]
+    assert recall_at_k(found, exact) == 1.0
+    assert recall_at_k([row[:1] for row in found], exact) == 1 / 3
+
+
+def test_run_benchmark():
+    report = run_benchmark(
+        searchers=['inmemory', 'hnsw', 'lance'],
+        datasets=['uniform'],
+        n=200,
+        d=8,
+        n_queries=10,
+        k=5,
+        concurrency=2,
+    )
+    results = {r['searcher']: r for r in report['results']}
+    assert report['config']['n'] == 200
+
+    exact = results['inmemory']
+    assert exact['recall@5'] == 1.0
+    assert set(exact['latency']) >= {'p50_ms', 'p99_ms'}
+    assert exact['qps'] > 0 and exact['qps_batched'] > 0
+    assert results['hnsw']['recall@5'] > 0.8
+
+    # Searchers of plugins which are not installed are reported, not raised
+    if 'error' in results['lance']:
+        assert 'lance' in results['lance']['error']
+
+
+def test_run_benchmark_sharded(monkeypatch):
+    from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+    monkeypatch.setattr(InMemoryVectorSearcher, '_MIN_SHARD_SIZE', 50)
+    report = run_benchmark(
+        searchers=['sharded'],
+        datasets=['clustered'],
+        n=400,
+        d=8,
+        n_queries=10,
+        k=5,
+        concurrency=2,
+        searcher_kwargs={'sharded': {'n_shards': 4}},
+    )
+    (result,) = report['results']
+    # Sharded search is exact
+    assert result['recall@5'] == 1.0
+    assert result['qps'] > 0
+
+
+def test_main_writes_report(tmp_path):
+    path = tmp_path / 'report.json'
+    main(
+        [
+            '--n',
+            '100',
+            '--d',
+            '4',
+            '--n-queries',
+            '5',
+            '--datasets',
+            'clustered',
+            '--output',
+            str(path),
+        ]
+    )
+    report = json.loads(path.read_text())
+    assert report['results'][0]['searcher'] == 'inmemory'
+    assert report['results'][0]['recall@10'] == 1.0
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from pinnacle.backends.base.vector_search import VectorItem
+from pinnacle.backends.local.hnsw import HNSWVectorSearcher
+from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+
+def _clustered(n, d, n_clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, d))
+    labels = rng.integers(0, n_clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, d))
+
+
+def _build(cls, vectors, **kwargs):
+    searcher = cls(identifier='123456', dimensions=vectors.shape[1], **kwargs)
+    searcher.add(
+        [VectorItem(id=str(i), vector=v) for i, v in enumerate(vectors)],
+    )
+    return searcher
+
+
+def _recall(expected, found):
+    return np.mean([len(set(e) & set(f)) / len(e) for e, f in zip(expected, found)])
+
+
+@pytest.mark.parametrize("measure", ["l2", "dot", "cosine"])
+def test_hnsw_recall_vs_brute_force(measure):
+    vectors = _clustered(2000, 16)
+    queries = _clustered(20, 16, seed=1)
+
+    exact = _build(InMemoryVectorSearcher, vectors, measure=measure)
+    hnsw = _build(HNSWVectorSearcher, vectors, measure=measure, M=8, ef_construction=64)
+
+    expected, _ = exact.find_nearest_from_arrays(queries, n=10)
+    found, scores = hnsw.find_nearest_from_arrays(queries, n=10, ef_search=64)
+
+    # Inner product is not a metric, so greedy graph search is less accurate
+    assert _recall(expected, found) >= (0.8 if measure == 'dot' else 0.9)
+    assert all(s == sorted(s, reverse=True) for s in scores)
+
+    ids, _ = hnsw.find_nearest_from_array(queries[0], n=10, ef_search=10)
+    assert len(ids) == 10
+
+
+def test_hnsw_within_ids_filters_during_traversal():
+    vectors = _clustered(2000, 16)
+    exact = _build(InMemoryVectorSearcher, vectors, measure='l2')
+    hnsw = _build(HNSWVectorSearcher, vectors, measure='l2', M=8, ef_construction=64)
+
+    within_ids = [str(i) for i in range(0, 2000, 2)]
+    queries = _clustered(10, 16, seed=2)
+    expected, _ = exact.find_nearest_from_arrays(queries, n=5, within_ids=within_ids)
+    found, _ = hnsw.find_nearest_from_arrays(
+        queries, n=5, within_ids=within_ids, ef_search=64
+    )
+
+    for ids in found:
+        assert len(ids) == 5
+        assert set(ids) <= set(within_ids)
+    assert _recall(expected, found) >= 0.9
+
+
+def test_hnsw_selective_within_ids_are_searched_exactly(monkeypatch):
+    vectors = _clustered(2000, 16)
+    exact = _build(InMemoryVectorSearcher, vectors, measure='l2')
+    hnsw = _build(HNSWVectorSearcher, vectors, measure='l2', M=8, ef_construction=64)
+
+    def traverse(*args, **kwargs):
+        raise AssertionError('the graph is traversed')
+
+    monkeypatch.setattr(hnsw, '_search_layer', traverse)
+    within_ids = [str(i) for i in range(0, 2000, 40)]
+    queries = _clustered(10, 16, seed=2)
+    expected, _ = exact.find_nearest_from_arrays(queries, n=5, within_ids=within_ids)
+    found, _ = hnsw.find_nearest_from_arrays(queries, n=5, within_ids=within_ids)
+    assert found == expected
+
+
+def test_hnsw_delete_upsert_and_repair():
+    vectors = _clustered(1000, 8)
+    hnsw = _build(HNSWVectorSearcher, vectors, measure='l2', M=8, ef_construction=32)
+
+    hnsw.add([VectorItem(id='0', vector=vectors[1] + 1e-3)])
+    assert len(hnsw) == 1000
+    res, _ = hnsw.find_nearest_from_array(vectors[1], n=2)
+    assert set(res) == {'0', '1'}
+
+    hnsw.delete(['1'])
+    res, _ = hnsw.find_nearest_from_array(vectors[1], n=5)
+    assert '1' not in res
+    assert hnsw._n_deleted == 2
+
+    # Deleting past the compaction threshold repairs the graph
+    hnsw.delete([str(i) for i in range(2, 400)])
+    assert hnsw._n_deleted == 0
+    assert len(hnsw._links) == len(hnsw) == 601
+    deleted = set(str(i) for i in range(1, 400))
+    for links in hnsw._links:
+        for level in links:
+            assert all(0 <= x < len(hnsw) for x in level)
+
+    exact = InMemoryVectorSearcher(identifier='123456', dimensions=8, measure='l2')
+    exact.add([VectorItem(id=i, vector=hnsw.h[hnsw.lookup[i]]) for i in hnsw.list()])
+    queries = _clustered(10, 8, seed=3)
+    expected, _ = exact.find_nearest_from_arrays(queries, n=10)
+    found, _ = hnsw.find_nearest_from_arrays(queries, n=10, ef_search=64)
+    assert not deleted & set(sum(found, []))
+    assert _recall(expected, found) >= 0.9
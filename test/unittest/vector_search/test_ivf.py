@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from pinnacle.backends.base.vector_search import VectorItem
+from pinnacle.backends.local.ivf import IVFVectorSearcher
+from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+
+def _clustered(n, d, n_clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, d))
+    labels = rng.integers(0, n_clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, d))
+
+
+def _build(cls, vectors, **kwargs):
+    searcher = cls(identifier='123456', dimensions=vectors.shape[1], **kwargs)
+    searcher.add(
+        [VectorItem(id=str(i), vector=v) for i, v in enumerate(vectors)],
+    )
+    return searcher
+
+
+@pytest.mark.parametrize("measure", ["l2", "dot", "cosine"])
+def test_ivf_recall_vs_brute_force(measure):
+    vectors = _clustered(20000, 32)
+    queries = _clustered(50, 32, seed=1)
+    k = 10
+
+    exact = _build(InMemoryVectorSearcher, vectors, measure=measure)
+    ivf = _build(IVFVectorSearcher, vectors, measure=measure, min_train_size=1000)
+    assert ivf.trained
+
+    expected, _ = exact.find_nearest_from_arrays(queries, n=k)
+    found, scores = ivf.find_nearest_from_arrays(queries, n=k, nprobe=16)
+
+    recall = np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)])
+    assert recall >= 0.9
+    assert all(s == sorted(s, reverse=True) for s in scores)
+
+    # Only a fraction of the index is scanned per query
+    assert 16 / len(ivf._lists) < 0.2
+
+    # Probing every list is exact
+    found, _ = ivf.find_nearest_from_arrays(queries, n=k, nprobe=len(ivf._lists))
+    assert found == expected
+
+
+def test_ivf_incremental_add_delete_and_retrain():
+    vectors = _clustered(3000, 16)
+    ivf = _build(IVFVectorSearcher, vectors, measure='l2', min_train_size=1000)
+    n_lists = len(ivf._lists)
+    assert ivf._trained_size == 3000
+
+    # New vectors are assigned to lists without retraining
+    ivf.add([VectorItem(id='new', vector=vectors[0] + 1e-3)])
+    assert ivf._trained_size == 3000
+    assert sum(len(x) for x in ivf._lists) == 3001
+    res, _ = ivf.find_nearest_from_array(vectors[0] + 1e-3, n=1)
+    assert res == ['new']
+
+    # Upserts move vectors between lists
+    ivf.add([VectorItem(id='new', vector=vectors[1])])
+    assert sum(len(x) for x in ivf._lists) == 3001
+    res, _ = ivf.find_nearest_from_array(vectors[1], n=2)
+    assert set(res) == {'new', '1'}
+
+    ivf.delete(['new', '1'])
+    res, _ = ivf.find_nearest_from_array(vectors[1], n=10)
+    assert 'new' not in res and '1' not in res
+
+    # Doubling the index triggers a retrain
+    more = _clustered(4000, 16, seed=3)
+    ivf.add([VectorItem(id=f'more-{i}', vector=v) for i, v in enumerate(more)])
+    assert ivf._trained_size == len(ivf)
+    assert len(ivf._lists) != n_lists
+
+
+def test_ivf_within_ids_is_exact():
+    vectors = _clustered(2000, 8)
+    exact = _build(InMemoryVectorSearcher, vectors, measure='cosine')
+    ivf = _build(IVFVectorSearcher, vectors, measure='cosine', min_train_size=100)
+    within_ids = [str(i) for i in range(0, 2000, 7)]
+    assert ivf.find_nearest_from_array(
+        vectors[3], n=5, within_ids=within_ids
+    ) == exact.find_nearest_from_array(vectors[3], n=5, within_ids=within_ids)
+
+
+def test_load_searcher():
+    from pinnacle.backends.local.vector_search import load_searcher
+
+    assert load_searcher('local') is InMemoryVectorSearcher
+    assert load_searcher('local://ivf') is IVFVectorSearcher
+    with pytest.raises(ValueError):
+        load_searcher('local://unknown')
@@ -0,0 +1,181 @@
+import gc
+import os
+
+import numpy as np
+import pytest
+
+from pinnacle.backends.base.vector_search import VectorItem
+from pinnacle.backends.local.quantization import QuantizedVectorSearcher
+from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+
+def _clustered(n, d, n_clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, d))
+    labels = rng.integers(0, n_clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, d))
+
+
+def _build(cls, vectors, **kwargs):
+    searcher = cls(identifier='123456', dimensions=vectors.shape[1], **kwargs)
+    searcher.add(
+        [VectorItem(id=str(i), vector=v) for i, v in enumerate(vectors)],
+    )
+    return searcher
+
+
+def _recall(expected, found, k):
+    return np.mean([len(set(e) & set(f[:k])) / k for e, f in zip(expected, found)])
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_in_memory_dtype(dtype):
+    vectors = _clustered(2000, 16)
+    exact = _build(InMemoryVectorSearcher, vectors, measure='l2')
+    searcher = _build(InMemoryVectorSearcher, vectors, measure='l2', dtype=dtype)
+    assert searcher.h.dtype == np.dtype(dtype)
+
+    expected, _ = exact.find_nearest_from_arrays(vectors[:20], n=10)
+    found, _ = searcher.find_nearest_from_arrays(vectors[:20], n=10)
+    assert _recall(expected, found, 10) >= 0.95
+
+
+@pytest.mark.parametrize("quantization", ["int8", "pq"])
+@pytest.mark.parametrize("measure", ["l2", "dot", "cosine"])
+def test_quantized_recall(quantization, measure):
+    vectors = _clustered(5000, 32)
+    queries = _clustered(50, 32, seed=1)
+    k = 10
+
+    exact = _build(InMemoryVectorSearcher, vectors, measure=measure)
+    expected, _ = exact.find_nearest_from_arrays(queries, n=k)
+
+    searcher = _build(
+        QuantizedVectorSearcher,
+        vectors,
+        measure=measure,
+        quantization=quantization,
+        min_train_size=1000,
+        rerank=0,
+    )
+    assert searcher.trained
+    assert searcher.describe()['nbytes'] <= vectors.astype(np.float32).nbytes / 4
+
+    found, scores = searcher.find_nearest_from_arrays(queries, n=k)
+    assert all(s == sorted(s, reverse=True) for s in scores)
+    approximate = _recall(expected, found, k)
+
+    # Re-ranking with the full-precision vectors recovers the exact scores
+    searcher.rerank = 10
+    found, scores = searcher.find_nearest_from_arrays(queries, n=k)
+    reranked = _recall(expected, found, k)
+    assert reranked >= max(approximate, 0.9)
+    _, exact_scores = exact.find_nearest_from_arrays(queries[:1], n=1)
+    assert scores[0][0] == pytest.approx(exact_scores[0][0], rel=1e-4)
+
+    searcher.drop()
+    assert not os.path.exists(searcher.directory)
+
+
+def test_quantized_add_delete_and_compact(tmp_path):
+    vectors = _clustered(3000, 16)
+    searcher = _build(
+        QuantizedVectorSearcher,
+        vectors,
+        measure='l2',
+        min_train_size=1000,
+        directory=str(tmp_path),
+    )
+    assert searcher.trained
+    assert len(os.listdir(tmp_path)) == 1
+
+    # New vectors are encoded without retraining
+    searcher.add([VectorItem(id='new', vector=vectors[0] + 1e-3)])
+    res, _ = searcher.find_nearest_from_array(vectors[0] + 1e-3, n=1)
+    assert res == ['new']
+
+    searcher.delete([str(i) for i in range(1000)])
+    assert len(searcher) == 2001
+    res, _ = searcher.find_nearest_from_array(vectors[1500], n=5)
+    assert res[0] == '1500'
+    assert not set(res) & {str(i) for i in range(1000)}
+
+    within_ids = [str(i) for i in range(1000, 3000, 7)]
+    res, _ = searcher.find_nearest_from_array(vectors[1007], n=5, within_ids=within_ids)
+    assert set(res) <= set(within_ids)
+    assert res[0] == '1007'
+
+
+def test_quantized_temporary_directory_is_removed():
+    searcher = _build(QuantizedVectorSearcher, _clustered(100, 16), measure='l2')
+    directory = searcher.directory
+    assert os.listdir(directory)
+
+    del searcher
+    gc.collect()
+    assert not os.path.exists(directory)
+
+
+def test_pq_with_fewer_than_256_centroids():
+    # Codebooks have as many centroids as training vectors, up to 256
+    vectors = _clustered(100, 16)
+    searcher = _build(
+        QuantizedVectorSearcher,
+        vectors,
+        measure='dot',
+        quantization='pq',
+        min_train_size=100,
+        rerank=0,
+    )
+    assert searcher._codebooks.shape[1] == 100
+
+    decoded = searcher._codebooks[
+        np.arange(searcher.n_subvectors), searcher._codes[:100]
+    ].reshape(100, -1)
+    expected = vectors[:5].astype(np.float32) @ decoded.T
+    np.testing.assert_allclose(
+        searcher._similarities(vectors[:5]), expected, rtol=1e-4, atol=1e-4
+    )
+
+
+def test_quantized_invalid_arguments():
+    with pytest.raises(ValueError):
+        QuantizedVectorSearcher('123456', dimensions=8, quantization='int4')
+    with pytest.raises(ValueError):
+        QuantizedVectorSearcher('123456', dimensions=8, n_subvectors=3)
+
+
+def test_binary_recall():
+    from pinnacle.backends.local.quantization import BinaryVectorSearcher
+
+    # Sign bits need many dimensions: use low-rank, embedding-like vectors
+    rng = np.random.default_rng(0)
+    basis = rng.normal(size=(32, 256))
+    vectors = rng.normal(size=(5000, 32)) @ basis + 0.5 * rng.normal(size=(5000, 256))
+    queries = vectors[:50] + 0.3 * rng.normal(size=(50, 256))
+    k = 10
+
+    exact = _build(InMemoryVectorSearcher, vectors, measure='cosine')
+    expected, exact_scores = exact.find_nearest_from_arrays(queries, n=k)
+
+    searcher = _build(BinaryVectorSearcher, vectors, min_train_size=1000)
+    assert searcher.trained
+    assert searcher.describe()['nbytes'] == 5000 * 256 // 8
+
+    searcher.oversample = 0
+    found, _ = searcher.find_nearest_from_arrays(queries, n=k)
+    approximate = _recall(expected, found, k)
+    assert approximate >= 0.4
+
+    searcher.oversample = 10
+    found, scores = searcher.find_nearest_from_arrays(queries, n=k)
+    assert _recall(expected, found, k) >= max(approximate, 0.95)
+    assert scores[0][0] == pytest.approx(exact_scores[0][0], rel=1e-4)
+    searcher.drop()
+
+
+def test_binary_requires_cosine():
+    from pinnacle.backends.local.quantization import BinaryVectorSearcher
+
+    with pytest.raises(ValueError):
+        BinaryVectorSearcher('123456', dimensions=8, measure='l2')
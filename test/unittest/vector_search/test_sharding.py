@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from pinnacle.backends.base.vector_search import VectorItem
+from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
+
+
+def _build(vectors, **kwargs):
+    searcher = InMemoryVectorSearcher(
+        identifier='123456', dimensions=vectors.shape[1], **kwargs
+    )
+    searcher._MIN_SHARD_SIZE = 1000
+    searcher.add([VectorItem(id=str(i), vector=v) for i, v in enumerate(vectors)])
+    return searcher
+
+
+@pytest.mark.parametrize("measure", ["l2", "dot", "cosine"])
+def test_sharded_search_is_exact(measure):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(10000, 16))
+    queries = rng.normal(size=(5, 16))
+
+    single = _build(vectors, measure=measure)
+    sharded = _build(vectors, measure=measure, n_shards=4)
+
+    expected, expected_scores = single.find_nearest_from_arrays(queries, n=10)
+    found, scores = sharded.find_nearest_from_arrays(queries, n=10)
+    assert found == expected
+    np.testing.assert_allclose(scores, expected_scores)
+
+    # Deleted and filtered rows are excluded in every shard
+    deleted = [str(i) for i in range(0, 10000, 3)]
+    single.delete(deleted)
+    sharded.delete(deleted)
+    within_ids = [str(i) for i in range(0, 10000, 2)]
+    for kwargs in [{}, {'within_ids': within_ids}]:
+        expected, _ = single.find_nearest_from_arrays(queries, n=10, **kwargs)
+        found, _ = sharded.find_nearest_from_arrays(queries, n=10, **kwargs)
+        assert found == expected
+
+    # Asking for more results than rows left returns only the live rows
+    found, _ = sharded.find_nearest_from_arrays(queries[:1], n=100000)
+    assert sorted(found[0]) == sorted(sharded.list())
@@ -1,10 +1,17 @@
+import json
+import os
 import tempfile
+import threading
 import uuid
+from unittest import mock
 
 import numpy as np
 import pytest
 
 from pinnacle.backends.base.vector_search import VectorItem
+from pinnacle.backends.local.hnsw import HNSWVectorSearcher
+from pinnacle.backends.local.ivf import IVFVectorSearcher
+from pinnacle.backends.local.quantization import QuantizedVectorSearcher
 from pinnacle.backends.local.vector_search import InMemoryVectorSearcher
 
 
@@ -36,3 +43,367 @@ def test_index(index_data, measure, vector_index_cls):
     res, _ = h.find_nearest_from_array(y, 1)
 
     assert res[0] == "new"
+
+
+@pytest.mark.parametrize("measure", ["l2", "dot", "cosine"])
+def test_find_nearest_scores_aligned_with_ids(measure):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8))
+    ids = [str(i) for i in range(50)]
+    h = InMemoryVectorSearcher(identifier="123456", measure=measure, dimensions=8)
+    h.add(items=[VectorItem(id=id_, vector=v) for v, id_ in zip(vectors, ids)])
+
+    y = rng.normal(size=8)
+    res, scores = h.find_nearest_from_array(y, 5)
+
+    assert len(res) == len(scores) == 5
+    assert scores == sorted(scores, reverse=True)
+    expected = h.measure(y[None, :], h.h)[0]
+    np.testing.assert_allclose(scores, expected[[h.lookup[i] for i in res]])
+    assert res == [ids[i] for i in np.argsort(-expected)[:5]]
+
+
+@pytest.mark.parametrize("measure", ["l2", "dot", "cosine"])
+def test_find_nearest_from_arrays(measure):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(50, 8))
+    ids = [str(i) for i in range(50)]
+    h = InMemoryVectorSearcher(identifier="123456", measure=measure, dimensions=8)
+    h.add(items=[VectorItem(id=id_, vector=v) for v, id_ in zip(vectors, ids)])
+
+    queries = rng.normal(size=(4, 8))
+    within_ids = ids[10:30]
+    batch_ids, batch_scores = h.find_nearest_from_arrays(
+        queries, n=3, within_ids=within_ids
+    )
+
+    assert len(batch_ids) == len(batch_scores) == 4
+    for q, res, scores in zip(queries, batch_ids, batch_scores):
+        single_ids, single_scores = h.find_nearest_from_array(
+            q, n=3, within_ids=within_ids
+        )
+        assert res == single_ids
+        np.testing.assert_allclose(scores, single_scores)
+        assert set(res) <= set(within_ids)
+
+
+def test_upsert_delete_and_compaction():
+    rng = np.random.default_rng(2)
+    h = InMemoryVectorSearcher(identifier="123456", measure="dot", dimensions=4)
+    h._MIN_CAPACITY = 2
+
+    vectors = {str(i): rng.normal(size=4) for i in range(10)}
+    for id_, v in vectors.items():
+        h.add([VectorItem(id=id_, vector=v)])
+    assert len(h) == 10
+    assert h._buffer.shape[0] >= 10
+
+    # In-place upsert does not grow the index
+    vectors['3'] = np.array([10.0, 0, 0, 0])
+    h.add([VectorItem(id='3', vector=vectors['3'])])
+    assert len(h) == 10
+    assert h.find_nearest_from_array(np.array([1.0, 0, 0, 0]), 1)[0] == ['3']
+
+    # Deleted vectors are never returned
+    h.delete(['3'])
+    assert len(h) == 9
+    assert h._n_deleted == 1
+    res, scores = h.find_nearest_from_array(np.array([1.0, 0, 0, 0]), 100)
+    assert '3' not in res
+    assert len(res) == len(scores) == 9
+    assert sorted(h.list()) == sorted(set(vectors) - {'3'})
+
+    # Crossing the threshold compacts the buffer
+    h.delete(['0', '1', '2'])
+    assert h._n_deleted == 0
+    assert h._size == len(h) == 6
+    for id_ in h.list():
+        np.testing.assert_allclose(h.h[h.lookup[id_]], vectors[id_])
+    res, _ = h.find_nearest_from_array(np.array([1.0, 0, 0, 0]), 100)
+    assert sorted(res) == sorted(h.list())
+
+    # Unknown ids are ignored
+    h.delete(['4', 'missing', '4'])
+    assert len(h) == 5
+    assert '4' not in h.list()
+
+
+def test_search_during_compaction():
+    rng = np.random.default_rng(3)
+    h = InMemoryVectorSearcher(identifier="123456", measure="dot", dimensions=4)
+    h.add([VectorItem(id=str(i), vector=rng.normal(size=4)) for i in range(2000)])
+
+    errors = []
+
+    def search():
+        try:
+            for _ in range(50):
+                res, _ = h.find_nearest_from_array(rng.normal(size=4), 10)
+                assert None not in res
+        except Exception as e:
+            errors.append(e)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    for i in range(0, 2000, 100):
+        h.delete([str(j) for j in range(i, i + 90)])
+    searcher.join()
+    assert not errors
+    assert len(h) == 200
+
+
+class _Index:
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.loaded = []
+
+    def list(self):
+        return list(self.vectors)
+
+    def iter_vectors(self, ids=None, batch_size=10000):
+        ids = list(self.vectors) if ids is None else ids
+        for i in range(0, len(ids), batch_size):
+            page = ids[i : i + batch_size]
+            self.loaded.extend(page)
+            yield page, np.stack([self.vectors[id_] for id_ in page])
+
+
+@pytest.mark.parametrize(
+    "cls", [InMemoryVectorSearcher, IVFVectorSearcher, HNSWVectorSearcher]
+)
+def test_snapshot_restore_and_replay(cls, tmp_path):
+    rng = np.random.default_rng(3)
+    vectors = {str(i): rng.normal(size=8) for i in range(200)}
+    index = _Index(vectors)
+
+    def build():
+        h = cls(identifier="123456", dimensions=8, snapshot_dir=str(tmp_path))
+        h.db = mock.MagicMock()
+        h.db.load.return_value = index
+        return h
+
+    h = build()
+    h.initialize()
+    assert len(h) == 200
+    assert len(index.loaded) == 200
+    expected = h.find_nearest_from_array(vectors['7'], n=5)
+
+    # Restarting restores the snapshot without reloading any vectors
+    index.loaded = []
+    h = build()
+    h.initialize()
+    assert index.loaded == []
+    assert isinstance(h._buffer, np.memmap)
+    assert h.find_nearest_from_array(vectors['7'], n=5) == expected
+
+    # Changes since the snapshot are replayed from the delta log
+    del vectors['7']
+    vectors['new'] = rng.normal(size=8)
+    h.delete(['7'])
+    h.add([VectorItem(id='new', vector=vectors['new'])])
+    assert os.path.getsize(h.delta_log.path) > 0
+    h = build()
+    h.initialize()
+    assert index.loaded == []
+    assert sorted(h.list()) == sorted(vectors)
+    assert h.find_nearest_from_array(vectors['new'], n=1)[0] == ['new']
+
+    # Snapshots written without a log are compared with the index instead
+    h.snapshot()
+    manifest = os.path.join(h.snapshot_path, 'manifest.json')
+    with open(manifest) as f:
+        content = json.load(f)
+    content.pop('delta_log')
+    with open(manifest, 'w') as f:
+        json.dump(content, f)
+    vectors['newer'] = rng.normal(size=8)
+    h = build()
+    h.initialize()
+    assert index.loaded == ['newer']
+    assert sorted(h.list()) == sorted(vectors)
+
+    h.drop()
+    assert not os.listdir(tmp_path)
+
+
+@pytest.mark.parametrize(
+    "cls,kwargs,rebuild",
+    [
+        (IVFVectorSearcher, {'min_train_size': 100}, 'train'),
+        (QuantizedVectorSearcher, {'min_train_size': 100}, 'train'),
+        (HNSWVectorSearcher, {}, '_insert'),
+    ],
+)
+def test_snapshot_restores_derived_state(cls, kwargs, rebuild, tmp_path):
+    rng = np.random.default_rng(4)
+    vectors = {str(i): rng.normal(size=8) for i in range(300)}
+    h = cls(identifier="123456", dimensions=8, snapshot_dir=str(tmp_path), **kwargs)
+    h.add([VectorItem(id=id, vector=v) for id, v in vectors.items()])
+    h.delete(['7'])
+    h.snapshot()
+    expected = h.find_nearest_from_array(vectors['8'], n=5)
+
+    # The graph, centroids and codes are restored instead of rebuilt
+    h = cls(identifier="123456", dimensions=8, snapshot_dir=str(tmp_path), **kwargs)
+    with mock.patch.object(cls, rebuild, side_effect=AssertionError(rebuild)):
+        assert h.restore()
+    assert len(h) == 299
+    assert h.find_nearest_from_array(vectors['8'], n=5) == expected
+
+    # Snapshots without the state are rebuilt from the vectors
+    os.remove(os.path.join(h.snapshot_path, 'state.npz'))
+    h = cls(identifier="123456", dimensions=8, snapshot_dir=str(tmp_path), **kwargs)
+    with mock.patch.object(
+        cls, rebuild, autospec=True, side_effect=getattr(cls, rebuild)
+    ) as m:
+        assert h.restore()
+    assert m.called
+    assert h.find_nearest_from_array(vectors['8'], n=1)[0] == ['8']
+
+
+@pytest.mark.parametrize(
+    "cls", [InMemoryVectorSearcher, IVFVectorSearcher, HNSWVectorSearcher]
+)
+def test_snapshot_empty_index(cls, tmp_path):
+    index = _Index({})
+
+    def build():
+        h = cls(identifier="123456", dimensions=8, snapshot_dir=str(tmp_path))
+        h.db = mock.MagicMock()
+        h.db.load.return_value = index
+        return h
+
+    h = build()
+    h.initialize()
+    assert os.path.exists(os.path.join(h.snapshot_path, 'manifest.json'))
+
+    # The empty snapshot is restored, and changes since are replayed
+    h = build()
+    assert h.restore()
+    assert len(h) == 0
+    h.add([VectorItem(id='0', vector=np.ones(8))])
+    h = build()
+    h.initialize()
+    assert h.list() == ['0']
+    assert h.find_nearest_from_array(np.ones(8), n=1)[0] == ['0']
+
+
+def test_delta_log_replay_and_torn_tail(tmp_path):
+    from pinnacle.backends.local.vector_search import DeltaLog
+
+    log = DeltaLog(str(tmp_path / 'index.log'), fsync=False)
+    vectors = np.arange(6, dtype=np.float32).reshape(2, 3)
+    log.append(DeltaLog.ADD, ['a', 'b'], vectors)
+    log.append(DeltaLog.DELETE, ['a'])
+    size = log.size
+    log.append(DeltaLog.ADD, ['c'], vectors[:1])
+    log.close()
+
+    # Simulate a crash in the middle of the last record
+    with open(log.path, 'r+b') as f:
+        f.truncate(log.size - 3)
+
+    records = list(log.replay())
+    assert [(op, ids) for op, ids, _ in records] == [
+        (DeltaLog.ADD, ['a', 'b']),
+        (DeltaLog.DELETE, ['a']),
+    ]
+    np.testing.assert_array_equal(records[0][2], vectors)
+    assert log.size == size
+
+    log.truncate()
+    assert log.size == 0
+    assert list(log.replay()) == []
+
+
+def test_delta_log_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(InMemoryVectorSearcher, '_LOG_MIN_BYTES', 1024)
+    monkeypatch.setattr(InMemoryVectorSearcher, '_LOG_COMPACT_RATIO', 0.1)
+    rng = np.random.default_rng(0)
+    vectors = {str(i): rng.normal(size=8) for i in range(100)}
+    h = InMemoryVectorSearcher(
+        identifier="123456", dimensions=8, snapshot_dir=str(tmp_path)
+    )
+    h.db = mock.MagicMock()
+    h.db.load.return_value = _Index(vectors)
+    h.initialize()
+
+    for i in range(100, 130):
+        h.add([VectorItem(id=str(i), vector=rng.normal(size=8))])
+        assert h.delta_log.size <= 1024
+    with open(os.path.join(h.snapshot_path, 'manifest.json')) as f:
+        assert json.load(f)['size'] > 100
+
+    restored = InMemoryVectorSearcher(
+        identifier="123456", dimensions=8, snapshot_dir=str(tmp_path)
+    )
+    assert restored.restore()
+    assert len(restored) == 130
+
+
+@pytest.mark.parametrize("selectivity", [0.05, 0.8])
+def test_within_ids_filter_strategies(selectivity):
+    rng = np.random.default_rng(4)
+    vectors = rng.normal(size=(1000, 8))
+    ids = [str(i) for i in range(1000)]
+    h = InMemoryVectorSearcher(identifier="123456", measure="l2", dimensions=8)
+    h.add([VectorItem(id=id_, vector=v) for v, id_ in zip(vectors, ids)])
+
+    within_ids = [str(i) for i in rng.permutation(1000)[: int(selectivity * 1000)]]
+    # Ids missing from the index are ignored
+    within_ids.append('missing')
+    queries = rng.normal(size=(3, 8))
+    res, scores = h.find_nearest_from_arrays(queries, n=5, within_ids=within_ids)
+
+    allowed = np.array([int(i) for i in within_ids[:-1]])
+    for q, r, s in zip(queries, res, scores):
+        distances = np.linalg.norm(vectors[allowed] - q, axis=1)
+        expected = allowed[np.argsort(distances)[:5]]
+        assert r == [str(i) for i in expected]
+        np.testing.assert_allclose(s, -np.sort(distances)[:5], rtol=1e-6)
+
+    # The filter is cached by a digest of its ids until the index changes
+    assert len(h._filters) == 1
+    h.find_nearest_from_arrays(queries, n=5, within_ids=tuple(within_ids))
+    assert len(h._filters) == 1
+    (key,) = h._filters
+    assert len(key[0]) == 16
+    h.delete([within_ids[0]])
+    assert not h._filters
+    h.find_nearest_from_arrays(queries, n=5, within_ids=within_ids)
+    assert next(iter(h._filters)) != key
+    res, _ = h.find_nearest_from_arrays(queries, n=1000, within_ids=within_ids)
+    assert all(len(r) == len(within_ids) - 2 for r in res)
+    assert all(within_ids[0] not in r for r in res)
+
+    res, scores = h.find_nearest_from_arrays(queries, n=5, within_ids=['missing'])
+    assert res == [[], [], []]
+
+
+def test_from_component_ignores_kwargs_of_other_searchers(monkeypatch):
+    from pinnacle import CFG
+
+    monkeypatch.setattr(CFG, 'vector_search_kwargs', {'nprobe': 4, 'M': 8})
+    index = mock.MagicMock(component='VectorIndex', uuid='123456', dimensions=4)
+    index.measure = 'l2'
+
+    assert IVFVectorSearcher.from_component(index).nprobe == 4
+    hnsw = HNSWVectorSearcher.from_component(index)
+    assert hnsw.M == 8
+    assert not hasattr(hnsw, 'nprobe')
+    assert InMemoryVectorSearcher.from_component(index).measure_name == 'l2'
+
+
+def test_within_ids_filters_with_colliding_hashes():
+    class Id(str):
+        def __hash__(self):
+            return 0
+
+    h = InMemoryVectorSearcher(identifier="123456", measure="l2", dimensions=2)
+    h.add([VectorItem(id=Id(i), vector=np.array([i, 0.0])) for i in range(10)])
+
+    query = np.array([0.0, 0.0])
+    res, _ = h.find_nearest_from_array(query, n=10, within_ids=[Id('1'), Id('2')])
+    assert res == ['1', '2']
+    res, _ = h.find_nearest_from_array(query, n=10, within_ids=[Id('3'), Id('4')])
+    assert res == ['3', '4']